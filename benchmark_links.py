@@ -0,0 +1,63 @@
+"""
+Compares the 'stream' and 'soup' link extraction backends in pdflinks on the same pages, checks that they find the same links, and prints how long each took.
+
+    python benchmark_links.py                    # a generated reference page with 20,000 links
+    python benchmark_links.py page.html ...      # saved pages
+    python benchmark_links.py https://...        # pages fetched once before timing
+"""
+
+import sys
+import time
+
+import pdfcrawl
+import pdflinks
+
+
+REPEATS = 5
+
+
+def generated_page(number_of_links=20000):
+    """A large reference-style page: nested tables and lists, a link in most rows, and some links that the default filter leaves out."""
+    rows = []
+    for i in range(number_of_links):
+        if i % 10 == 0:
+            link = f'<a href="#section{i}">&para;</a>'
+        elif i % 3 == 0:
+            link = f'<a class="reference external" href="https://example.com/api/{i}.html?x=1&amp;y=2">api {i}</a>'
+        else:
+            link = f'<a class="reference internal" href="/docs/module{i % 500}.html#item{i}"><code>item_{i}</code></a>'
+        rows.append(f'<tr><td><p>Row {i} &mdash; <em>description</em> of the item</p></td><td>{link}</td></tr>')
+    return f'<!DOCTYPE html><html><head><meta charset="utf-8"><title>Reference</title></head><body><table>{"".join(rows)}</table></body></html>'.encode("utf-8")
+
+
+def benchmark(name, html_page, root_html_page="https://example.com"):
+    timings = {}
+    results = {}
+    for backend in pdflinks.BACKENDS:
+        extractor = pdflinks.LinkExtractor(root_html_page, backend=backend)
+        start = time.perf_counter()
+        for _ in range(REPEATS):
+            results[backend] = extractor(None, html_page)
+        timings[backend] = (time.perf_counter() - start) / REPEATS
+
+    same = "same links" if results["stream"] == results["soup"] else "DIFFERENT LINKS"
+    print(f"{name}: {len(html_page)} bytes, {len(results['stream'])} links, {same}")
+    for backend in pdflinks.BACKENDS:
+        print(f"    {backend:>6}: {timings[backend] * 1000:8.1f} ms")
+    print(f"    stream is {timings['soup'] / timings['stream']:.1f}x faster")
+    return results["stream"] == results["soup"]
+
+
+if __name__ == "__main__":
+    pages = sys.argv[1:]
+    all_same = True
+    if not pages:
+        all_same = benchmark("generated page", generated_page())
+    for page in pages:
+        if page.startswith(("http://", "https://")):
+            html_page = pdfcrawl.fetch_page(page)
+        else:
+            with open(page, "rb") as f:
+                html_page = f.read()
+        all_same = benchmark(page, html_page) and all_same
+    sys.exit(0 if all_same else 1)
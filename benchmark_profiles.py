@@ -0,0 +1,97 @@
+"""
+Compares the render profiles in pdfprofiles on the same local fixture site, and prints how long each took to render and how large its PDF is.
+
+The site is generated in a temporary folder and served on localhost, so nothing is fetched from the internet: pages of headings, text and tables, each with a few images and a script which adds to the page after it has loaded, as documentation sites tend to.
+
+    python benchmark_profiles.py                             # wkhtmltopdf at pdffromlinks.PATH_TO_WKHTMLTOPDF_EXE, 40 pages
+    python benchmark_profiles.py path/to/wkhtmltopdf 100     # another wkhtmltopdf, 100 pages
+"""
+
+import functools
+import http.server
+import os
+import struct
+import sys
+import tempfile
+import threading
+import time
+import zlib
+
+import pdfkit
+
+import pdffromlinks
+import pdfprofiles
+import pdfreadiness
+import pdfrender
+
+
+NUMBER_OF_PAGES = 40
+IMAGES_PER_PAGE = 3
+
+
+def png(width, height, seed):
+    """A gradient PNG, which does not compress to nothing, as photos and screenshots do not."""
+    rows = b"".join(b"\x00" + bytes(((x * 7 + y * 3 + seed * 31) % 256 for x in range(width * 3))) for y in range(height))
+
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data) & 0xffffffff)
+
+    return b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)) + chunk(b"IDAT", zlib.compress(rows)) + chunk(b"IEND", b"")
+
+
+def generate_site(directory, number_of_pages=NUMBER_OF_PAGES):
+    """Writes the fixture site to directory and returns the page names."""
+    for i in range(IMAGES_PER_PAGE * 4):
+        with open(os.path.join(directory, f"image{i}.png"), "wb") as f:
+            f.write(png(320, 200, i))
+
+    names = []
+    for page in range(number_of_pages):
+        sections = []
+        for section in range(6):
+            rows = "".join(f"<tr><td>item_{page}_{section}_{row}</td><td>Returns the value of the item, or None if it is not set.</td></tr>" for row in range(8))
+            sections.append(f"<h2>Section {section}</h2><p>{'Some documentation text about this section. ' * 20}</p><table>{rows}</table>")
+        images = "".join(f'<img src="image{(page + i) % (IMAGES_PER_PAGE * 4)}.png" width="320" height="200">' for i in range(IMAGES_PER_PAGE))
+        script = "<script>window.setTimeout(function(){var p=document.createElement('p');p.innerHTML='Added by a script after loading.';document.body.appendChild(p);}, 300);</script>"
+        name = f"page{page}.html"
+        with open(os.path.join(directory, name), "w", encoding="utf-8") as f:
+            f.write(f'<!DOCTYPE html><html><head><meta charset="utf-8"><title>Page {page}</title></head><body><h1>Page {page}</h1>{images}{"".join(sections)}{script}</body></html>')
+        names.append(name)
+    return names
+
+
+class QuietHandler(http.server.SimpleHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+def benchmark(profile, links, config, output_dir):
+    options = pdfreadiness.readiness_from(None).apply(pdfprofiles.profile_options(profile, {"load-error-handling": "ignore"}))
+    start = time.perf_counter()
+    destination, errors = pdfrender.render_links(links, output_dir, profile, config, options)
+    elapsed = time.perf_counter() - start
+    return elapsed, os.path.getsize(destination), len(errors)
+
+
+if __name__ == "__main__":
+    wkhtmltopdf = sys.argv[1] if len(sys.argv) > 1 else pdffromlinks.PATH_TO_WKHTMLTOPDF_EXE
+    number_of_pages = int(sys.argv[2]) if len(sys.argv) > 2 else NUMBER_OF_PAGES
+    config = pdfkit.configuration(wkhtmltopdf=wkhtmltopdf)
+
+    with tempfile.TemporaryDirectory() as site, tempfile.TemporaryDirectory() as output_dir:
+        names = generate_site(site, number_of_pages)
+        server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), functools.partial(QuietHandler, directory=site))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        links = [f"http://127.0.0.1:{server.server_address[1]}/{name}" for name in names]
+
+        results = {}
+        try:
+            for profile in pdfprofiles.PROFILES:
+                results[profile] = benchmark(profile, links, config, output_dir)
+        finally:
+            server.shutdown()
+
+    print(f"\n{number_of_pages} pages, {IMAGES_PER_PAGE} images each, rendered with {wkhtmltopdf}:")
+    baseline_time, baseline_size, _ = results[pdfprofiles.DEFAULT_PROFILE]
+    for profile, (elapsed, size, failures) in results.items():
+        print(f"    {profile:>8}: {elapsed:7.2f} s ({baseline_time / elapsed:4.1f}x), {size / 1024:9.1f} KB ({size / baseline_size:4.2f}x), {failures} failed")
@@ -0,0 +1,130 @@
+"""
+Shared pytest fixtures: small sites served from a temporary folder, and a stand-in for wkhtmltopdf, so that crawling and rendering can be tested without the network or wkhtmltopdf.
+"""
+
+import functools
+import http.server
+import json
+import os
+import re
+import stat
+import sys
+import threading
+
+import pdfkit
+import PyPDF2
+import pytest
+
+
+class QuietHandler(http.server.SimpleHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def serve(tmp_path):
+    """Returns serve(site, folder=None), which writes site ({path: body}) to folder, a new one by default, and serves the folder. Returns the root URL. Pages can be changed in the folder while it is served."""
+    servers = []
+
+    def serve(site, folder=None):
+        folder = str(folder or tmp_path / f"site{len(servers)}")
+        for name, body in site.items():
+            os.makedirs(os.path.dirname(os.path.join(folder, name)), exist_ok=True)
+            with open(os.path.join(folder, name), "w") as f:
+                f.write(body)
+        server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), functools.partial(QuietHandler, directory=folder))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return f"http://127.0.0.1:{server.server_address[1]}"
+
+    yield serve
+    for server in servers:
+        server.shutdown()
+
+
+# Writes a PDF with one page per page given, showing where the page came from: its URL, or the <base href> of a
+# snapshot. Logs the pages of every run, one JSON list per line, and fails any run with a page containing a line of
+# the fail file.
+FAKE_WKHTMLTOPDF = r'''#!{python}
+import json, re, sys
+
+args = sys.argv[1:]
+if args == ["--version"]:
+    print("wkhtmltopdf 0.12.6 (fake)")
+    sys.exit(0)
+
+pages = []
+for arg in args[:-1]:
+    if arg.startswith("http"):
+        pages.append(arg)
+    elif arg.endswith(".html"):
+        match = re.search(r'<base href="([^"]*)"', open(arg, encoding="utf-8").read())
+        pages.append(match.group(1) if match else arg)
+with open({log!r}, "a") as log:
+    log.write(json.dumps(pages) + "\n")
+with open({fail!r}) as fail:
+    if any(word and word in page for word in fail.read().split() for page in pages):
+        sys.stderr.write("Error: Failed to load page\n")
+        sys.exit(1)
+
+objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+kids = []
+for index, page in enumerate(pages):
+    kids.append(b"%d 0 R" % (4 + 2 * index))
+    content = b"BT /F1 12 Tf 20 100 Td (" + page.encode() + b") Tj ET"
+    objects.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 300 200] /Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % (5 + 2 * index))
+    objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(content), content))
+objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (b" ".join(kids), len(pages))
+data = bytearray(b"%PDF-1.4\n")
+offsets = []
+for number, body in enumerate(objects, 1):
+    offsets.append(len(data))
+    data += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+xref = len(data)
+data += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+data += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+data += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+with open(args[-1], "wb") as f:
+    f.write(data)
+'''
+
+
+class FakeWkhtmltopdf:
+    def __init__(self, folder):
+        self.path = os.path.join(folder, "wkhtmltopdf")
+        self.log = os.path.join(folder, "wkhtmltopdf.log")
+        self.fail_file = os.path.join(folder, "wkhtmltopdf.fail")
+        with open(self.path, "w") as f:
+            f.write(FAKE_WKHTMLTOPDF.format(python=sys.executable, log=self.log, fail=self.fail_file))
+        os.chmod(self.path, os.stat(self.path).st_mode | stat.S_IEXEC)
+        self.fail()
+        self.config = pdfkit.configuration(wkhtmltopdf=self.path)
+
+    def fail(self, *words):
+        """Makes every run with a page containing one of words fail, from now on."""
+        with open(self.fail_file, "w") as f:
+            f.write("\n".join(words))
+
+    @staticmethod
+    def pages_of(path):
+        """Returns what each page of a PDF written by the fake wkhtmltopdf shows."""
+        with open(path, "rb") as f:
+            reader = PyPDF2.PdfFileReader(f)
+            return [re.search(rb"\((.*)\) Tj", reader.getPage(index).getContents().getData()).group(1).decode() for index in range(reader.getNumPages())]
+
+    def runs(self):
+        """Returns the pages of every run so far, not counting --version, and forgets them."""
+        if not os.path.exists(self.log):
+            return []
+        with open(self.log) as f:
+            runs = [json.loads(line) for line in f]
+        os.remove(self.log)
+        return runs
+
+
+@pytest.fixture
+def wkhtmltopdf(tmp_path):
+    """A FakeWkhtmltopdf in its own folder."""
+    folder = tmp_path / "wkhtmltopdf"
+    folder.mkdir()
+    return FakeWkhtmltopdf(str(folder))
@@ -0,0 +1,130 @@
+"""
+Sorts the links of a crawl by what they point at, so that each is handled the cheapest way: links to PDFs are downloaded as they are rather than rendered again by wkhtmltopdf, which is slow and often garbles them, pages are rendered, and anything else, such as images, archives and media, is left out.
+
+A link is classified by the first of these which gives an answer:
+- the extension of its path, such as .pdf, .html or .png;
+- the Content-Type the crawl saw, if the page is in the session's HttpCache or was saved as a snapshot;
+- the Content-Type of a HEAD request;
+- the first bytes of the body, if the server does not answer HEAD, or answers with a vague type such as application/octet-stream.
+
+A link which cannot be classified at all is rendered, as every link was before.
+"""
+
+import concurrent.futures
+import os
+import posixpath
+import urllib.parse
+
+import pdfcrawl
+import pdfhttp
+
+
+HTML = "html"
+PDF = "pdf"
+OTHER = "other"
+
+PDF_EXTENSIONS = frozenset((".pdf",))
+HTML_EXTENSIONS = frozenset((".html", ".htm", ".xhtml", ".shtml", ".php", ".asp", ".aspx", ".jsp", ".cfm", ".txt"))
+OTHER_EXTENSIONS = frozenset((
+    ".png", ".jpg", ".jpeg", ".gif", ".bmp", ".svg", ".webp", ".ico", ".tif", ".tiff",
+    ".mp3", ".wav", ".ogg", ".flac", ".mp4", ".webm", ".avi", ".mov", ".mkv",
+    ".zip", ".gz", ".tgz", ".bz2", ".xz", ".7z", ".rar", ".tar", ".exe", ".msi", ".dmg", ".iso", ".apk",
+    ".css", ".js", ".json", ".xml", ".rss", ".atom", ".woff", ".woff2", ".ttf", ".otf", ".eot",
+    ".doc", ".docx", ".xls", ".xlsx", ".ppt", ".pptx", ".odt", ".ods", ".odp", ".epub",
+))
+
+PDF_CONTENT_TYPES = frozenset(("application/pdf", "application/x-pdf"))
+# Types which say nothing about what the body is, so the body is sniffed instead.
+VAGUE_CONTENT_TYPES = frozenset(("application/octet-stream", "binary/octet-stream", "application/force-download", "application/download", "application/unknown"))
+
+PDF_MAGIC = b"%PDF-"
+# How far into a body to look for the PDF header, which some files have after a little junk.
+SNIFF_SIZE = 1024
+
+
+def extension_of(url):
+    return posixpath.splitext(urllib.parse.urlsplit(url).path)[1].lower()
+
+
+def classify_extension(url):
+    """Returns the kind of link the extension of url's path says it is, or None if it says nothing."""
+    extension = extension_of(url)
+    if extension in PDF_EXTENSIONS:
+        return PDF
+    if extension in HTML_EXTENSIONS:
+        return HTML
+    if extension in OTHER_EXTENSIONS:
+        return OTHER
+    return None
+
+
+def classify_content_type(content_type):
+    """Returns the kind of link a Content-Type says it is, or None if there is none or it is too vague."""
+    if not content_type:
+        return None
+    media_type = content_type.split(";", 1)[0].strip().lower()
+    if media_type in PDF_CONTENT_TYPES:
+        return PDF
+    if media_type in VAGUE_CONTENT_TYPES:
+        return None
+    if "html" in media_type or media_type == "text/plain":
+        return HTML
+    return OTHER
+
+
+def sniff(body):
+    """Returns the kind of link the start of body says it is."""
+    start = body[:SNIFF_SIZE]
+    if PDF_MAGIC in start:
+        return PDF
+    if start.lstrip(b"\xef\xbb\xbf \t\r\n").startswith(b"<"):
+        return HTML
+    return OTHER
+
+
+def classify(url, session=None, snapshots=None):
+    """Returns (kind, reason) for url, where kind is HTML, PDF or OTHER, and reason says how it was decided."""
+    if (kind := classify_extension(url)) is not None:
+        return kind, f"extension {extension_of(url)}"
+
+    if snapshots is not None and url in snapshots.saved:
+        return HTML, "snapshot"
+
+    session = session or pdfhttp.default_session()
+    if session.cache is not None and (cached := session.cache.get(url)) is not None:
+        if (kind := classify_content_type(cached[1])) is not None:
+            return kind, f"cached Content-Type {cached[1]}"
+        return sniff(cached[4]), "cached body"
+
+    try:
+        content_type = session.head(url).headers.get("Content-Type")
+        if (kind := classify_content_type(content_type)) is not None:
+            return kind, f"Content-Type {content_type}"
+    except (OSError, ValueError) as e:
+        print(f"HEAD {url} failed, so its body is checked instead: {str(e)}")
+
+    try:
+        response = session.get(url)
+    except (OSError, ValueError) as e:
+        # Rendering it is what would have happened before, and reports the error if it fails again.
+        return HTML, f"could not be fetched: {str(e)}"
+    if (kind := classify_content_type(response.headers.get("Content-Type"))) is not None:
+        return kind, f"Content-Type {response.headers.get('Content-Type')}"
+    return sniff(response.body), "body"
+
+
+def classify_links(links, session=None, snapshots=None, workers=pdfcrawl.DEFAULT_CONCURRENCY):
+    """Classifies links concurrently. Returns [(kind, reason)] in the same order."""
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(lambda link: classify(link, session, snapshots), links))
+
+
+def download_pdf(url, destination, session=None):
+    """Downloads the PDF at url to destination without holding it in memory, and returns destination. Raises IOError if what was downloaded is not a PDF."""
+    (session or pdfhttp.default_session()).download(url, destination)
+    with open(destination, "rb") as f:
+        start = f.read(SNIFF_SIZE)
+    if PDF_MAGIC not in start:
+        os.remove(destination)
+        raise IOError(f"{url} did not return a PDF.")
+    return destination
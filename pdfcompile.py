@@ -5,12 +5,42 @@ Testing out solution from this Stack Overflow Answer:
 https://stackoverflow.com/questions/39574096/how-to-delete-pages-from-pdf-file-using-python
 '''
 
-from PyPDF2 import PdfFileWriter, PdfFileReader
+import concurrent.futures
+import contextlib
+import heapq
+import itertools
+import math
+import os
 import re
 import pdfmerge
+import pdfstream
 
-def rearrange_pdf(input_file, pages_to_use, output_dir, output_file_name="rearrangedpdf"):
-    '''Takes a string containing a source file name, a list with the pages from that file, and the name of a file to write to to create a new pdf. The page numbers start from 1.'''
+@contextlib.contextmanager
+def open_output(destination):
+    '''Opens a temporary file in the folder of destination for writing, and moves it to destination once the block has finished. If the block raises, e.g. for a page beyond the end of the input, the temporary file is removed instead, so that a failed run leaves nothing behind for check_output_file_exists to trip over on the next try.'''
+    folder, name = os.path.split(destination)
+    # Opened with open() rather than tempfile, which would make the output readable by its owner only.
+    part = os.path.join(folder, f".{name}.{os.urandom(4).hex()}.part")
+    f = open(part, 'xb')
+    try:
+        with f:
+            yield f
+        os.replace(part, destination)
+    except BaseException:
+        os.remove(part)
+        raise
+
+def write_pages(source, page_numbers, destination):
+    '''Writes the given pages (starting from 1) of an open pdfstream source to destination. Only the objects which the written pages actually use are copied, so resources and streams used only by other pages are left out. Nothing is left at destination if a page cannot be written.'''
+    with open_output(destination) as f:
+        writer = pdfstream.StreamingPdfWriter(f)
+        pdfstream.append_source(writer, source, [page_no - 1 for page_no in page_numbers])
+        writer.close()
+
+def rearrange_pdf(input_file, pages_to_use, output_dir, output_file_name="rearrangedpdf", fast_path=False):
+    '''Takes a string containing a source file name, a list with the pages from that file (or a PageSpec, see compile_page_spec), and the name of a file to write to to create a new pdf. The page numbers start from 1.
+
+    Only the objects used by pages_to_use are written (see write_pages). If fast_path is True, objects are copied as raw bytes where possible (see pdfraw), falling back to PyPDF2 if the input cannot be handled.'''
 
     sanitized_input = pdfmerge.sanitize_input(input_file)
     
@@ -25,19 +55,19 @@ def rearrange_pdf(input_file, pages_to_use, output_dir, output_file_name="rearra
 
     pdfmerge.check_output_file_exists(destination)
 
-    infile = PdfFileReader(sanitized_input, 'rb')
-    output = PdfFileWriter()
-    
-    for page_no in pages_to_use:
-        p = infile.getPage(page_no - 1)
-        output.addPage(p)
-    
-    with open(destination, 'wb') as f:
-        output.write(f)
+    source = pdfstream.open_source(sanitized_input, fast_path)
+    try:
+        if isinstance(pages_to_use, PageSpec):
+            pages_to_use = pages_to_use.resolve(source.number_of_pages())
+        write_pages(source, pages_to_use, destination)
+    finally:
+        source.close()
     return destination
 
-def remove_pages_from_pdf(input_file, pages_to_remove, output_dir, output_file_name="rearrangedpdf"):
-    '''Writes a new PDF from an input PDF, removing the page numbers in pages_to_remove.'''
+def remove_pages_from_pdf(input_file, pages_to_remove, output_dir, output_file_name="rearrangedpdf", fast_path=False):
+    '''Writes a new PDF from an input PDF, removing the page numbers in pages_to_remove, which may be a list or a PageSpec (see compile_page_spec).
+
+    Only the objects used by the remaining pages are written (see write_pages). See rearrange_pdf for fast_path.'''
 
     sanitized_input = pdfmerge.sanitize_input(input_file)
     
@@ -52,65 +82,398 @@ def remove_pages_from_pdf(input_file, pages_to_remove, output_dir, output_file_n
 
     pdfmerge.check_output_file_exists(destination)
 
-    infile = PdfFileReader(sanitized_input, 'rb')
-    number_of_pages = infile.numPages
-    output = PdfFileWriter()
+    source = pdfstream.open_source(sanitized_input, fast_path)
+    try:
+        number_of_pages = source.number_of_pages()
 
-    page_range = range(1, number_of_pages + 1)
+        # Convert the pages to remove to a PageSpec, which works out the pages to keep on runs of pages rather than page
+        # by page. Also remove any extra pages.
+        if isinstance(pages_to_remove, PageSpec):
+            pages_to_remove_spec = pages_to_remove.clip(number_of_pages)
+        else:
+            pages_to_remove_spec = PageSpec.from_pages(page_no for page_no in pages_to_remove if 1 <= page_no <= number_of_pages)
+        pages_to_remove_spec = pages_to_remove_spec.intersection(PageSpec.all_pages(number_of_pages))
+        
+        if not pages_to_remove_spec:
+            raise ValueError("No pages to remove. Did you specify pages beyond the actual number of pages the document has?")
 
-    # Convert the list of pages to remove to a set for faster checking. Also remove any extra pages.
-    pages_to_remove_set = set(pages_to_remove).intersection(set(page_range))
+        write_pages(source, PageSpec.all_pages(number_of_pages).difference(pages_to_remove_spec), destination)
+    finally:
+        source.close()
     
-    if not pages_to_remove_set:
-        raise ValueError("No pages to remove. Did you specify pages beyond the actual number of pages the document has?")
+    # Return the pages actually removed (i.e. excluding extra pages)
+    return destination, list(pages_to_remove_spec)
 
-    for page_no in (page_range := range(1, number_of_pages + 1)):
-        if page_no in pages_to_remove_set:
-            continue
+def split_pdf(input_file, outputs, output_dir, fast_path=False, workers=None):
+    '''Writes several PDFs from one input in a single pass. outputs maps each output file name to the pages it should contain, given as a page spec string (see compile_page_spec), a PageSpec, or a list of page numbers starting from 1.
+
+    The input is opened and parsed once, and every output is written from it. If workers is set and the input can be read by several threads at once (i.e. it is read with fast_path), up to that many outputs are written at the same time. Returns a dict of output file name to destination.'''
+
+    sanitized_input = pdfmerge.sanitize_input(input_file)
+
+    # Check that the input file exists
+    pdfmerge.check_inputs(sanitized_input)
+
+    pdfmerge.check_folder(output_dir)
+
+    # Check every output before writing any of them, so that a clash does not leave a partial set of outputs behind.
+    destinations = {output_file_name: pdfmerge.sanitize_file_path(output_dir, output_file_name) for output_file_name in outputs}
+    # Different names can end up as the same file, e.g. 'a' and 'a.pdf', or 'a' and './a', and one output would then
+    # overwrite the other.
+    claimed = {}
+    for output_file_name, destination in destinations.items():
+        path = os.path.normcase(os.path.abspath(destination))
+        if path in claimed:
+            raise ValueError(f"The outputs {claimed[path]!r} and {output_file_name!r} would both be written to {destination}. Give them different names.")
+        claimed[path] = output_file_name
+    for destination in destinations.values():
+        pdfmerge.check_output_file_exists(destination)
+
+    source = pdfstream.open_source(sanitized_input, fast_path)
+    try:
+        number_of_pages = source.number_of_pages()
+        jobs = []
+        for output_file_name, pages_to_use in outputs.items():
+            if isinstance(pages_to_use, str):
+                pages_to_use = compile_page_spec(pages_to_use)
+            if isinstance(pages_to_use, PageSpec):
+                pages_to_use = pages_to_use.resolve(number_of_pages)
+            else:
+                # Check lists of pages here too, so that a bad page in one output stops the split before any output is
+                # written, rather than after some of them are.
+                pages_to_use = list(pages_to_use)
+                if not all(1 <= page_no <= number_of_pages for page_no in pages_to_use):
+                    raise IndexError(f"The pages for {output_file_name} are not all within the document, which has {number_of_pages} pages.")
+            jobs.append((pages_to_use, destinations[output_file_name]))
+
+        if workers and source.thread_safe:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = [executor.submit(write_pages, source, pages_to_use, destination) for pages_to_use, destination in jobs]
+                for future in futures:
+                    future.result()
         else:
-            p = infile.getPage(page_no - 1)
-            output.addPage(p)
-    
-    with open(destination, 'wb') as f:
-        output.write(f)
-    
-    # Return the pages actually removed (i.e. excluding extra pages)
-    return destination, sorted(list(pages_to_remove_set))
+            for pages_to_use, destination in jobs:
+                write_pages(source, pages_to_use, destination)
+    finally:
+        source.close()
 
-def make_list_of_pages_from_string(page_string):
-    """Creates a list of pages to be sent into rearrange_pdf from an input string."""
-    page_no_list = []
-    page_string_list = page_string.split(",")
-    for page_no in page_string_list:
-        print(page_string_list)
-        if "-" in page_no:
-            # Remove whitespace from left and right
-            page_no = page_no.strip()
-
-            # Search for pattern. ( *) included in case of extraneous white spaces between the numbers.
-            page_no_pattern = r"([0-9]+)( *)(-)( *)([0-9]+)"
-
-            if page_range := re.match(page_no_pattern, page_no):
-                start_page = int(page_range.group(1))
-                end_page = int(page_range.group(5))
-                if end_page >= start_page:
-                    page_no_list.extend([page_no for page_no in range(start_page, (end_page + 1))])
-                # If start_page is higher, create a list of numbers in reverse
-                elif end_page < start_page:
-                    page_no_list.extend([page_no for page_no in range(start_page, (end_page - 1), -1)])
+    for destination in destinations.values():
+        print(f"Output file to {destination}")
+    return destinations
+
+# The start of a segment in an assembly plan: a PDF file name, optionally followed by a colon and the first part of its
+# page spec. The file name is matched greedily so that Windows drive letters ('C:/...') are kept.
+ASSEMBLY_SEGMENT_PATTERN = re.compile(r"^\s*(?P<file>.+\.pdf)\s*(?::(?P<pages>[^:]*))?$", re.IGNORECASE)
+
+def compile_assembly_plan(plan_string):
+    """Compiles an assembly plan string such as 'a.pdf:1-10, b.pdf:3, a.pdf:20-30' into a list of (input_file, PageSpec).
+
+    A part starting with a file name begins a new segment. Any part without a file name carries on the page spec of the segment before it, so 'a.pdf:1-3,7, b.pdf' is pages 1 to 3 and 7 of a.pdf followed by all of b.pdf."""
+    segments = []
+    for part in plan_string.split(","):
+        if match := ASSEMBLY_SEGMENT_PATTERN.match(part):
+            segments.append([match.group("file").strip(), [match.group("pages") or "all"]])
+        elif segments:
+            segments[-1][1].append(part)
+        else:
+            raise TypeError("Invalid input. An assembly plan should start with a PDF file name, e.g. 'a.pdf:1-10, b.pdf:3'.")
+    return [(input_file, compile_page_spec(",".join(page_parts))) for input_file, page_parts in segments]
+
+def assemble_pdf(plan, output_dir, output_file_name="assembledpdf", fast_path=False):
+    '''Builds one PDF from pages of several inputs in a single pass, without writing any intermediate PDFs. plan is an assembly plan string (see compile_assembly_plan), or a list of (input_file, pages) where pages is a page spec string, a PageSpec, a list of page numbers starting from 1, or None for every page.
+
+    Each input is opened once, however many segments use it, and its objects are shared between those segments. Returns the destination.'''
+    if isinstance(plan, str):
+        plan = compile_assembly_plan(plan)
+
+    segments = []
+    for input_file, pages_to_use in plan:
+        sanitized_input = pdfmerge.sanitize_input(input_file)
+        # Check that the input file exists
+        pdfmerge.check_inputs(sanitized_input)
+        segments.append((sanitized_input, pages_to_use))
+
+    pdfmerge.check_folder(output_dir)
+
+    destination = pdfmerge.sanitize_file_path(output_dir, output_file_name)
+
+    pdfmerge.check_output_file_exists(destination)
+
+    sources = {}
+    try:
+        with open_output(destination) as f:
+            writer = pdfstream.StreamingPdfWriter(f)
+            for sanitized_input, pages_to_use in segments:
+                if sanitized_input not in sources:
+                    sources[sanitized_input] = pdfstream.open_source(sanitized_input, fast_path)
+                source = sources[sanitized_input]
+
+                if pages_to_use is None:
+                    page_numbers = None
+                else:
+                    if isinstance(pages_to_use, str):
+                        pages_to_use = compile_page_spec(pages_to_use)
+                    if isinstance(pages_to_use, PageSpec):
+                        pages_to_use = pages_to_use.resolve(source.number_of_pages())
+                    page_numbers = [page_no - 1 for page_no in pages_to_use]
+
+                print(f"{sanitized_input}: {pages_to_use if pages_to_use is not None else 'all pages'}")
+                pdfstream.append_source(writer, source, page_numbers)
+            writer.close()
+    finally:
+        for source in sources.values():
+            source.close()
+
+    print(f"Output file to {destination}")
+    return destination
+
+# A single comma separated part of a page spec: 'odd', 'even', 'all', or a page or range of pages. A page is a number
+# starting from 1, a negative number counting back from the last page (-1 is the last page), or 'last'.
+PAGE_SPEC_PART_PATTERN = re.compile(r"^\s*(?:(?P<selector>odd|even|all)|(?P<start>last|-?[0-9]+)(?:\s*-\s*(?P<stop>last|-?[0-9]+))?)\s*$", re.IGNORECASE)
+
+class PageSpec:
+    """A compiled page spec. Pages are kept as runs of (start, stop, step), with stop included, rather than as a list of every page, so '1-2000000' takes as little memory as '1'.
+
+    Runs may use negative page numbers (counting back from the last page), with a step of None if the direction depends on where they land, until the spec is resolved against a page count with resolve() or clip(). A resolved spec can be iterated, measured with len(), tested with 'in', and combined with union(), intersection() and difference(), which work on the runs directly and return specs in ascending page order.
+
+    Use compile_page_spec to create one from a string."""
+
+    def __init__(self, runs=(), resolved=True, ascending=False):
+        self.runs = list(runs)
+        self.resolved = resolved
+        self.ascending = ascending
+
+    @classmethod
+    def all_pages(cls, number_of_pages):
+        """Every page of a document, in order."""
+        return cls([(1, number_of_pages, 1)] if number_of_pages > 0 else [], ascending=True)
+
+    @classmethod
+    def from_pages(cls, pages):
+        """Builds an ascending spec from any iterable of page numbers, without duplicates."""
+        runs = []
+        for page in sorted(set(pages)):
+            if runs and runs[-1][1] + 1 == page:
+                runs[-1] = (runs[-1][0], page, 1)
             else:
-                raise TypeError("Invalid page range. Type individual page_no_list separated by commas and ranges with -.")
+                runs.append((page, page, 1))
+        return cls(runs, ascending=True)
+
+    def resolve(self, number_of_pages, clip=False):
+        """Returns a resolved copy of this spec for a document with number_of_pages pages. Raises an IndexError for pages beyond the document, or drops them if clip is True. 'odd', 'even' and 'all' never raise; they are empty when the document has too few pages for them."""
+        runs = []
+        for start, stop, step in self.runs:
+            # 'odd', 'even' and 'all' are the only runs which have a step before they are resolved and end at 'last'.
+            # They name no particular page, so on a document too short for them (e.g. 'even' on one page) they are
+            # just empty, rather than out of the document.
+            selector = step is not None and stop < 0
+            # Negative pages count back from the last page.
+            start = start if start > 0 else number_of_pages + 1 + start
+            stop = stop if stop > 0 else number_of_pages + 1 + stop
+            if step is None:
+                step = 1 if stop >= start else -1
+
+            if clip:
+                if step > 0:
+                    # Move the start up to the first page of the run which is in the document.
+                    if start < 1:
+                        start += -(-(1 - start) // step) * step
+                    stop = min(stop, number_of_pages)
+                else:
+                    if start > number_of_pages:
+                        start -= -(-(start - number_of_pages) // -step) * -step
+                    stop = max(stop, 1)
+            elif selector and start > stop:
+                continue
+            elif not (1 <= start <= number_of_pages and 1 <= stop <= number_of_pages):
+                raise IndexError(f"Pages {start} to {stop} are not all within the document, which has {number_of_pages} pages.")
+
+            if (step > 0 and start <= stop) or (step < 0 and start >= stop):
+                runs.append((start, stop, step))
+        return PageSpec(runs, ascending=self.ascending)
+
+    def clip(self, number_of_pages):
+        """Resolves this spec, dropping any pages beyond the document."""
+        return self.resolve(number_of_pages, clip=True)
+
+    def ranges(self):
+        """Returns the runs as range objects."""
+        if not self.resolved:
+            raise ValueError("This page spec uses negative pages, 'last', 'odd', 'even' or 'all'. Resolve it against the number of pages first.")
+        return [range(start, stop + (1 if step > 0 else -1), step) for start, stop, step in self.runs]
+
+    def __iter__(self):
+        if self.ascending:
+            # Runs with a step may interleave (e.g. the odd and even pages of a range), so merge them back in order.
+            return heapq.merge(*self.ranges())
+        return itertools.chain.from_iterable(self.ranges())
+
+    def __len__(self):
+        return sum(len(page_range) for page_range in self.ranges())
+
+    def __contains__(self, page):
+        return any(page in page_range for page_range in self.ranges())
+
+    def __bool__(self):
+        return any(self.ranges())
+
+    def __eq__(self, other):
+        return isinstance(other, PageSpec) and self.runs == other.runs and self.resolved == other.resolved
+
+    def __repr__(self):
+        return f"PageSpec({self})"
+
+    def __str__(self):
+        parts = []
+        for start, stop, step in self.runs:
+            if not self.resolved:
+                start, stop = ("last" if start == -1 else start), ("last" if stop == -1 else stop)
+            if step == 2 and stop == "last":
+                parts.append("odd" if start == 1 else "even")
+            elif start == stop:
+                parts.append(f"{start}")
+            elif step is None or abs(step) == 1:
+                parts.append(f"{start}-{stop}")
+            else:
+                parts.append(f"{start}-{stop} (every {abs(step)})")
+        return ", ".join(parts)
+
+    def union(self, other):
+        return _combine_page_specs(self, other, lambda in_self, in_other: in_self or in_other)
+
+    def intersection(self, other):
+        return _combine_page_specs(self, other, lambda in_self, in_other: in_self and in_other)
+
+    def difference(self, other):
+        return _combine_page_specs(self, other, lambda in_self, in_other: in_self and not in_other)
+
+def _ascending_runs(spec):
+    """Returns the runs of a resolved spec as (first, last, step) with a positive step."""
+    runs = []
+    for page_range in spec.ranges():
+        if page_range:
+            runs.append((min(page_range[0], page_range[-1]), max(page_range[0], page_range[-1]), abs(page_range.step)))
+    return runs
+
+# _combine_page_specs works on sets of pages instead of runs when the runs average this many pages or fewer.
+SET_FALLBACK_PAGES_PER_RUN = 4
+
+def _combine_page_specs(spec_a, spec_b, keep):
+    """Combines two resolved specs into an ascending spec containing the pages for which keep(in_a, in_b) is true.
+
+    The page numbers are cut into segments at every start and end of a run, so that within a segment each run either covers the whole segment or none of it. Within a segment membership repeats every lcm(steps) pages, so each segment only needs one check per page of that period.
+
+    The segments are swept in order, adding the runs which start at each boundary to the active ones and dropping those which end there, so that thousands of scattered runs (e.g. every other page of a long document) cost one pass rather than a scan of every run for every segment."""
+    runs_a = _ascending_runs(spec_a)
+    runs_b = _ascending_runs(spec_b)
+
+    # When the runs are mostly single pages, as with a list of scattered pages, there is nothing to gain from working on
+    # runs, and sets of the pages are quicker.
+    if sum((last - first) // step + 1 for first, last, step in runs_a + runs_b) <= SET_FALLBACK_PAGES_PER_RUN * (len(runs_a) + len(runs_b)):
+        pages_a = set(itertools.chain.from_iterable(range(first, last + 1, step) for first, last, step in runs_a))
+        pages_b = set(itertools.chain.from_iterable(range(first, last + 1, step) for first, last, step in runs_b))
+        return PageSpec.from_pages(page for page in pages_a | pages_b if keep(page in pages_a, page in pages_b))
+
+    boundaries = sorted({first for first, _, _ in runs_a + runs_b} | {last + 1 for _, last, _ in runs_a + runs_b})
+
+    # Per spec: the runs by first page and by the page after their last, and the active runs with how many times each
+    # is in the spec, as a spec may hold the same run twice.
+    sweeps = []
+    for runs in (runs_a, runs_b):
+        sweeps.append((sorted(runs), sorted(runs, key=lambda run: run[1]), {}, [0, 0]))
+
+    result = []
+    for segment_start, segment_end in zip(boundaries, boundaries[1:]):
+        segment_last = segment_end - 1
+        for by_first, by_end, active, positions in sweeps:
+            while positions[0] < len(by_first) and by_first[positions[0]][0] <= segment_start:
+                run = by_first[positions[0]]
+                active[run] = active.get(run, 0) + 1
+                positions[0] += 1
+            while positions[1] < len(by_end) and by_end[positions[1]][1] < segment_start:
+                run = by_end[positions[1]]
+                active[run] -= 1
+                if not active[run]:
+                    del active[run]
+                positions[1] += 1
+        active_a = list(sweeps[0][2])
+        active_b = list(sweeps[1][2])
+        if not active_a and not active_b:
+            continue
+
+        period = 1
+        for _, _, step in active_a + active_b:
+            period = period * step // math.gcd(period, step)
+
+        kept_offsets = []
+        for offset in range(min(period, segment_end - segment_start)):
+            page = segment_start + offset
+            in_a = any((page - first) % step == 0 for first, _, step in active_a)
+            in_b = any((page - first) % step == 0 for first, _, step in active_b)
+            if keep(in_a, in_b):
+                kept_offsets.append(offset)
+
+        if len(kept_offsets) == period:
+            # Every page of the segment is kept.
+            new_runs = [(segment_start, segment_last, 1)]
         else:
-            try:
-                page_no_list.append(int(page_no))
-            except:
-                raise TypeError("Invalid input. Type individual pages separated by commas and ranges with -.")
-    return page_no_list
-        
-        
+            new_runs = [(segment_start + offset, segment_start + offset + (segment_last - segment_start - offset) // period * period, period) for offset in kept_offsets]
+
+        for first, last, step in new_runs:
+            if first == last:
+                step = 1
+            # Join runs which carry on where the previous one stopped. A single page can join a run of any step.
+            if result:
+                previous_first, previous_last, previous_step = result[-1]
+                if previous_first == previous_last:
+                    previous_step = step
+                if first == last:
+                    step = previous_step
+                if previous_step == step and previous_last + step == first:
+                    result[-1] = (previous_first, last, step)
+                    continue
+            result.append((first, last, step))
 
+    return PageSpec(result, ascending=True)
 
+def compile_page_spec(page_string):
+    """Compiles a page spec string such as '1,2,4,5-10,3,4' into a PageSpec.
 
+    Parts are separated by commas. A part is a page, a range of pages 'start-end' (written backwards like '10-8' for the pages in reverse), or 'odd', 'even' or 'all'. A page can also be 'last' or a negative number counting back from the last page, so '-3-last' is the last three pages. Specs using any of these must be resolved against the number of pages, which rearrange_pdf and remove_pages_from_pdf do."""
+    runs = []
+    resolved = True
+    for part in page_string.split(","):
+        match = PAGE_SPEC_PART_PATTERN.match(part)
+        if match is None:
+            raise TypeError("Invalid input. Type individual pages separated by commas and ranges with -.")
+
+        if selector := match.group("selector"):
+            resolved = False
+            selector = selector.lower()
+            if selector == "all":
+                runs.append((1, -1, 1))
+            else:
+                runs.append((1 if selector == "odd" else 2, -1, 2))
+            continue
+
+        start = -1 if match.group("start").lower() == "last" else int(match.group("start"))
+        stop = start if match.group("stop") is None else (-1 if match.group("stop").lower() == "last" else int(match.group("stop")))
+        if start == 0 or stop == 0:
+            raise TypeError("Invalid input. Pages start from 1.")
+
+        if start < 0 or stop < 0:
+            # The direction of a range with a negative end is only known once the number of pages is, so it is left
+            # for resolve() to work out.
+            resolved = False
+            step = None
+        else:
+            step = 1 if stop >= start else -1
+        runs.append((start, stop, step))
+    return PageSpec(runs, resolved=resolved)
+
+def make_list_of_pages_from_string(page_string):
+    """Creates a list of pages to be sent into rearrange_pdf from an input string. Prefer compile_page_spec, which does not expand ranges into lists and can be passed to rearrange_pdf and remove_pages_from_pdf directly."""
+    return list(compile_page_spec(page_string))
 
 if __name__ == "__main__":
 
@@ -0,0 +1,249 @@
+"""
+Breadth-first crawl engine for pdffromlinks. Pages are fetched level by level from a frontier queue, with a limit on how many fetches run at the same time overall and per host, so that a crawl of a few thousand pages does not wait on one page at a time.
+
+The links are returned in the order the recursive gather_links_within_links returned them, which is depth first: each page is followed by the links on it, in document order, each of which is followed in turn by the links found through it, before the next link on the page. That order decides the order of the pages in the merged PDF, so it is kept, but the pages are not fetched in it. They are fetched level by level, concurrently, and the links on each page are kept, so that once the crawl is done the depth-first order can be rebuilt from them (see depth_first_order). The result does not depend on which page happened to load first.
+
+Every link the recursive crawl found is found here too, and a few more. It gave a page the depth of the first path it happened to reach it by, so max_depth could cut off pages which are within max_depth of the start page by a shorter path, and once it had followed the first new link on a page, it marked the rest of that page's links as seen, so it never followed them. Here every page within max_depth is fetched.
+
+With a priority other than depth (see pdfschedule), the highest ranked pages are fetched first instead, and with a budget, the crawl stops once it runs out and returns what it has found.
+
+There is no recursion, so the depth of a crawl is not limited by sys.getrecursionlimit().
+"""
+
+import asyncio
+import collections
+import concurrent.futures
+import heapq
+import time
+import urllib.parse
+
+import pdfhttp
+import pdfjournal
+import pdfschedule
+import pdfurls
+
+
+# How many pages may be fetched at the same time, overall and from any one host.
+DEFAULT_CONCURRENCY = 16
+DEFAULT_PER_HOST_CONCURRENCY = 4
+
+
+def fetch_page(url, session=None, snapshots=None, with_url=False):
+    """Fetches a page and returns its body as bytes, or with with_url=True, (final_url, body), where final_url is the URL after any redirects, which the relative links on the page resolve against. Uses the shared pdfhttp session unless another one is given. If snapshots (a pdfsnapshot.SnapshotStore) is given, the page is saved in it as well, so that it can be rendered without being downloaded again."""
+    response = (session or pdfhttp.default_session()).get(url)
+    if snapshots is not None:
+        snapshots.save(url, response.url, response.body, response.headers.get("Content-Type"))
+    return (response.url, response.body) if with_url else response.body
+
+
+def depth_first_order(start_html_page, links, page_links):
+    """
+    Returns links, every link found by a crawl from start_html_page, in the order the recursive gather_links_within_links gave them: each page, then the links on it in order, each followed by the links found through it, before the next link on the page. page_links maps each page which was fetched to the links on it, in order. Links on a page which are not in links are passed over.
+
+    Links which cannot be reached that way, such as the pages of a journal whose links were not recorded, come last, in the order they are in links.
+    """
+    wanted = set(links)
+    order = []
+    placed = set()
+    # A stack of iterators over the links of the pages being gone through, rather than recursion.
+    stack = [iter([start_html_page])]
+    while stack:
+        link = next(stack[-1], None)
+        if link is None:
+            stack.pop()
+            continue
+        if link not in wanted or link in placed:
+            continue
+        placed.add(link)
+        order.append(link)
+        if link in page_links:
+            stack.append(iter(page_links[link]))
+    order.extend(link for link in links if link not in placed)
+    return order
+
+
+def host_of(url):
+    """Returns the host (and port, if any) of a URL, which is what the per-host limit is keyed on."""
+    return urllib.parse.urlsplit(url).netloc.lower()
+
+
+async def crawl_async(start_html_page, extract_links, max_depth=1, concurrency=DEFAULT_CONCURRENCY, per_host_concurrency=DEFAULT_PER_HOST_CONCURRENCY, fetch=None, session=None, visited=None, journal=None, snapshots=None, budget=None, priority=None):
+    """
+    Crawls from start_html_page and returns every link found, without duplicates, highest priority first. By default the pages are fetched breadth-first, and the links are returned depth first, as gather_links_within_links always returned them (see the module docstring).
+
+    extract_links -> Called with the URL each page was fetched from, after any redirects, and its body. Returns the links on that page, in order.
+
+    max_depth -> How many levels of pages are fetched. With max_depth=1 (or 0), only the start page is fetched, and the links on it are returned. With max_depth=2, each of those links is fetched as well, and so on.
+
+    fetch -> Called with a URL and returns the body, or (final URL, body). It is blocking, so it is run in a thread pool of size concurrency. By default, pages are fetched with session, or if there is none, with a pdfhttp.HttpSession of the crawl's own, so that connections to each host are kept alive and reused for the whole crawl.
+
+    snapshots -> A pdfsnapshot.SnapshotStore, which every page fetched by the default fetch is saved in.
+
+    visited -> The set which links are checked against to leave out repeats. It only needs add(), which returns True for a new link. By default, a pdfurls.HashedUrlSet, which keeps a 64-bit hash of each link rather than the link itself. Pass a pdfurls.DiskUrlSet to keep it out of memory altogether.
+
+    journal -> A pdfjournal.Journal. Every link found, and every page fetched or failed, is recorded in it as the crawl goes. If it already holds a crawl, that crawl is carried on instead of starting again from start_html_page: only the pages which were not fetched, or which failed, are fetched.
+
+    budget -> A pdfschedule.Budget, or a dict of its limits. When it runs out, no more pages are fetched, and the links found so far are returned.
+
+    priority -> Which pages are fetched first: 'depth' (the default), 'prefix', or a scoring hook; see pdfschedule. With 'depth', a whole level is fetched at a time. Otherwise, the 'concurrency' highest ranked pages are fetched at a time, and their links are ranked before the next pages are picked.
+
+    If the start page cannot be fetched, the error is raised. Any other page which cannot be fetched is reported and skipped; it stays in the list of links, but its own links are not followed.
+    """
+
+    # Pages on these levels are fetched. The deepest level's links are returned but not fetched.
+    fetch_levels = max(max_depth, 1)
+
+    if visited is None:
+        visited = pdfurls.HashedUrlSet()
+
+    budget = pdfschedule.budget_from(budget)
+    budget.start()
+    rank = pdfschedule.priority_from(priority, start_html_page)
+    by_level = priority in (None, "depth")
+
+    # Every link found, as (rank, discovery position, url), and the frontier of pages to fetch, as a heap of
+    # (rank, discovery position, url, depth). With ranking by depth, every level comes off the heap in discovery order.
+    found = []
+    frontier = []
+
+    def add_link(url, depth):
+        entry = (rank(url, depth), len(found), url)
+        found.append(entry)
+        if depth < fetch_levels:
+            heapq.heappush(frontier, (*entry, depth))
+
+    # The links on pages which were fetched before the crawl was stopped, but whose round was not finished.
+    fetched = {}
+    # The links on every page fetched, in order, from which the depth-first order is rebuilt at the end.
+    page_links_of = {}
+
+    state = journal.crawl_state() if journal is not None else []
+    if state:
+        for url, depth, status, page_links in state:
+            visited.add(url)
+            if page_links is not None and by_level:
+                page_links_of[url] = page_links
+            if status == pdfjournal.DONE:
+                found.append((rank(url, depth), len(found), url))
+                continue
+            add_link(url, depth)
+            if status == pdfjournal.FETCHED:
+                fetched[url] = page_links
+        print(f"Resuming the crawl with {len(found)} links found and {len(frontier)} page(s) left to fetch.")
+    else:
+        visited.add(start_html_page)
+        add_link(start_html_page, 0)
+        if journal is not None:
+            journal.add_links([start_html_page], 0)
+
+    own_session = fetch is None and session is None
+    if own_session:
+        session = pdfhttp.HttpSession(max_idle_per_host=per_host_concurrency)
+    if fetch is None:
+        fetch = lambda url: fetch_page(url, session, snapshots, with_url=True)
+
+    loop = asyncio.get_running_loop()
+    global_limit = asyncio.Semaphore(concurrency)
+    host_limits = collections.defaultdict(lambda: asyncio.Semaphore(per_host_concurrency))
+
+    async def visit(url, depth):
+        """Returns the links on the page, or None if the budget ran out before it was fetched."""
+        if url in fetched:
+            return fetched.pop(url)
+        # The host's slot is taken before a global one, so that pages waiting on a busy host do not hold global slots
+        # which pages on other hosts could use.
+        async with host_limits[host_of(url)], global_limit:
+            if not budget.take_page():
+                return None
+            start = time.perf_counter()
+            try:
+                fetched_page = await loop.run_in_executor(executor, fetch, url)
+            except Exception as e:
+                if journal is not None:
+                    journal.page_failed(url, str(e))
+                if depth == 0:
+                    raise
+                print(f"Error fetching {url}: {str(e)}")
+                return []
+            page_url, body = fetched_page if isinstance(fetched_page, tuple) else (url, fetched_page)
+            budget.received(len(body))
+            print(f"Fetched {url} in {time.perf_counter() - start:.2f} s")
+        page_links = extract_links(page_url, body)
+        if journal is not None:
+            journal.page_fetched(url, page_links)
+        return page_links
+
+    def next_round():
+        """Takes the next pages to fetch off the frontier: the whole of the next level, or the highest ranked pages."""
+        size = len(frontier) if by_level else concurrency
+        if (pages_left := budget.pages_left()) is not None:
+            size = min(size, pages_left + len(fetched))
+        pages = []
+        while frontier and len(pages) < size and (not by_level or not pages or frontier[0][0] == pages[0][0]):
+            entry = heapq.heappop(frontier)
+            pages.append((entry[0], entry[2], entry[3]))
+        return pages
+
+    async def crawl_frontier():
+        nonlocal unfetched
+        while frontier and budget.exhausted() is None:
+            pages = next_round()
+            depth = pages[0][2]
+            if by_level:
+                print(f"Current depth is {depth + 1}. Max Depth is {max_depth}. Fetching {len(pages)} page(s).")
+            else:
+                print(f"Fetching the {len(pages)} highest ranked page(s), from depth {depth + 1} to {max(page[2] for page in pages) + 1}. Max Depth is {max_depth}. {len(frontier)} page(s) are waiting.")
+
+            results = await asyncio.gather(*(visit(url, depth) for _, url, depth in pages))
+
+            new_links = []
+            for (_, url, depth), page_links in zip(pages, results):
+                if page_links is None:
+                    # Left pending in the journal, so a crawl carried on from it fetches the page.
+                    unfetched += 1
+                    continue
+                if budget.max_links_per_page is not None:
+                    # The highest ranked first; sorted() keeps links ranked the same in document order.
+                    page_links = sorted(page_links, key=lambda link: rank(link, depth + 1))
+                taken = 0
+                for position, link in enumerate(page_links):
+                    if budget.max_links_per_page is not None and taken >= budget.max_links_per_page:
+                        page_links = page_links[:position]
+                        break
+                    if not visited.add(link):
+                        continue
+                    taken += 1
+                    new_links.append((link, depth + 1))
+                    add_link(link, depth + 1)
+                if by_level:
+                    page_links_of[url] = page_links
+
+            # A round is only recorded as done together with the links it added, so a crawl stopped in between
+            # takes up the round again from the links recorded for each page.
+            if journal is not None:
+                journal.expand([url for _, url, _ in pages], new_links)
+
+    # Pages which the budget ran out before.
+    unfetched = 0
+
+    try:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as executor:
+            await crawl_frontier()
+    finally:
+        if session is not None:
+            print(session.report())
+        if own_session:
+            session.close()
+
+    if (reason := budget.exhausted()) is not None and (unfetched or frontier):
+        print(f"Stopped the crawl, as {reason}: {budget.report()} {unfetched + len(frontier)} page(s) were left unfetched. Returning the {len(found)} links found, highest ranked first.")
+
+    links = [url for _, _, url in sorted(found)]
+    if by_level and links:
+        return depth_first_order(links[0], links, page_links_of)
+    return links
+
+
+def crawl(start_html_page, extract_links, max_depth=1, concurrency=DEFAULT_CONCURRENCY, per_host_concurrency=DEFAULT_PER_HOST_CONCURRENCY, fetch=None, session=None, visited=None, journal=None, snapshots=None, budget=None, priority=None):
+    """Runs crawl_async to completion. See crawl_async for the arguments."""
+    return asyncio.run(crawl_async(start_html_page, extract_links, max_depth, concurrency, per_host_concurrency, fetch, session, visited, journal, snapshots, budget, priority))
@@ -20,9 +20,9 @@ To make this work, you will need to set your PATH_TO_WKHTMLTOPDF_EXE to the loca
 
     
 
-At the moment, this file also writes a LINKS_.txt file to keep all the links, and also to keep track of any split files. This is needed because the download_to_pdf function can be rather unreliable when used repeatedly. 
+Every job keeps a journal, JOURNAL_<file_name>.sqlite in the output folder, of all the links found, the pages fetched and the links rendered, with the reason for any which failed (see pdfjournal). This is needed because wkhtmltopdf can be rather unreliable when used repeatedly. If a job is stopped partway, resume_download carries it on where it stopped, and only fetches and renders what was not done yet.
 
-If the file size of a particular file is too small, it is likely there was an error and the page could not be fetched. In that case, please use the list written in LINKS_.txt for the relevant file and use download_as_pdf on the relevant list of links directly.
+If a link could not be rendered, pdfjournal.Journal(path).failed_links() lists it with the reason, and the links can be given to download_as_pdf directly.
 
 See example.py for an example of how to implement this.
 
@@ -34,20 +34,35 @@ NOTE: Sometimes the number of pages or filesize may vary slightly because the el
 """
 
 
+import contextlib
 import os
-# This is to get all the links on each page so we can feed it into our pdf extractor
-from bs4 import BeautifulSoup
-import urllib.request
 import re
 import pdfkit
 import math
 import sys
+import tempfile
+
+import pdfcrawl
+import pdffrontier
+import pdfhttp
+import pdfjournal
+import pdfprofiles
+import pdfreadiness
+# This is to get all the links on each page so we can feed it into our pdf extractor
+import pdflinks
+import pdfrender
+import pdfschedule
+import pdfsnapshot
+import pdfurls
 
 CURRENT_RECURSION_LIMIT = sys.getrecursionlimit()
 
 
 PATH_TO_WKHTMLTOPDF_EXE = 'wkhtmltopdf/bin/wkhtmltopdf.exe'
 
+# The arguments of download_all_pdf which a journal has to have been recorded with, for the job to be resumed from it.
+JOB_ARGUMENTS = ("start_html_page", "root_html_page", "regex_link_filter", "max_depth", "attribute", "html_tag", "wkhtmltopdf", "options", "readiness", "profile", "budget", "priority")
+
 def check_integer(input_string):
     if re.search(r"[^0-9]", input_string):
         raise ValueError("Input should be an integer.")
@@ -55,7 +70,9 @@ def check_integer(input_string):
         return int(input_string)
 
 def check_and_set_recursion_depth(max_depth):
-    """If the max_depth is lower than the current recursion limit, nothing changes. If the max depth is higher, this function tries to set the recursion depth to the specified max depth. If it fails, it will raise an overflow error early. 200 is added to the max_depth just as a safety buffer."""
+    """No longer needed by gather_links_within_links, which does not recurse, but kept for scripts which call it.
+
+    If the max_depth is lower than the current recursion limit, nothing changes. If the max depth is higher, this function tries to set the recursion depth to the specified max depth. If it fails, it will raise an overflow error early. 200 is added to the max_depth just as a safety buffer."""
     SAFETY_BUFFER = 200
 
     # Checking that max_depth is not too close to the maximum number of allowed recursions.
@@ -71,7 +88,20 @@ def check_and_set_recursion_depth(max_depth):
     else: 
         return max_depth
 
-def gather_links(start_html_page, root_html_page, regex_link_filter=r"(?!.*feed\.xml)(?!\#)", attribute='href', html_tag='a'):
+def extract_links(html_page, root_html_page, regex_link_filter=r"(?!.*feed\.xml)(?!\#)", attribute='href', html_tag='a', link_set=None, backend="stream"):
+    """
+    Returns the links on an already fetched page which fit the required criteria, in the order they appear, completed with root_html_page where they are relative. See gather_links for the arguments.
+
+    html_page -> The page, as a string, bytes or an open file.
+
+    link_set -> Links which should be left out, for example because they have already been found. This set is not modified.
+
+    backend -> 'stream' parses the page without building a tree; 'soup' uses BeautifulSoup. See pdflinks. When extracting links from many pages, make one pdflinks.LinkExtractor and reuse it instead, so that the filter is compiled once.
+    """
+    return pdflinks.LinkExtractor(root_html_page, regex_link_filter, attribute, html_tag, backend).extract(html_page, link_set)
+
+
+def gather_links(start_html_page, root_html_page, regex_link_filter=r"(?!.*feed\.xml)(?!\#)", attribute='href', html_tag='a', backend="stream"):
     """
     Gathers all the links fitting the required criteria in a list. Takes as arguments: Returns the list.
 
@@ -86,120 +116,81 @@ def gather_links(start_html_page, root_html_page, regex_link_filter=r"(?!.*feed\
     'attribute' -> The html attribute to search for. Generally 'href'.
 
     'html_tag' -> The html tag to search for, generally 'a'.
+
+    'backend' -> How the page is parsed. See extract_links.
     """
 
-    # Our search starts at the start_html_page and moves on recursively through the links therein. 
+    # We fetch the start_html_page over the shared keep-alive session (see pdfhttp) and store it as html_page
+    html_page = pdfcrawl.fetch_page(start_html_page)
 
     # All our links will be appended to this list. We initialise it with start_html_page, as the search itself will not return this page.
-    links = [start_html_page]
+    return [start_html_page] + extract_links(html_page, root_html_page, regex_link_filter, attribute, html_tag, link_set={start_html_page}, backend=backend)
 
-    # link_set is to check to make sure that all the links which are added are unique. Using a set reduces time complexity for this operation to O(1)
-    link_set = set(links)
-    
-    # We open the start_html_page with urllib.request (urllib2 in Python 2) and store it as html_page
-    html_page = urllib.request.urlopen(start_html_page)
-
-    # BeautifulSoup parses the HTML page. 
-    soup = BeautifulSoup(html_page, features="html.parser")
-    
-    # soup.findAll will return a list of all the links (by default found with html_tag='a' and attrs='href': 'http(s)?://)
-    for link in soup.findAll(name=html_tag, attrs={attribute: re.compile(regex_link_filter)}):
-        print(link)
-        if (newlink:=link.get('href')) not in link_set:
-            print(f"{link} not in link_set")
-            # If the link begins with http/https:// or www. or has <something>.<something> (ad infinitum for co.uk etc)/, then we can take it to be a full link.
-            if re.match(r"http(s?)://", newlink) or re.match(r"www.", newlink) or re.search(r"(.+)(\.(.+))+/", newlink):
-                new_string = newlink
-            
-            # Otherwise, the link is likely truncated, and we must add it to the root_html_page.
-            else:
-                # If the newlink starts with a /, we simply append the page to the root_html_page
-                if re.match(r"/", newlink):
-                    new_string = f"{root_html_page}{newlink}"
-                # Otherwise, we add a slash in the middle
-                else:
-                    new_string = f"{root_html_page}/{newlink}"
-            
-            links.append(new_string)
-            link_set.add(new_string)
-        else:
-            print(f"{link} in new_set, moving on")
-    return links
 
+def gather_links_within_links(start_html_page, root_html_page,regex_link_filter=r"(?!.*feed\.xml)(?!\#)", attribute='href', html_tag='a', max_depth = 1, concurrency=pdfcrawl.DEFAULT_CONCURRENCY, per_host_concurrency=pdfcrawl.DEFAULT_PER_HOST_CONCURRENCY, session=None, backend="stream", canonicalizer=pdfurls.DEFAULT_CANONICALIZER, visited=None, journal=None, snapshots=None, processes=1, frontier_path=None, budget=None, priority=pdfschedule.DEFAULT_PRIORITY):
+    """
+    Performs gather_links, but also appends to the list every link which meets the same requirements which can be found within each link. Set how many levels of links are followed with max_depth.
 
+    The pages are crawled breadth-first with pdfcrawl, fetching up to 'concurrency' pages at the same time, and at most 'per_host_concurrency' from any one host. Pass a pdfhttp.HttpSession as session to fetch through a cache, for example. The links are returned in the same order as ever, depth first: the start page, then each link on it followed by the links found through that link, before the next link on the start page (see pdfcrawl).
 
+    Links are canonicalized with canonicalizer (see pdfurls): relative links are joined against the page they are on, and '/a', '/a/', '/a#x' and 'https://host/a' all become one link, so each page is only fetched and rendered once. Pass canonicalizer=None to complete links with root_html_page instead, as gather_links does. visited is the set of links already seen; see pdfcrawl.crawl_async.
 
+    With a pdfjournal.Journal, the crawl is recorded as it goes, and a crawl already in the journal is carried on rather than started again. With a pdfsnapshot.SnapshotStore, every page fetched is saved in it, to be rendered by download_as_pdf without fetching it again.
 
-def gather_links_within_links(start_html_page, root_html_page,regex_link_filter=r"(?!.*feed\.xml)(?!\#)", attribute='href', html_tag='a', max_depth = 1, current_depth = 0, links=[], link_set=set()):
-    """
-    Performs gather_links, but also appends to the list every link which meets the same requirements which can be found within each link. In other words, this recursively finds more and more links. Set a recursion limit with max_depth. 
-    
-    The arguments, current_depth, links and link_set should not generally be modified. These are just to facilitate the recursion.
+    budget is a pdfschedule.Budget, or a dict of its limits: the most pages to fetch, bytes to download, seconds to run and links to take from any one page. When it runs out, the crawl stops and returns the links found so far. priority decides which pages are fetched first: 'depth' (breadth-first, as always), 'prefix' (those closest to start_html_page's folder), or a function score(url, depth) which returns a number, higher first. The links are returned highest ranked first. See pdfschedule.
 
-    However, it may be a good idea to reset these every time the function is called, especially if the function is being called multiple times in a row. Otherwise, you may face multiple repeated pages.
+    With processes above 1, the pages are fetched and parsed by that many worker processes, so that parsing is spread over the cores, sharing a frontier kept in a SQLite file at frontier_path, or in a temporary file (see pdffrontier). A crawl already in the frontier is carried on rather than started again, and more workers may join it while it runs. The links are the same, in the same order. Each worker fetches with a pdfhttp.HttpSession of its own, through the same cache as session if it has one; visited is not used, and a journal is only given the crawl once it is finished. Only pdfurls.DEFAULT_CANONICALIZER, or None, can be used.
 
     Do not use a slash at the end of the root_html_page name, or the links generated will be invalid.
     """
-    # Increase current_depth to prevent us from recursing too far.
-    current_depth += 1
-
-    # TODO - Rewrite this as an iterative function so it does not face the issues of memory that come with recursion.
-    
-    # This is to initialise the list with start_html_page
-    links.append(start_html_page)
 
+    # The filter is compiled once for the whole crawl.
+    extract = pdflinks.LinkExtractor(root_html_page, regex_link_filter, attribute, html_tag, backend, canonicalizer)
+
+    if canonicalizer is not None:
+        # The start page keeps the trailing slash of a directory, so that it is fetched as the directory and its relative links resolve against it.
+        start_html_page = canonicalizer(start_html_page, keep_trailing_slash=True) or start_html_page
+        # Links back to it without the slash are the same page.
+        if (canonical_start := canonicalizer(start_html_page)) != start_html_page:
+            if visited is None:
+                visited = pdfurls.HashedUrlSet()
+            visited.add(canonical_start)
+
+    if processes > 1:
+        if canonicalizer not in (None, pdfurls.DEFAULT_CANONICALIZER):
+            raise ValueError("Worker processes can only canonicalize links with pdfurls.DEFAULT_CANONICALIZER.")
+        if budget is not None or priority not in (None, "depth"):
+            raise ValueError("Worker processes crawl breadth-first without a budget.")
+        cache = session.cache if session is not None else None
+        settings = pdffrontier.crawl_settings(start_html_page, root_html_page, regex_link_filter, attribute, html_tag, max_depth, backend, canonicalizer is not None,
+                                              cache.path if cache is not None else None, cache.max_size if cache is not None else pdfhttp.DEFAULT_CACHE_SIZE, session is not None and session.offline,
+                                              snapshots.directory if snapshots is not None else None)
+        with contextlib.ExitStack() as stack:
+            if frontier_path is None:
+                frontier_path = os.path.join(stack.enter_context(tempfile.TemporaryDirectory()), "FRONTIER.sqlite")
+            return pdffrontier.crawl_processes(frontier_path, settings, processes, journal=journal, snapshots=snapshots)
+
+    return pdfcrawl.crawl(start_html_page, extract, max_depth, concurrency, per_host_concurrency, session=session, visited=visited, journal=journal, snapshots=snapshots, budget=budget, priority=priority)
     
-    link_set.add(start_html_page)
 
-    check_and_set_recursion_depth(max_depth)
+def download_as_pdf(link_or_list, file_name="outfile", folder_name=".", config =pdfkit.configuration(wkhtmltopdf=PATH_TO_WKHTMLTOPDF_EXE), options={"load-error-handling":"ignore"}, part_split=pdfrender.DEFAULT_MAX_CHUNK_LINKS, workers=pdfrender.DEFAULT_RENDER_WORKERS, timeout=pdfrender.DEFAULT_RENDER_TIMEOUT, render_cache=None, session=None, journal=None, snapshots=None, passthrough=False, readiness=pdfreadiness.DEFAULT_STRATEGY, profile=pdfprofiles.DEFAULT_PROFILE):
+    """Allows us to set the config within this function, create a folder if one does not already exist, and create a new file. Serves as a wrapper around pdfkit.from_url(). Returns False if a file already exists, causing an error, or if the operation is otherwise unsuccessful. Returns True if successful.
     
-    # To notify how far more we have to go based on the max_depth and current_depth.
-    print(f"Current depth is {current_depth}. Max Depth is {max_depth}.\nNumber of layers to go is {max_depth - current_depth}.")
-    print(links[-1])
-
-    # We first gather the links on the page itself.
-    current_links = list(dict.fromkeys(gather_links(start_html_page, root_html_page, regex_link_filter, attribute, html_tag)))
+    'options' -> To pass options to pdfkit
 
+    'profile' -> A named set of options the options are added to: 'default', 'draft' (no images or JavaScript, several times faster, for when only the text and links matter) or 'archive' (full quality images and an outline). See pdfprofiles.
 
-    # links.extend(current_links)
-    # links = list(dict.fromkeys(links))
-    # link_set.update(current_links)
-    
-    # Recursion base case. We set a max_depth to prevent an infinite loop if every single page we go into has additional links.
-    if current_depth >= max_depth:
-        links.extend(current_links)
-        links = list(dict.fromkeys(links))
-        link_set.update(current_links)
-        
-        return links
-
-    # This is to go into each link and get a list of every link in that link.
-    else:
-        
-        # We add the links and all the links that can be found on the pages within those links, assuming they are not within the link_set, which is passed in the arguments in the recursive gather_links_within_links.
-        for link in current_links:
-            if link not in link_set:
+    'readiness' -> When a page is ready to be rendered: 'fixed' (a fixed delay after loading), 'dom-ready' or 'network-quiet' (once nothing has changed for a while, up to a cap), or a pdfreadiness.Readiness with its own timings. How long each page waited is recorded in the journal. If the options already set window-status, run-script or javascript-delay, they decide instead.
 
-                # Recursive call, replacing start_html_page with link, and keeping all other parameters. 
-                new_links = gather_links_within_links(link, root_html_page, regex_link_filter, attribute, html_tag, max_depth, current_depth, links, link_set)
-                
-                links.extend(new_links)
-                links = list(dict.fromkeys(links))
-                link_set.update(current_links)
-                
-        # This is the fastest method to sanitize a list of non-unique values and retain the order, and relies on the fact that regular dicts retain insertion order. 
+    A list of links is rendered in chunks of at most part_split links, by up to 'workers' wkhtmltopdf processes at the same time, each of which is stopped after at most 'timeout' seconds. How many links each chunk gets is worked out as the rendering goes (see pdfrender.ChunkPlanner). The chunks are then merged, in link order, into the one output file.
 
-        return list(dict.fromkeys(links))
+    With a pdfrender.RenderCache as render_cache, each link is fetched with session (a pdfhttp.HttpSession) to check whether its HTML has changed, and only the pages which are not in the cache are rendered.
 
-        # See original by Raymond Hettinger at https://twitter.com/raymondh/status/944125570534621185
+    With passthrough=True, links which point at PDFs are downloaded as they are and merged in their place, rather than rendered, and links to anything else which is not a page, such as images and archives, are left out. See pdfclassify.
 
-        # See benchmarking done at this link https://www.peterbe.com/plog/
-    
+    With a pdfsnapshot.SnapshotStore as snapshots, the pages are rendered from the HTML saved there (fetching with session any which are not), rather than from the links.
 
-def download_as_pdf(link_or_list, file_name="outfile", folder_name=".", config =pdfkit.configuration(wkhtmltopdf=PATH_TO_WKHTMLTOPDF_EXE), options={"window-status":"ready","run-script":"window.setTimeout(function(){window.status='ready';}, 1000);","load-error-handling":"ignore"}):
-    """Allows us to set the config within this function, create a folder if one does not already exist, and create a new file. Serves as a wrapper around pdfkit.from_url(). Returns False if a file already exists, causing an error, or if the operation is otherwise unsuccessful. Returns True if successful.
-    
-    'options' -> To pass options to pdfkit"""
+    Which links were rendered, and why any failed, is recorded in journal (a pdfjournal.Journal), or if there is none, in JOURNAL_{file_name}.sqlite in the folder. If that journal records the same list of links from a run which was stopped, the links already rendered are not rendered again."""
     unexpected_errors = []
 
 
@@ -220,89 +211,37 @@ def download_as_pdf(link_or_list, file_name="outfile", folder_name=".", config =
 
         try:
 
-            # KNOWN ERROR: The download_as_pdf function appears to break with a list of more than around 200 links. Usually there is a [WinError206] for the length of the list being too long. Even if this error does not occur, too high a length usually results in the PDF file being unreadable or completely in plaintext. 
+            # KNOWN ERROR: wkhtmltopdf appears to break with a list of more than around 200 links. Usually there is a [WinError206] for the length of the list being too long. Even if this error does not occur, too high a length usually results in the PDF file being unreadable or completely in plaintext. 
 
-            # Current WORKAROUND: If the list length is greater than 100 we will split the PDF into parts of length 150 to feed into download_as_pdf.
+            # Current WORKAROUND: The list is rendered in chunks, sized as the rendering goes to stay within the command line limit, the memory and the failure rate seen so far, and never more than part_split links. The chunks are merged afterwards. A chunk which fails is split in half until only the bad links are left out. See pdfrender.ChunkPlanner.
 
-            # WORKAROUND 2: If the files do not come out right, please simply use download_as_pdf() individually on the lists of links recorded in the output txt file.
+            # WORKAROUND 2: If the files do not come out right, please simply use download_as_pdf() individually on the links the journal records as failed.
 
-            # WORKAROUND 3: If the pages come out as plaintext, set the 'javascript-delay' to a higher number (of milliseconds).
+            # WORKAROUND 3: If the pages come out as plaintext, give the readiness a longer quiet time or cap, or use a 'fixed' readiness with a longer delay.
+
+            options = pdfreadiness.readiness_from(readiness).apply(pdfprofiles.profile_options(profile, options))
 
-            # REDUNDANCY: This is repeated in download_all_pdf.
             if type(link_or_list) == list:
                 links = link_or_list
             
                 number_of_links = len(links)
 
-                # Serves as a number to split the PDF at. 
-                # TODO: Implement this as an argument to be passed in.
-                part_split = 150
-                if number_of_links <= part_split:
-                    print(f"\nCreating file: {folder_name}/{file_name}.pdf")
+                print(f"\nCreating file: {folder_name}/{file_name}.pdf")
 
-                    # Noting down all the links so we can retry downloading them if there are any errors
-                    with open(f"{folder_name}/LINKS_{file_name}.txt", "w") as f:
-                        
-                        f.write(f"{link_or_list}")
+                # Noting down all the links and how each one went, so we can retry or resume them if there are any errors
+                with contextlib.ExitStack() as stack:
+                    if journal is None:
+                        journal = stack.enter_context(pdfjournal.Journal(pdfjournal.journal_path(folder_name, file_name)))
 
-                    pdfkit.from_url(link_or_list, f'{folder_name}/{file_name}.pdf', configuration=config, options=options)
-                else:
-                    
-                    # Number of times we will split the file.
-                    max_counter = math.ceil(number_of_links / part_split)
-                    
-                    print(f"\nThere are too many (more than {part_split}) links ({number_of_links}). Splitting into {int(max_counter)} parts.")
+                    print(f"Number of links = {number_of_links}")
+                    destination, errors = pdfrender.render_links(links, folder_name, file_name, config, options, workers, timeout, part_split, render_cache, session, journal, snapshots, passthrough)
 
-                    # Indicates the number to be tacked on to the end of the file number and serves as a flag to stop splitting once we reach the end.
-                    counter = 0
-                    
-                    # Noting down all the links so we can retry downloading them if there are any errors
-                    with open(f"{folder_name}/LINKS_{file_name}.txt", "w") as f:
-                    
-                        f.write(f"Number of links = {number_of_links}\nSplitting into {max_counter} parts of {part_split} links each.")
-                        while counter < max_counter:
-                            try:
-                                new_file_name = f"{file_name}{counter + 1}"
-                                if counter < (max_counter - 1):
-                                    start_index = (counter * part_split)
-                                    end_index = ((counter + 1) * part_split)
-                                    print(f"\nCreating file: {folder_name}/{new_file_name}.pdf with links number {start_index + 1} to {end_index}")
-                                    
-                                    
-                                    split_link = links[start_index:end_index]
-                                    print(split_link)
-
-                                    f.write(f"Links number: {start_index + 1} to {end_index} \n{split_link}\n")
-
-                                    pdfkit.from_url(split_link, f'{folder_name}/{new_file_name}.pdf', configuration=config, options=options)
-
-                                elif counter == (max_counter - 1):
-                                    start_index = (counter * part_split)
-                                    end_index = number_of_links
-
-                                    print(f"\nCreating file: {folder_name}/{new_file_name}.pdf with links number {start_index + 1} to {end_index}")
-
-                                    split_link = links[start_index:end_index]
-                                    print(split_link)
-                                    
-                                    f.write(f"Links number: {start_index + 1} to {end_index} \n{split_link}\n")
-
-                                    pdfkit.from_url(split_link, f'{folder_name}/{new_file_name}.pdf', configuration=config, options=options)
-                                counter += 1
-                            except Exception as e:
-                                # Carries on despite errors so as not to disrupt flow if there are multiple files. In most cases, ProtocolErrors will occur. Comment out and type "raise" here to see more details if needed.
-
-                                print(f"Error for {folder_name}/{file_name}{counter + 1}.pdf: {str(e)}")
-
-                                f.write(f"ERROR for {folder_name}/{file_name}{counter + 1}.pdf: {str(e)}\n\n")
-
-                                unexpected_errors.append(e)
-
-
-                                counter += 1
+                    # Carries on despite errors so as not to lose the links which did render. Each error names the link which failed, to retry.
+                    unexpected_errors.extend(errors)
+                    print(journal.report())
                     
             elif type(link_or_list) == str:
-                pdfkit.from_url(link_or_list, f'{folder_name}/{file_name}.pdf', configuration=config, options=options)
+                pdfrender.render_chunk(link_or_list, f'{folder_name}/{file_name}.pdf', config, options, timeout)
             
         except FileNotFoundError as e:
             if "WinError 206" in str(e):
@@ -321,9 +260,27 @@ def download_as_pdf(link_or_list, file_name="outfile", folder_name=".", config =
 
 
 
-def download_all_pdf(start_html_page, root_html_page="", file_name="outfile", folder_name=".",regex_link_filter=r"http(s)?://(?!.*feed\.xml)(?!\#)", max_depth = 1, attribute='href', html_tag='a', config = pdfkit.configuration(wkhtmltopdf=PATH_TO_WKHTMLTOPDF_EXE),  options={"window-status":"ready","run-script":"window.setTimeout(function(){window.status='ready';}, 1000);","load-error-handling":"ignore"}, current_depth = 0, links=[], link_set=set()):
+def download_all_pdf(start_html_page, root_html_page="", file_name="outfile", folder_name=".",regex_link_filter=r"http(s)?://(?!.*feed\.xml)(?!\#)", max_depth = 1, attribute='href', html_tag='a', config = pdfkit.configuration(wkhtmltopdf=PATH_TO_WKHTMLTOPDF_EXE),  options={"load-error-handling":"ignore"}, use_cache=True, offline=False, cache_size=pdfhttp.DEFAULT_CACHE_SIZE, workers=pdfrender.DEFAULT_RENDER_WORKERS, timeout=pdfrender.DEFAULT_RENDER_TIMEOUT, use_render_cache=True, render_cache_size=pdfrender.DEFAULT_RENDER_CACHE_SIZE, use_journal=True, use_snapshots=True, passthrough=True, readiness=pdfreadiness.DEFAULT_STRATEGY, profile=pdfprofiles.DEFAULT_PROFILE, crawl_processes=1, budget=None, priority=pdfschedule.DEFAULT_PRIORITY):
 
     """Writes all links as well as links within those links up to a given recursion max_depth to a PDF file in a given folder name.
+
+    With use_cache=True, the pages fetched while gathering links are kept in HTTP_CACHE.sqlite in the folder, and revalidated on the next run, so that unchanged pages are not downloaded again. The cache holds at most cache_size bytes. With offline=True, links are gathered from the cache alone, without touching the network.
+
+    The links are rendered by up to 'workers' wkhtmltopdf processes at a time, each stopped after 'timeout' seconds, and merged into the one output file. See download_as_pdf.
+
+    With use_render_cache=True, each chunk of pages rendered is kept in the RENDER_CACHE folder in the output folder, keyed by the HTML of its pages, the options and the wkhtmltopdf version. On the next run, only the chunks with pages which changed are rendered again (see pdfrender.RenderCache). The render cache holds at most render_cache_size bytes.
+
+    With use_snapshots=True, every page is downloaded once: the HTML the crawl fetched is saved in the SNAPSHOTS folder in the output folder, with its <base> set to the page's URL, and wkhtmltopdf renders those files rather than downloading the pages again. The images, stylesheets and scripts the pages use are kept in one disk cache, ASSET_CACHE in the output folder, shared by all the wkhtmltopdf processes, unless the options set another cache-dir. See pdfsnapshot.
+
+    'readiness' decides when each page is ready to be rendered; by default, once it has stopped changing. 'profile' picks a named set of options, such as 'draft' for a run several times faster which keeps only the text and links. See download_as_pdf.
+
+    With passthrough=True, links to PDFs are downloaded as they are rather than rendered, and links which are neither pages nor PDFs are left out. Everything is merged in the order it was found. See download_as_pdf.
+
+    'budget' limits the crawl, and 'priority' decides which pages it fetches first, so that a crawl which would run for hours can be stopped early with the most useful links. For example, budget={"max_pages": 500, "max_time": 600} and priority='prefix'. A scoring hook given as priority is not recorded in the journal, so resume_download ranks by depth. See gather_links_within_links.
+
+    With crawl_processes above 1, the links are gathered by that many worker processes, which share a frontier kept in FRONTIER_{file_name}.sqlite in the folder until the job is done. If the job is stopped, the crawl is carried on from it. See gather_links_within_links.
+
+    With use_journal=True, the job is recorded in JOURNAL_{file_name}.sqlite in the folder as it goes (see pdfjournal). If the job is stopped before the output is written, calling download_all_pdf again with the same arguments, or resume_download with just the folder and file name, carries it on where it stopped: only the pages not fetched yet, and the links not rendered yet, are done again.
     
     Returns a list of links if successful, or False if unsuccessful."""
     
@@ -339,78 +296,72 @@ def download_all_pdf(start_html_page, root_html_page="", file_name="outfile", fo
             root_html_page = match.group(1)
         
 
-    links = gather_links_within_links(start_html_page, root_html_page, regex_link_filter, attribute, html_tag, max_depth, current_depth, links, link_set)
-
-    
-    # KNOWN ERROR: The download_as_pdf function appears to break with a list of more than around 200 links. Usually there is a [WinError206] for the length of the list being too long. Even if this error does not occur, too high a length usually results in the PDF file being unreadable or completely in plaintext. 
-
-    # Current WORKAROUND: If the list length is greater than 100 we will split the PDF into parts of length 100 to feed into download_as_pdf.
-
-    # WORKAROUND 2: If the files do not come out right, please simply use download_as_pdf() individually on the lists of links recorded in the output txt file.
-
-    # WORKAROUND 3: If the pages come out as plaintext, set the 'javascript-delay' to a higher number (of milliseconds).
-
-    # REDUNDANCY: This is repeated in download_as_pdf.
-    
-    number_of_links = len(links)
-
-    # Serves as a number to split the PDF at. 
-    # TODO: Implement this as an argument to be passed in.
-    part_split = 100
-    if number_of_links <= part_split:
-        print(f"\nCreating file: {folder_name}/{file_name}.pdf")
-
-        download_as_pdf(links, file_name, folder_name, config=config, options=options)
-    else:
-        
-        # Create folder here if needed as we will be opening a file in this block. Note that this is only required because with open is used here as well (because of the repetition of the file splitting function from download_as_pdf here)
-        try:
-            os.mkdir(folder_name)
-            print(f"Directory, '{folder_name}', created.")
-        except FileExistsError:
-            print(f"ERROR: Directory, '{folder_name}', already exists. Attempting to create file...")
-        # Number of times we will split the file.
-        max_counter = math.ceil(number_of_links / part_split)
-        
-        print(f"\nThere are too many (more than {part_split}) links ({number_of_links}. Splitting into {max_counter} parts.) ")
-
-        # Indicates the number to be tacked on to the end of the file number and serves as a flag to stop splitting once we reach the end.
-        counter = 0
-        
-        # Noting down all the links for each file so we can retry downloading them if there are any errors
-        with open(f"{folder_name}/LINKS_{file_name}.txt", "w") as f:
-                        
-            f.write(f"Number of links = {number_of_links}\nSplitting into {max_counter} parts of {part_split} links each.")
-            # This will be repeated in download_as_pdf in case download_as_pdf is called directly
-            while counter < max_counter:
-                new_file_name = f"{file_name}{counter + 1}"
-                if counter < (max_counter - 1):
-                    start_index = (counter * part_split)
-                    end_index = ((counter + 1) * part_split)
-                    print(f"\nCreating file: {folder_name}/{new_file_name}.pdf with links number {start_index + 1} to {end_index}")
-                    
-                    split_link = links[start_index:end_index]
-                    
-                    f.write(f"Links number: {start_index + 1} to {end_index} \n{split_link}\n")
-
-                    download_as_pdf(split_link, new_file_name, folder_name, config=config, options=options)
-                    
-
-                elif counter == (max_counter - 1):
-                    start_index = (counter * part_split)
-                    end_index = number_of_links
-
-                    print(f"\nCreating file: {folder_name}/{new_file_name}.pdf with links number {start_index + 1} to {end_index}")
-
-                    split_link = links[start_index:(end_index + 1)]
-                    
-                    f.write(f"Links number: {start_index + 1} to {end_index} \n{split_link}\n")
+    os.makedirs(folder_name, exist_ok=True)
+    render_cache = pdfrender.RenderCache(f"{folder_name}/RENDER_CACHE", render_cache_size) if use_render_cache else None
+
+    with contextlib.ExitStack() as stack:
+        journal = None
+        if use_journal:
+            journal = stack.enter_context(pdfjournal.Journal(pdfjournal.journal_path(folder_name, file_name)))
+            parameters = {"start_html_page": start_html_page, "root_html_page": root_html_page, "file_name": file_name, "folder_name": folder_name, "regex_link_filter": regex_link_filter, "max_depth": max_depth, "attribute": attribute, "html_tag": html_tag,
+                          "wkhtmltopdf": pdfrender.wkhtmltopdf_path(config), "options": options, "use_cache": use_cache, "cache_size": cache_size, "workers": workers, "timeout": timeout, "use_render_cache": use_render_cache, "render_cache_size": render_cache_size, "use_snapshots": use_snapshots, "passthrough": passthrough, "readiness": pdfreadiness.readiness_from(readiness).describe(), "profile": profile, "crawl_processes": crawl_processes,
+                          "budget": pdfschedule.budget_from(budget).describe(), "priority": priority if isinstance(priority, str) else None}
+            recorded = journal.parameters()
+            # A journal of a finished job, or of another job, is started afresh. Only what the output depends on has to match.
+            if "finished" in recorded or any(recorded.get(name) != parameters[name] for name in JOB_ARGUMENTS):
+                journal.reset()
+                # The frontier of the crawl goes with it.
+                remove_frontier(folder_name, file_name)
+            elif recorded:
+                print(f"Resuming the job recorded in {journal.path}.")
+            journal.set_parameters(parameters)
+
+        session = None
+        if use_cache or offline:
+            cache = stack.enter_context(pdfhttp.HttpCache(f"{folder_name}/HTTP_CACHE.sqlite", cache_size))
+            session = stack.enter_context(pdfhttp.HttpSession(cache=cache, offline=offline))
+
+        snapshots = None
+        if use_snapshots:
+            snapshots = pdfsnapshot.SnapshotStore(f"{folder_name}/SNAPSHOTS")
+            options = {"cache-dir": f"{folder_name}/ASSET_CACHE", **(options or {})}
+
+        links = gather_links_within_links(start_html_page, root_html_page, regex_link_filter, attribute, html_tag, max_depth, session=session, journal=journal, snapshots=snapshots,
+                                          processes=crawl_processes, frontier_path=pdffrontier.frontier_path(folder_name, file_name), budget=budget, priority=priority)
+
+        # Rendered in chunks, in parallel, and merged into one file. See download_as_pdf.
+        download_as_pdf(links, file_name, folder_name, config=config, options=options, workers=workers, timeout=timeout, render_cache=render_cache, session=session, journal=journal, snapshots=snapshots, passthrough=passthrough, readiness=readiness, profile=profile)
+
+    remove_frontier(folder_name, file_name)
+    return links
 
-                    download_as_pdf(split_link, new_file_name, folder_name, config=config, options=options)
 
-                counter += 1
+def remove_frontier(folder_name, file_name):
+    """Deletes the frontier of the crawl workers of the job writing {folder_name}/{file_name}.pdf, if it has one."""
+    path = pdffrontier.frontier_path(folder_name, file_name)
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+
+def resume_download(folder_name=".", file_name="outfile", offline=False):
+    """Carries on the download_all_pdf job which was writing {folder_name}/{file_name}.pdf where it stopped, with the arguments recorded in its journal. With offline=True, pages are only taken from the HTTP cache. Returns the list of links, as download_all_pdf does.
+
+    Raises FileNotFoundError if there is no journal for the job."""
+    path = pdfjournal.journal_path(folder_name, file_name)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"There is no journal at {path} to resume.")
+    with pdfjournal.Journal(path) as journal:
+        parameters = journal.parameters()
+        links = journal.render_links()
+    if not parameters:
+        raise FileNotFoundError(f"The journal at {path} does not record a job to resume.")
+    if "finished" in parameters:
+        print(f"The job recorded in {path} already finished, writing {parameters['finished']}.")
+        return links
 
-    return links
+    config = pdfkit.configuration(wkhtmltopdf=parameters.pop("wkhtmltopdf"))
+    return download_all_pdf(config=config, offline=offline, **parameters)
 
 if __name__ == "__main__":
 
@@ -431,8 +382,7 @@ if __name__ == "__main__":
     attribute='href'
     html_tag='a'
     max_depth = 0
-    current_depth = 0
 
-    download_all_pdf(start_html_page, root_html_page, file_name, folder_name, regex_link_filter, max_depth, attribute, html_tag, options={"window-status":"ready","run-script":"window.setTimeout(function(){window.status='ready';}, 1000);","load-error-handling":"ignore"})
+    download_all_pdf(start_html_page, root_html_page, file_name, folder_name, regex_link_filter, max_depth, attribute, html_tag, options={"load-error-handling":"ignore"})
 
     
\ No newline at end of file
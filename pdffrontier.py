@@ -0,0 +1,350 @@
+"""
+Multi-process crawling for pdffromlinks. Once pages are fetched concurrently (see pdfcrawl), most of a crawl's time goes on parsing them for their links, which one process can only do on one core. Here the crawl is shared between several worker processes instead.
+
+The workers share one frontier: a SQLite file (FRONTIER_<file_name>.sqlite in the output folder, for download_all_pdf) which holds the settings of the crawl and every link found, with its depth, its place in the discovery order, and its status: pending, claimed by a worker, done, failed, or beyond max_depth, that is found but not to be fetched. The links in it are also the visited set. Each worker repeatedly:
+- claims the next pending page, in one transaction, so that no two workers are given the same page;
+- fetches it and gathers its links;
+- completes it, adding the links it found, in one transaction, or marks it failed.
+
+Pages are claimed level by level, as pdfcrawl fetches them: no page is claimed until every page on the levels above it is done. So every link gets the same depth as from a crawl in one process. The links on each page are kept with it, and the links are returned in the same depth-first order as pdfcrawl returns them, rebuilt from those (see pdfcrawl.depth_first_order).
+
+Nothing is kept only in a worker's memory, so a worker may stop at any time, and more may join a crawl which is already running, from another terminal with
+
+    python pdffrontier.py path/to/FRONTIER_outfile.sqlite [threads]
+
+A claim holds for 'lease' seconds, and is renewed while the worker is still fetching the page. If a worker crashes, its pages are claimed again by another worker once the lease runs out, or straight away if the worker was started by crawl_processes, which notices when one of its workers dies.
+
+On Windows, worker processes are started afresh and import the script which started the crawl, so that script must keep its own work under 'if __name__ == "__main__":'.
+"""
+
+import collections
+import concurrent.futures
+import contextlib
+import json
+import multiprocessing
+import os
+import socket
+import sqlite3
+import sys
+import time
+
+import pdfcrawl
+import pdfhttp
+import pdfjournal
+import pdflinks
+import pdfsnapshot
+import pdfurls
+
+
+PENDING = "pending"
+CLAIMED = "claimed"
+DONE = "done"
+FAILED = "failed"
+# Found on the deepest level, so returned but not fetched.
+BEYOND = "beyond"
+
+DEFAULT_PROCESSES = os.cpu_count() or 1
+# How many pages each worker fetches at the same time.
+DEFAULT_WORKER_THREADS = 4
+# How many seconds a claim holds before another worker may take the page over.
+DEFAULT_LEASE = 300
+# How many seconds a worker waits before looking for work again, when the pages left are all claimed.
+POLL_INTERVAL = 0.2
+
+# A link's rank is the rank of the page it was first found on followed by its position on that page, in this many hex
+# digits, so that sorting the links of a level by rank puts them in discovery order.
+RANK_DIGITS = 6
+
+# Journal statuses for the statuses here. Links beyond max_depth are pending in a journal, as pdfcrawl leaves them.
+JOURNAL_STATUSES = {DONE: pdfjournal.DONE, FAILED: pdfjournal.FAILED, BEYOND: pdfjournal.PENDING, PENDING: pdfjournal.PENDING, CLAIMED: pdfjournal.PENDING}
+
+Claim = collections.namedtuple("Claim", "id url depth rank")
+Claim.__doc__ = """A page claimed by a worker: its row in the frontier, its URL, its depth, and its rank."""
+
+
+def frontier_path(folder_name, file_name):
+    """Returns where the frontier of the job writing {folder_name}/{file_name}.pdf is kept."""
+    return os.path.join(folder_name, f"FRONTIER_{file_name}.sqlite")
+
+
+def worker_name(pid=None):
+    """Returns the name claims are made under by the worker process pid, this process by default."""
+    return f"{socket.gethostname()}-{pid or os.getpid()}"
+
+
+def crawl_settings(start_html_page, root_html_page, regex_link_filter=r"(?!.*feed\.xml)(?!\#)", attribute='href', html_tag='a', max_depth=1, backend="stream", canonicalize=True, cache=None, cache_size=pdfhttp.DEFAULT_CACHE_SIZE, offline=False, snapshots=None):
+    """
+    Returns the settings of a crawl, which are kept in its frontier so that any worker can take part in it. See pdffromlinks.gather_links_within_links for the arguments.
+
+    canonicalize -> Whether links are canonicalized with pdfurls.DEFAULT_CANONICALIZER.
+
+    cache, cache_size, offline -> The path of a pdfhttp.HttpCache for every worker to fetch through, and its settings.
+
+    snapshots -> The folder of a pdfsnapshot.SnapshotStore which every page fetched is saved in.
+    """
+    return {"start_html_page": start_html_page, "root_html_page": root_html_page, "regex_link_filter": regex_link_filter, "attribute": attribute, "html_tag": html_tag, "max_depth": max_depth,
+            "backend": backend, "canonicalize": canonicalize, "cache": cache, "cache_size": cache_size, "offline": offline, "snapshots": snapshots}
+
+
+class Frontier:
+    """
+    The shared frontier of one crawl. See the module docstring.
+
+    Every worker process opens a Frontier of its own on the same file. A Frontier is not shared between threads.
+    """
+
+    def __init__(self, path, lease=DEFAULT_LEASE):
+        self.path = path
+        self.lease = lease
+        # Transactions are begun by hand, so that a claim reads and writes under one lock.
+        self._connection = sqlite3.connect(path, timeout=60, isolation_level=None)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.executescript("""
+            CREATE TABLE IF NOT EXISTS settings (
+                name TEXT PRIMARY KEY,
+                value TEXT NOT NULL);
+            CREATE TABLE IF NOT EXISTS links (
+                id INTEGER PRIMARY KEY,
+                url TEXT NOT NULL UNIQUE,
+                depth INTEGER NOT NULL,
+                rank TEXT NOT NULL,
+                status TEXT NOT NULL,
+                worker TEXT,
+                claimed_at REAL,
+                reason TEXT,
+                snapshot INTEGER NOT NULL DEFAULT 0,
+                found TEXT);
+            CREATE INDEX IF NOT EXISTS links_order ON links (status, depth, rank);""")
+        # Frontiers written before the links on each page were kept.
+        if "found" not in [column[1] for column in self._connection.execute("PRAGMA table_info(links)")]:
+            self._connection.execute("ALTER TABLE links ADD COLUMN found TEXT")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self._connection.close()
+
+    @contextlib.contextmanager
+    def _transaction(self):
+        """Holds the write lock on the file from the start, so that what is read cannot change before it is written."""
+        self._connection.execute("BEGIN IMMEDIATE")
+        try:
+            yield self._connection
+        except BaseException:
+            self._connection.execute("ROLLBACK")
+            raise
+        self._connection.execute("COMMIT")
+
+    def settings(self):
+        """Returns the settings of the crawl (see crawl_settings), empty if no crawl was started."""
+        return {name: json.loads(value) for name, value in self._connection.execute("SELECT name, value FROM settings")}
+
+    def start(self, settings):
+        """Starts the crawl with these settings from its start page. If the frontier already holds a crawl with the same settings, it is carried on, and True is returned; a crawl with other settings is forgotten."""
+        with self._transaction() as connection:
+            recorded = {name: json.loads(value) for name, value in connection.execute("SELECT name, value FROM settings")}
+            resumed = recorded == settings
+            if not resumed:
+                connection.execute("DELETE FROM settings")
+                connection.execute("DELETE FROM links")
+                connection.executemany("INSERT INTO settings VALUES (?, ?)", [(name, json.dumps(value)) for name, value in settings.items()])
+                connection.execute("INSERT INTO links (url, depth, rank, status) VALUES (?, 0, '', ?)", (settings["start_html_page"], PENDING))
+        return resumed
+
+    def claim(self, worker):
+        """Claims the next page to fetch for worker and returns it as a Claim, or returns None if there is no page to fetch yet. A page claimed by a worker whose lease ran out may be claimed again."""
+        now = time.time()
+        with self._transaction() as connection:
+            # The level being crawled: the shallowest one with pages not done yet.
+            level = connection.execute("SELECT MIN(depth) FROM links WHERE status IN (?, ?)", (PENDING, CLAIMED)).fetchone()[0]
+            if level is None:
+                return None
+            row = connection.execute("SELECT id, url, depth, rank FROM links WHERE depth = ? AND (status = ? OR (status = ? AND claimed_at < ?)) ORDER BY rank LIMIT 1",
+                                     (level, PENDING, CLAIMED, now - self.lease)).fetchone()
+            if row is None:
+                return None
+            connection.execute("UPDATE links SET status = ?, worker = ?, claimed_at = ? WHERE id = ?", (CLAIMED, worker, now, row[0]))
+        return Claim(*row)
+
+    def renew(self, worker):
+        """Renews the lease of every page worker has claimed."""
+        with self._transaction() as connection:
+            connection.execute("UPDATE links SET claimed_at = ? WHERE status = ? AND worker = ?", (time.time(), CLAIMED, worker))
+
+    def complete(self, claim, found, fetch_found=True, snapshot=False):
+        """
+        Marks the claimed page done, keeps the links found on it, and adds them to the frontier, in order.
+
+        fetch_found -> Whether the links found are to be fetched, or are beyond max_depth.
+
+        snapshot -> Whether the page was saved as a snapshot.
+
+        A link already in the frontier keeps its place, unless it was found here earlier in the discovery order, which happens when the page it was first found on came after this one.
+        """
+        depth = claim.depth + 1
+        status = PENDING if fetch_found else BEYOND
+        with self._transaction() as connection:
+            connection.execute("UPDATE links SET status = ?, worker = NULL, claimed_at = NULL, reason = NULL, snapshot = ?, found = ? WHERE id = ?", (DONE, int(snapshot), json.dumps(found), claim.id))
+            connection.executemany("INSERT INTO links (url, depth, rank, status) VALUES (?, ?, ?, ?) "
+                                   "ON CONFLICT (url) DO UPDATE SET rank = excluded.rank WHERE links.depth = excluded.depth AND links.rank > excluded.rank",
+                                   [(link, depth, f"{claim.rank}{position:0{RANK_DIGITS}x}", status) for position, link in enumerate(found)])
+
+    def fail(self, claim, reason):
+        """Marks the claimed page failed. Its links are not followed."""
+        with self._transaction() as connection:
+            connection.execute("UPDATE links SET status = ?, worker = NULL, claimed_at = NULL, reason = ? WHERE id = ?", (FAILED, reason, claim.id))
+
+    def release(self, worker):
+        """Puts the pages worker has claimed back on the frontier, for when it stops or dies. Returns how many there were."""
+        with self._transaction() as connection:
+            return connection.execute("UPDATE links SET status = ?, worker = NULL, claimed_at = NULL WHERE status = ? AND worker = ?", (PENDING, CLAIMED, worker)).rowcount
+
+    def finished(self):
+        """Whether every page to fetch is done or failed."""
+        return self._connection.execute("SELECT COUNT(*) FROM links WHERE status IN (?, ?)", (PENDING, CLAIMED)).fetchone()[0] == 0
+
+    def state(self):
+        """Returns every link found so far, in discovery order, as (url, depth, status, reason, found), where found is the list of links on the page, or None if it was not fetched."""
+        rows = self._connection.execute("SELECT url, depth, status, reason, found FROM links ORDER BY depth, rank").fetchall()
+        return [(url, depth, status, reason, json.loads(found) if found is not None else None) for url, depth, status, reason, found in rows]
+
+    def links(self):
+        """Returns every link found so far, in the depth-first order pdfcrawl returns them in."""
+        state = self.state()
+        if not state:
+            return []
+        return pdfcrawl.depth_first_order(state[0][0], [url for url, _, _, _, _ in state], {url: found for url, _, _, _, found in state if found is not None})
+
+    def snapshotted(self):
+        """Returns the links whose page was saved as a snapshot by a worker."""
+        return [url for url, in self._connection.execute("SELECT url FROM links WHERE snapshot = 1")]
+
+    def start_failure(self):
+        """Returns why the start page could not be fetched, or None if it was."""
+        row = self._connection.execute("SELECT reason FROM links WHERE depth = 0 AND status = ?", (FAILED,)).fetchone()
+        return row[0] if row is not None else None
+
+    def report(self):
+        """Returns a summary of the crawl, as text."""
+        counts = dict(self._connection.execute("SELECT status, COUNT(*) FROM links GROUP BY status").fetchall())
+        return (f"Frontier: {sum(counts.values())} links found, {counts.get(DONE, 0)} pages fetched, {counts.get(FAILED, 0)} failed, "
+                f"{counts.get(PENDING, 0) + counts.get(CLAIMED, 0)} left to fetch, {counts.get(BEYOND, 0)} beyond max_depth.")
+
+
+def extractor_from(settings):
+    """Returns the pdflinks.LinkExtractor for the crawl with these settings."""
+    canonicalizer = pdfurls.DEFAULT_CANONICALIZER if settings["canonicalize"] else None
+    return pdflinks.LinkExtractor(settings["root_html_page"], settings["regex_link_filter"], settings["attribute"], settings["html_tag"], settings["backend"], canonicalizer)
+
+
+def crawl_worker(path, threads=DEFAULT_WORKER_THREADS, lease=DEFAULT_LEASE):
+    """
+    Works on the crawl in the frontier at path until there is no page left to fetch: claims pages, fetches up to 'threads' of them at the same time, gathers their links in this process, and completes them.
+
+    If the worker is stopped, the pages it claimed are put back on the frontier for the other workers.
+    """
+    name = worker_name()
+    with Frontier(path, lease) as frontier, contextlib.ExitStack() as stack:
+        settings = frontier.settings()
+        if not settings:
+            raise FileNotFoundError(f"There is no crawl in {path} to work on.")
+        extract = extractor_from(settings)
+        fetch_levels = max(settings["max_depth"], 1)
+        snapshots = pdfsnapshot.SnapshotStore(settings["snapshots"]) if settings["snapshots"] else None
+        cache = stack.enter_context(pdfhttp.HttpCache(settings["cache"], settings["cache_size"])) if settings["cache"] else None
+        session = stack.enter_context(pdfhttp.HttpSession(max_idle_per_host=threads, cache=cache, offline=settings["offline"]))
+        executor = stack.enter_context(concurrent.futures.ThreadPoolExecutor(max_workers=threads))
+
+        running = {}
+        renewed = time.monotonic()
+        try:
+            while True:
+                while len(running) < threads and (claim := frontier.claim(name)) is not None:
+                    running[executor.submit(pdfcrawl.fetch_page, claim.url, session, snapshots, True)] = (claim, time.perf_counter())
+                if not running:
+                    if frontier.finished():
+                        break
+                    # The rest of the level is claimed by other workers.
+                    time.sleep(POLL_INTERVAL)
+                    continue
+
+                done, _ = concurrent.futures.wait(running, timeout=POLL_INTERVAL, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    claim, start = running.pop(future)
+                    try:
+                        page_url, body = future.result()
+                    except Exception as e:
+                        print(f"Error fetching {claim.url}: {str(e)}")
+                        frontier.fail(claim, str(e))
+                        continue
+                    print(f"Fetched {claim.url} in {time.perf_counter() - start:.2f} s")
+                    frontier.complete(claim, extract(page_url, body), claim.depth + 1 < fetch_levels, snapshots is not None and claim.url in snapshots.saved)
+
+                if running and time.monotonic() - renewed > lease / 3:
+                    frontier.renew(name)
+                    renewed = time.monotonic()
+        finally:
+            if running:
+                frontier.release(name)
+            print(f"Worker {name}: {session.report()}")
+
+
+def start_worker(path, threads=DEFAULT_WORKER_THREADS, lease=DEFAULT_LEASE):
+    """Starts crawl_worker in a new process and returns the multiprocessing.Process."""
+    worker = multiprocessing.Process(target=crawl_worker, args=(path, threads, lease))
+    worker.start()
+    return worker
+
+
+def crawl_processes(path, settings, processes=DEFAULT_PROCESSES, threads=DEFAULT_WORKER_THREADS, lease=DEFAULT_LEASE, journal=None, snapshots=None):
+    """
+    Crawls with these settings (see crawl_settings) in 'processes' worker processes sharing the frontier at path, and returns every link found, in the same order as pdfcrawl.crawl does. If the frontier already holds this crawl, it is carried on rather than started again.
+
+    A worker which dies is replaced, up to 'processes' times in all, and the pages it claimed are put back on the frontier. Other workers may join with crawl_worker while the crawl runs.
+
+    journal -> A pdfjournal.Journal to record the finished crawl in.
+
+    snapshots -> The pdfsnapshot.SnapshotStore of settings['snapshots'] in this process, which the pages saved by the workers are added to.
+
+    If the start page cannot be fetched, IOError is raised.
+    """
+    with Frontier(path, lease) as frontier:
+        if frontier.start(settings):
+            print(f"Resuming the crawl in {path}. {frontier.report()}")
+        print(f"Crawling with {processes} worker process(es) of {threads} thread(s) each. Max Depth is {settings['max_depth']}.")
+
+        workers = [start_worker(path, threads, lease) for _ in range(processes)]
+        restarts = 0
+        while workers:
+            for worker in list(workers):
+                worker.join(POLL_INTERVAL)
+                if worker.exitcode is None:
+                    continue
+                workers.remove(worker)
+                if worker.exitcode != 0:
+                    released = frontier.release(worker_name(worker.pid))
+                    print(f"Crawl worker {worker.pid} stopped with exit code {worker.exitcode}. The {released} page(s) it had claimed were put back on the frontier.")
+                    if not frontier.finished() and restarts < processes:
+                        restarts += 1
+                        workers.append(start_worker(path, threads, lease))
+
+        if not frontier.finished():
+            raise RuntimeError(f"The crawl workers stopped before the crawl was finished. It is kept in {path}; crawl again with the same settings to carry it on.")
+        if (reason := frontier.start_failure()) is not None:
+            raise IOError(f"Could not fetch {settings['start_html_page']}: {reason}")
+        print(frontier.report())
+
+        if snapshots is not None:
+            snapshots.add_saved(frontier.snapshotted())
+        if journal is not None:
+            journal.record_crawl([(url, depth, JOURNAL_STATUSES[status], reason, found) for url, depth, status, reason, found in frontier.state()])
+        return frontier.links()
+
+
+if __name__ == "__main__":
+    # Joins a crawl which is already running.
+    crawl_worker(sys.argv[1], int(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_WORKER_THREADS)
@@ -0,0 +1,441 @@
+"""
+Pooled keep-alive HTTP client for the crawler. urllib.request.urlopen opens a new connection (and a new TLS handshake) for every page, which is where most of the time goes when a crawl fetches thousands of pages from the same host. An HttpSession keeps idle connections per host and reuses them, asks for gzip/deflate compressed bodies, puts a timeout on every socket, and retries failed requests a bounded number of times with exponential backoff.
+
+With an HttpCache, every 200 response is kept on disk with its ETag and Last-Modified, and later requests for the same URL are sent with If-None-Match and If-Modified-Since, so an unchanged page only costs a 304. With offline=True, the session answers only from the cache and never touches the network.
+
+Every request is timed. The Response carries its own timings, and the session keeps running totals which can be printed with report().
+
+An HttpSession may be shared between threads.
+"""
+
+import collections
+import datetime
+import email.utils
+import http.client
+import sqlite3
+import ssl
+import threading
+import time
+import urllib.parse
+import zlib
+
+import pdfurls
+
+
+DEFAULT_TIMEOUT = 30
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF = 0.5
+# The longest Retry-After a session waits for. A server which asks for longer gets its error status raised instead.
+DEFAULT_MAX_RETRY_DELAY = 60
+MAX_REDIRECTS = 10
+
+# How many idle connections are kept per host. More than this are closed when they are returned.
+DEFAULT_MAX_IDLE_PER_HOST = 8
+
+# The cache evicts the least recently used responses once it holds more than this many bytes of bodies.
+DEFAULT_CACHE_SIZE = 512 * 1024 * 1024
+
+# How much of a body download() reads and writes at a time.
+DOWNLOAD_CHUNK_SIZE = 256 * 1024
+
+# Statuses worth retrying: the server is overloaded or a gateway timed out.
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+REDIRECT_STATUSES = {301, 302, 303, 307, 308}
+
+DEFAULT_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (compatible; pdffromlinks)",
+    "Accept": "text/html,application/xhtml+xml,*/*;q=0.8",
+    "Accept-Encoding": "gzip, deflate",
+    "Connection": "keep-alive",
+}
+
+
+class HttpError(OSError):
+    """Raised when a request ends with an error status, after any retries."""
+
+    def __init__(self, url, status, reason):
+        super().__init__(f"HTTP Error {status}: {reason} ({url})")
+        self.url = url
+        self.status = status
+        self.reason = reason
+
+
+Response = collections.namedtuple("Response", ["url", "status", "headers", "body", "elapsed", "attempts", "from_cache"], defaults=[False])
+Response.__doc__ = """A completed request. url is the final URL after redirects, headers is an http.client.HTTPMessage, body is the decompressed body as bytes, elapsed is the total time in seconds including retries and redirects, and attempts is how many times the last URL was requested. from_cache is True if the body came from an HttpCache, either after a 304 or offline."""
+
+
+def cache_key(url):
+    """Returns the key a URL is cached under: its canonical form (see pdfurls), or for URLs which cannot be canonicalized, the URL without its fragment, which is never sent to the server. The trailing slash is kept, as '/a' and '/a/' are different requests which the server may answer differently, if only with a redirect."""
+    return pdfurls.DEFAULT_CANONICALIZER.canonicalize(url, keep_trailing_slash=True) or urllib.parse.urldefrag(url)[0]
+
+
+class HttpCache:
+    """
+    Persistent response cache in a single SQLite file. Each entry holds the final URL after redirects, the body, the Content-Type, and the ETag and Last-Modified validators, keyed by cache_key() of the requested URL.
+
+    max_size -> Once the bodies add up to more than this many bytes, the least recently used entries are evicted.
+
+    An HttpCache may be shared between threads.
+    """
+
+    def __init__(self, path, max_size=DEFAULT_CACHE_SIZE):
+        self.path = path
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("""CREATE TABLE IF NOT EXISTS responses (
+            key TEXT PRIMARY KEY,
+            url TEXT NOT NULL,
+            content_type TEXT,
+            etag TEXT,
+            last_modified TEXT,
+            body BLOB NOT NULL,
+            size INTEGER NOT NULL,
+            last_used REAL NOT NULL)""")
+        self._connection.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)")
+        self._connection.commit()
+        self.size = self._connection.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+        # The cache may have been filled with a larger max_size last time.
+        self._evict()
+        self._connection.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+    def get(self, url):
+        """Returns (final_url, content_type, etag, last_modified, body) for url, or None if it is not cached. Marks the entry as recently used."""
+        key = cache_key(url)
+        with self._lock:
+            row = self._connection.execute("SELECT url, content_type, etag, last_modified, body FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                self._connection.execute("UPDATE responses SET last_used = ? WHERE key = ?", (time.time(), key))
+                self._connection.commit()
+        return row
+
+    def put(self, url, final_url, headers, body):
+        """Stores a 200 response for url, then evicts the least recently used entries while the cache is over max_size. Bodies larger than max_size are not stored."""
+        if len(body) > self.max_size:
+            return
+        key = cache_key(url)
+        with self._lock:
+            old = self._connection.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self._connection.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                                     (key, final_url, headers.get("Content-Type"), headers.get("ETag"), headers.get("Last-Modified"), body, len(body), time.time()))
+            self.size += len(body) - (old[0] if old else 0)
+            self._evict()
+            self._connection.commit()
+
+    def _evict(self):
+        """Deletes the least recently used entries until the cache is within max_size. The caller holds the lock and commits."""
+        while self.size > self.max_size:
+            evicted = self._connection.execute("SELECT key, size FROM responses ORDER BY last_used LIMIT 64").fetchall()
+            for evicted_key, evicted_size in evicted:
+                if self.size <= self.max_size:
+                    break
+                self._connection.execute("DELETE FROM responses WHERE key = ?", (evicted_key,))
+                self.size -= evicted_size
+
+
+def cached_headers(content_type, etag, last_modified):
+    """Rebuilds the headers of a cached response."""
+    headers = http.client.HTTPMessage()
+    for name, value in (("Content-Type", content_type), ("ETag", etag), ("Last-Modified", last_modified)):
+        if value is not None:
+            headers[name] = value
+    return headers
+
+
+def decode_body(body, content_encoding):
+    """Decompresses a body sent with Content-Encoding gzip or deflate. Other encodings are returned as they are."""
+    content_encoding = (content_encoding or "").strip().lower()
+    # HEAD responses, and bodies streamed to a file, are empty.
+    if not body:
+        return body
+    if content_encoding in ("gzip", "x-gzip"):
+        return zlib.decompress(body, 16 + zlib.MAX_WBITS)
+    if content_encoding == "deflate":
+        # Some servers send a zlib stream and some send raw deflate data.
+        try:
+            return zlib.decompress(body)
+        except zlib.error:
+            return zlib.decompress(body, -zlib.MAX_WBITS)
+    return body
+
+
+def stream_body(response, sink):
+    """Writes the body of response to sink from the start, decompressing it if it was sent with Content-Encoding gzip or deflate, and returns how many bytes were received."""
+    sink.seek(0)
+    sink.truncate()
+    content_encoding = (response.headers.get("Content-Encoding") or "").strip().lower()
+    decompressor = None
+    if content_encoding in ("gzip", "x-gzip"):
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    elif content_encoding == "deflate":
+        decompressor = zlib.decompressobj()
+
+    received = 0
+    while chunk := response.read(DOWNLOAD_CHUNK_SIZE):
+        received += len(chunk)
+        sink.write(decompressor.decompress(chunk) if decompressor is not None else chunk)
+    if decompressor is not None:
+        sink.write(decompressor.flush())
+    return received
+
+
+def retry_after_delay(value):
+    """Returns the seconds a Retry-After header value asks to wait, whether given as seconds or as an HTTP date, or None if there is no value or it cannot be read. A date in the past is no wait."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return int(value)
+    try:
+        date = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError, IndexError):
+        return None
+    if date.tzinfo is None:
+        # HTTP dates are always GMT; parsedate_to_datetime leaves '-0000' naive.
+        date = date.replace(tzinfo=datetime.timezone.utc)
+    return max((date - datetime.datetime.now(datetime.timezone.utc)).total_seconds(), 0)
+
+
+class HttpSession:
+    """
+    Keeps a pool of keep-alive connections per (scheme, host, port) and sends GET and HEAD requests over them.
+
+    timeout -> Seconds before a connect or a read on the socket gives up.
+
+    cache -> An HttpCache to revalidate against and store responses in. With offline=True, requests are answered from the cache only, and a URL which is not cached raises HttpError with status 504.
+
+    retries -> How many times a request is retried after a connection error, a timeout or a status in RETRY_STATUSES. The wait before retry n is backoff * 2 ** (n - 1) seconds, or the Retry-After header if the server sends one, in seconds or as an HTTP date.
+
+    max_retry_delay -> The longest Retry-After to wait for, in seconds. If the server asks for a longer wait, the request is not retried and its status is raised as an HttpError, rather than holding a crawl thread for as long as the server likes.
+    """
+
+    def __init__(self, timeout=DEFAULT_TIMEOUT, retries=DEFAULT_RETRIES, backoff=DEFAULT_BACKOFF, headers=None, max_idle_per_host=DEFAULT_MAX_IDLE_PER_HOST, cache=None, offline=False, max_retry_delay=DEFAULT_MAX_RETRY_DELAY):
+        if offline and cache is None:
+            raise ValueError("offline=True needs a cache to answer from.")
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_retry_delay = max_retry_delay
+        self.headers = dict(DEFAULT_HEADERS, **(headers or {}))
+        self.max_idle_per_host = max_idle_per_host
+        self.ssl_context = ssl.create_default_context()
+        self.cache = cache
+        self.offline = offline
+
+        self._idle = collections.defaultdict(list)
+        self._lock = threading.Lock()
+
+        # Running totals for report().
+        self.requests = 0
+        self.connections_opened = 0
+        self.retried = 0
+        self.total_time = 0.0
+        self.bytes_received = 0
+        self.cache_hits = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Closes every idle connection."""
+        with self._lock:
+            idle = [connection for connections in self._idle.values() for connection in connections]
+            self._idle.clear()
+        for connection in idle:
+            connection.close()
+
+    def _acquire(self, key):
+        """Returns (connection, reused) for key, taking an idle connection if there is one."""
+        with self._lock:
+            if self._idle[key]:
+                return self._idle[key].pop(), True
+            self.connections_opened += 1
+
+        scheme, host, port = key
+        if scheme == "https":
+            return http.client.HTTPSConnection(host, port, timeout=self.timeout, context=self.ssl_context), False
+        return http.client.HTTPConnection(host, port, timeout=self.timeout), False
+
+    def _release(self, key, connection):
+        with self._lock:
+            if len(self._idle[key]) < self.max_idle_per_host:
+                self._idle[key].append(connection)
+                return
+        connection.close()
+
+    def _send(self, url, extra_headers=None, method="GET", sink=None):
+        """Sends one request and reads the whole response. Returns (status, reason, headers, body). If sink (a binary file) is given, a 200 body is written to it from the start, decompressed, rather than returned."""
+        parts = urllib.parse.urlsplit(url)
+        if parts.scheme not in ("http", "https"):
+            raise ValueError(f"Unsupported URL scheme in {url}")
+        key = (parts.scheme, parts.hostname, parts.port or (443 if parts.scheme == "https" else 80))
+        target = urllib.parse.urlunsplit(("", "", parts.path or "/", parts.query, ""))
+        headers = dict(self.headers, Host=parts.netloc, **(extra_headers or {}))
+
+        connection, reused = self._acquire(key)
+        try:
+            try:
+                connection.request(method, target, headers=headers)
+                response = connection.getresponse()
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                # The server closed an idle connection while it sat in the pool. That is not a failed attempt, so
+                # retry straight away on a fresh connection.
+                if not reused:
+                    raise
+                connection.close()
+                connection, reused = self._acquire(key)
+                connection.request(method, target, headers=headers)
+                response = connection.getresponse()
+            if sink is not None and response.status == 200:
+                received = stream_body(response, sink)
+                body = b""
+            else:
+                body = response.read()
+                received = len(body)
+        except BaseException:
+            connection.close()
+            raise
+
+        if response.will_close:
+            connection.close()
+        else:
+            self._release(key, connection)
+
+        with self._lock:
+            self.bytes_received += received
+        return response.status, response.reason, response.headers, decode_body(body, response.headers.get("Content-Encoding"))
+
+    def _retry_delay(self, attempt, headers=None):
+        """Returns the seconds to wait before retry attempt, or None if the server's Retry-After is longer than max_retry_delay."""
+        delay = retry_after_delay(headers.get("Retry-After") if headers is not None else None)
+        if delay is None:
+            return self.backoff * 2 ** (attempt - 1)
+        if self.max_retry_delay is not None and delay > self.max_retry_delay:
+            return None
+        return delay
+
+    def get(self, url):
+        """Fetches url, following redirects. Returns a Response, or raises HttpError for an error status, or the last
+        OSError (socket.timeout, ConnectionError, ...) once the retries are used up."""
+        return self._request(url)
+
+    def head(self, url):
+        """Sends a HEAD request for url, following redirects, to learn its headers without its body. Returns a Response with an empty body, or raises as get() does. HEAD requests are not cached."""
+        return self._request(url, "HEAD")
+
+    def download(self, url, destination):
+        """Fetches url straight to the file destination, in chunks, rather than into memory, following redirects. Returns a Response with an empty body, or raises as get() does. Downloads are not cached."""
+        with open(destination, "wb") as sink:
+            return self._request(url, "GET", sink)
+
+    def _request(self, url, method="GET", sink=None):
+        start = time.perf_counter()
+        requested_url = url
+
+        # Only whole GET responses go through the cache.
+        cacheable = self.cache is not None and method == "GET" and sink is None
+        cached = self.cache.get(url) if cacheable else None
+        if self.offline:
+            if cached is None:
+                raise HttpError(url, 504, "Not in the offline cache")
+            return self._cached_response(cached, start, 0)
+
+        # Only the first request carries the validators; they belong to the cached response for this URL, not to
+        # wherever it redirects.
+        conditional_headers = {}
+        if cached is not None:
+            if cached[2] is not None:
+                conditional_headers["If-None-Match"] = cached[2]
+            if cached[3] is not None:
+                conditional_headers["If-Modified-Since"] = cached[3]
+
+        for _ in range(MAX_REDIRECTS + 1):
+            attempt = 0
+            while True:
+                attempt += 1
+                try:
+                    status, reason, headers, body = self._send(url, conditional_headers, method, sink)
+                except (OSError, http.client.HTTPException) as e:
+                    if attempt > self.retries:
+                        raise
+                    with self._lock:
+                        self.retried += 1
+                    print(f"Retrying {url} after {type(e).__name__}: {str(e)}")
+                    time.sleep(self._retry_delay(attempt))
+                    continue
+
+                if status in RETRY_STATUSES and attempt <= self.retries:
+                    delay = self._retry_delay(attempt, headers)
+                    if delay is None:
+                        print(f"Not retrying {url} after HTTP {status}: the server asked to wait {headers.get('Retry-After')!r}, longer than {self.max_retry_delay} s")
+                        break
+                    with self._lock:
+                        self.retried += 1
+                    print(f"Retrying {url} after HTTP {status}")
+                    time.sleep(delay)
+                    continue
+                break
+
+            if status == 304 and conditional_headers:
+                return self._cached_response(cached, start, attempt)
+
+            if status in REDIRECT_STATUSES and headers.get("Location"):
+                url = urllib.parse.urljoin(url, headers["Location"])
+                conditional_headers = {}
+                continue
+            break
+        else:
+            raise HttpError(url, status, "Too many redirects")
+
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.requests += 1
+            self.total_time += elapsed
+
+        if status >= 400:
+            raise HttpError(url, status, reason)
+        if status == 200 and cacheable:
+            self.cache.put(requested_url, url, headers, body)
+        return Response(url, status, headers, body, elapsed, attempt)
+
+    def _cached_response(self, cached, start, attempts):
+        final_url, content_type, etag, last_modified, body = cached
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.requests += 1
+            self.cache_hits += 1
+            self.total_time += elapsed
+        return Response(final_url, 200, cached_headers(content_type, etag, last_modified), body, elapsed, attempts, True)
+
+    def report(self):
+        """Returns a one-line summary of the requests made so far."""
+        average = self.total_time / self.requests if self.requests else 0
+        return (f"{self.requests} request(s) over {self.connections_opened} connection(s), {self.retried} retried, "
+                f"{self.cache_hits} from the cache, {self.bytes_received} bytes received, average {average:.3f} s per request.")
+
+
+_default_session = None
+_default_session_lock = threading.Lock()
+
+
+def default_session():
+    """Returns the HttpSession shared by callers which do not make their own."""
+    global _default_session
+    with _default_session_lock:
+        if _default_session is None:
+            _default_session = HttpSession()
+        return _default_session
@@ -0,0 +1,197 @@
+"""
+Job journal for pdffromlinks, so that an interrupted download_all_pdf can carry on where it stopped. It replaces the LINKS_.txt file, whose lists of links had to be pasted back into download_as_pdf by hand.
+
+A Journal is one SQLite file, JOURNAL_<file_name>.sqlite in the output folder, which holds:
+- the arguments of the job, so that it can be resumed with pdffromlinks.resume_download;
+- every link the crawl has found, in discovery order, with its depth and whether its page has been fetched (pending, fetched, done or failed, with the reason). The pages which are not done yet are the crawl frontier;
+- every link to be rendered, with whether it has been rendered (pending, done, failed or skipped, with the reason), the PDF it was rendered or downloaded to, the size of that PDF, and how long the page waited to be ready (see pdfreadiness).
+
+Every change is committed as soon as it is made, so nothing which has been fetched or rendered is lost if the process is stopped. When a job is resumed, only the pages which were not fetched and the links which were not rendered (or whose PDF is gone) are done again.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+
+
+PENDING = "pending"
+FETCHED = "fetched"
+DONE = "done"
+FAILED = "failed"
+SKIPPED = "skipped"
+
+
+def journal_path(folder_name, file_name):
+    """Returns where the journal of the job writing {folder_name}/{file_name}.pdf is kept."""
+    return os.path.join(folder_name, f"JOURNAL_{file_name}.sqlite")
+
+
+class Journal:
+    """
+    The journal of one job. See the module docstring.
+
+    A Journal may be shared between threads.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.executescript("""
+            CREATE TABLE IF NOT EXISTS parameters (
+                name TEXT PRIMARY KEY,
+                value TEXT NOT NULL);
+            CREATE TABLE IF NOT EXISTS links (
+                position INTEGER PRIMARY KEY,
+                url TEXT NOT NULL UNIQUE,
+                depth INTEGER NOT NULL,
+                status TEXT NOT NULL,
+                reason TEXT,
+                found TEXT);
+            CREATE TABLE IF NOT EXISTS renders (
+                position INTEGER PRIMARY KEY,
+                url TEXT NOT NULL,
+                status TEXT NOT NULL,
+                reason TEXT,
+                output TEXT,
+                size INTEGER,
+                wait INTEGER);""")
+        # Journals written before the wait was recorded.
+        if "wait" not in [column[1] for column in self._connection.execute("PRAGMA table_info(renders)")]:
+            self._connection.execute("ALTER TABLE renders ADD COLUMN wait INTEGER")
+        self._connection.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+    def reset(self):
+        """Forgets everything, to start a different job."""
+        with self._lock:
+            self._connection.executescript("DELETE FROM parameters; DELETE FROM links; DELETE FROM renders;")
+            self._connection.commit()
+
+    # The job.
+
+    def parameters(self):
+        """Returns the arguments of the job as a dict, empty for a new journal."""
+        with self._lock:
+            rows = self._connection.execute("SELECT name, value FROM parameters").fetchall()
+        return {name: json.loads(value) for name, value in rows}
+
+    def set_parameters(self, parameters):
+        """Records the arguments of the job. They must be JSON serialisable."""
+        with self._lock:
+            self._connection.executemany("INSERT OR REPLACE INTO parameters VALUES (?, ?)", [(name, json.dumps(value)) for name, value in parameters.items()])
+            self._connection.commit()
+
+    # The crawl.
+
+    def crawl_state(self):
+        """Returns every link found so far, in discovery order, as (url, depth, status, found), where found is the list of links on the page once it has been fetched, and None otherwise."""
+        with self._lock:
+            rows = self._connection.execute("SELECT url, depth, status, found FROM links ORDER BY position").fetchall()
+        return [(url, depth, status, json.loads(found) if found is not None else None) for url, depth, status, found in rows]
+
+    def add_links(self, links, depth):
+        """Records newly found links, at the given depth, as pending."""
+        with self._lock:
+            self._connection.executemany("INSERT OR IGNORE INTO links (url, depth, status) VALUES (?, ?, ?)", [(link, depth, PENDING) for link in links])
+            self._connection.commit()
+
+    def page_fetched(self, url, found):
+        """Records that the page at url was fetched, and the links on it, which are not added to the crawl until expand() is called for its round."""
+        with self._lock:
+            self._connection.execute("UPDATE links SET status = ?, reason = NULL, found = ? WHERE url = ?", (FETCHED, json.dumps(found), url))
+            self._connection.commit()
+
+    def page_failed(self, url, reason):
+        with self._lock:
+            self._connection.execute("UPDATE links SET status = ?, reason = ? WHERE url = ?", (FAILED, reason, url))
+            self._connection.commit()
+
+    def expand(self, pages, new_links):
+        """Adds the new links found on a round of pages, as (url, depth), and marks the pages of that round which were fetched as done, all at once."""
+        with self._lock:
+            self._connection.executemany("INSERT OR IGNORE INTO links (url, depth, status) VALUES (?, ?, ?)", [(link, depth, PENDING) for link, depth in new_links])
+            # The links on each page are kept, as the order the crawl returns its links in is rebuilt from them.
+            self._connection.executemany("UPDATE links SET status = ? WHERE url = ? AND status = ?", [(DONE, page, FETCHED) for page in pages])
+            self._connection.commit()
+
+    def record_crawl(self, links):
+        """Records a crawl done elsewhere, such as by pdffrontier's worker processes, in place of any crawl recorded so far. links is [(url, depth, status, reason, found)] in discovery order, where found is the list of links on the page, or None if it was not fetched."""
+        with self._lock:
+            self._connection.execute("DELETE FROM links")
+            self._connection.executemany("INSERT INTO links (url, depth, status, reason, found) VALUES (?, ?, ?, ?, ?)",
+                                         [(url, depth, status, reason, json.dumps(found) if found is not None else None) for url, depth, status, reason, found in links])
+            self._connection.commit()
+
+    # The render.
+
+    def start_render(self, links):
+        """Records the links to be rendered, in order. If the journal already has the same links, what was rendered before is kept; otherwise every link starts as pending."""
+        with self._lock:
+            recorded = [url for url, in self._connection.execute("SELECT url FROM renders ORDER BY position")]
+            if recorded != list(links):
+                self._connection.execute("DELETE FROM renders")
+                self._connection.executemany("INSERT INTO renders (position, url, status) VALUES (?, ?, ?)", [(position, link, PENDING) for position, link in enumerate(links)])
+                self._connection.commit()
+
+    def render_links(self):
+        """Returns the links to be rendered, in order."""
+        with self._lock:
+            return [url for url, in self._connection.execute("SELECT url FROM renders ORDER BY position")]
+
+    def render_state(self):
+        """Returns (status, output, size) for every link to be rendered, in order."""
+        with self._lock:
+            return self._connection.execute("SELECT status, output, size FROM renders ORDER BY position").fetchall()
+
+    def rendered(self, positions, output, waits=None):
+        """Records that the links at these positions were rendered to the PDF output, and how many milliseconds each waited to be ready, if that is known."""
+        size = os.path.getsize(output)
+        waits = waits or [None] * len(positions)
+        with self._lock:
+            self._connection.executemany("UPDATE renders SET status = ?, reason = NULL, output = ?, size = ?, wait = ? WHERE position = ?", [(DONE, output, size, wait, position) for position, wait in zip(positions, waits)])
+            self._connection.commit()
+
+    def render_failed(self, position, reason):
+        with self._lock:
+            self._connection.execute("UPDATE renders SET status = ?, reason = ?, output = NULL, size = NULL WHERE position = ?", (FAILED, reason, position))
+            self._connection.commit()
+
+    def render_skipped(self, position, reason):
+        """Records that the link at this position is left out on purpose, for example because it is an image."""
+        with self._lock:
+            self._connection.execute("UPDATE renders SET status = ?, reason = ?, output = NULL, size = NULL WHERE position = ?", (SKIPPED, reason, position))
+            self._connection.commit()
+
+    def finish(self, destination):
+        """Records that the output was merged to destination."""
+        self.set_parameters({"finished": destination})
+
+    # For people.
+
+    def failed_links(self):
+        """Returns the links which could not be rendered, with the reason, in order. The links can be given to pdffromlinks.download_as_pdf to try them again."""
+        with self._lock:
+            return self._connection.execute("SELECT url, reason FROM renders WHERE status = ? ORDER BY position", (FAILED,)).fetchall()
+
+    def report(self):
+        """Returns a summary of the job, as text."""
+        with self._lock:
+            crawl = dict(self._connection.execute("SELECT status, COUNT(*) FROM links GROUP BY status").fetchall())
+            render = dict(self._connection.execute("SELECT status, COUNT(*) FROM renders GROUP BY status").fetchall())
+            # The links rendered in one chunk share its PDF.
+            size = self._connection.execute("SELECT COALESCE(SUM(size), 0) FROM (SELECT DISTINCT output, size FROM renders WHERE status = ?)", (DONE,)).fetchone()[0]
+            wait = self._connection.execute("SELECT AVG(wait) FROM renders WHERE wait IS NOT NULL").fetchone()[0]
+        return (f"Crawl: {sum(crawl.values())} links found, {crawl.get(DONE, 0) + crawl.get(FETCHED, 0)} pages fetched, {crawl.get(FAILED, 0)} failed. "
+                f"Render: {render.get(DONE, 0)} of {sum(render.values())} links rendered ({size} bytes), {render.get(FAILED, 0)} failed, {render.get(SKIPPED, 0)} skipped."
+                + (f" Pages waited {wait:.0f} ms on average to be ready." if wait is not None else ""))
@@ -0,0 +1,170 @@
+"""
+Link extraction for pdffromlinks. A LinkExtractor compiles its filter once and is then called on every page of a crawl.
+
+The default 'stream' backend feeds the page through html.parser.HTMLParser in chunks and keeps a link as soon as its start tag is parsed, without ever building a tree. The 'soup' backend builds a BeautifulSoup tree with the same html.parser, as gather_links always did. Both give the same links in the same order; see benchmark_links.py for how they compare on speed.
+"""
+
+import codecs
+import html
+import html.parser
+import re
+import urllib.parse
+
+from bs4 import BeautifulSoup
+
+import pdfurls
+
+
+# Links matching any of these are taken to be full links. Anything else is relative and completed with the root page.
+# FULL_LINK_ANYWHERE is the same test as the original r"(.+)(\.(.+))+/", "<something>.<something>/" with nothing after
+# the slash required, written so that it does not backtrack on long links.
+FULL_LINK_START = re.compile(r"http(s?)://|www.")
+FULL_LINK_ANYWHERE = re.compile(r".\..+/")
+
+# How much of a page is fed to the parser at a time.
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# How far into a page to look for a <meta charset> when the body is bytes.
+CHARSET_SNIFF_SIZE = 2048
+CHARSET_PATTERN = re.compile(rb"""<meta[^>]+charset\s*=\s*["']?([A-Za-z0-9_.:-]+)""", re.IGNORECASE)
+
+BACKENDS = ("stream", "soup")
+
+# The <base href> of a page, which its relative links resolve against instead of the page's own URL.
+BASE_TAG = re.compile(r"<base\b[^>]*>", re.IGNORECASE)
+HREF_ATTRIBUTE = re.compile(r"""\bhref\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s>]+))""", re.IGNORECASE)
+
+
+def complete_link(link, root_html_page):
+    """Returns link as a full link, adding root_html_page in front if it looks relative."""
+
+    # If the link begins with http/https:// or www. or has <something>.<something> (ad infinitum for co.uk etc)/, then we can take it to be a full link.
+    if FULL_LINK_START.match(link) or FULL_LINK_ANYWHERE.search(link):
+        return link
+
+    # Otherwise, the link is likely truncated, and we must add it to the root_html_page.
+    # If the link starts with a /, we simply append the page to the root_html_page. Otherwise, we add a slash in the middle.
+    if link.startswith("/"):
+        return f"{root_html_page}{link}"
+    return f"{root_html_page}/{link}"
+
+
+def decode_page(html_page):
+    """Decodes a page fetched as bytes: the byte order mark if there is one, then a <meta charset> near the top, then UTF-8, then Windows-1252 as the last resort, which is close to what BeautifulSoup guesses."""
+    if isinstance(html_page, str):
+        return html_page
+
+    for bom, encoding in ((codecs.BOM_UTF8, "utf-8"), (codecs.BOM_UTF16_LE, "utf-16-le"), (codecs.BOM_UTF16_BE, "utf-16-be")):
+        if html_page.startswith(bom):
+            return html_page[len(bom):].decode(encoding, errors="replace")
+
+    if match := CHARSET_PATTERN.search(html_page, 0, CHARSET_SNIFF_SIZE):
+        try:
+            return html_page.decode(match.group(1).decode("ascii"))
+        except (LookupError, UnicodeDecodeError):
+            pass
+
+    try:
+        return html_page.decode("utf-8")
+    except UnicodeDecodeError:
+        return html_page.decode("windows-1252", errors="replace")
+
+
+def page_base(text, page_url):
+    """Returns the URL the relative links on a page resolve against: its <base href>, resolved against page_url, if it has one, and page_url otherwise."""
+    if (tag := BASE_TAG.search(text)) and (href := HREF_ATTRIBUTE.search(tag.group(0))):
+        return urllib.parse.urljoin(page_url, html.unescape(next(group for group in href.groups() if group is not None)))
+    return page_url
+
+
+class AttributeCollector(html.parser.HTMLParser):
+    """Collects the value of one attribute on one tag, in document order, as the start tags are parsed."""
+
+    def __init__(self, html_tag, attribute, pattern):
+        super().__init__(convert_charrefs=True)
+        self.html_tag = html_tag.lower()
+        self.attribute = attribute.lower()
+        self.pattern = pattern
+        self.found = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag != self.html_tag:
+            return
+        # If an attribute is repeated, the last value wins, as with BeautifulSoup. A bare attribute is an empty value.
+        value = None
+        for name, attribute_value in attrs:
+            if name == self.attribute:
+                value = attribute_value if attribute_value is not None else ""
+        if value is not None and self.pattern.search(value):
+            self.found.append(value)
+
+    handle_startendtag = handle_starttag
+
+
+class LinkExtractor:
+    """
+    Finds the links on a page which fit the required criteria, in the order they appear, and completes relative ones with root_html_page. See pdffromlinks.gather_links for the arguments.
+
+    Make one LinkExtractor per crawl, so that the filter is only compiled once, and call it with (url, html_page) for every page. html_page may be a string or bytes.
+
+    backend -> 'stream' (the default) or 'soup'.
+
+    canonicalizer -> A pdfurls.UrlCanonicalizer. If given, links are joined against the URL of the page they were found on (or root_html_page if that is not known), or the page's <base href>, and canonicalized, links which are not http(s) are left out, and repeats are recognised by their canonical form. If not, links are completed with root_html_page as gather_links always did.
+    """
+
+    def __init__(self, root_html_page, regex_link_filter=r"(?!.*feed\.xml)(?!\#)", attribute='href', html_tag='a', backend="stream", canonicalizer=None):
+        if backend not in BACKENDS:
+            raise ValueError(f"backend should be one of {BACKENDS}, not {backend!r}.")
+        self.root_html_page = root_html_page
+        self.pattern = re.compile(regex_link_filter)
+        self.attribute = attribute
+        self.html_tag = html_tag
+        self.backend = backend
+        self.canonicalizer = canonicalizer
+
+    def __call__(self, url, html_page, link_set=None):
+        return self.extract(html_page, link_set, url)
+
+    def extract(self, html_page, link_set=None, page_url=None):
+        """Returns the links on html_page, leaving out any in link_set (which is not modified) and any repeats. page_url is the URL html_page was fetched from, after any redirects, which relative links are joined against when there is a canonicalizer. It should be the URL as it was fetched rather than its canonical form, which may have lost the trailing slash of a directory."""
+        links = []
+        seen = set(link_set or ())
+
+        if self.canonicalizer is not None:
+            if hasattr(html_page, "read"):
+                html_page = html_page.read()
+            html_page = decode_page(html_page)
+            base = page_base(html_page, page_url or f"{self.root_html_page}/")
+            for link in self.iter_raw_links(html_page):
+                new_string = self.canonicalizer(link, base)
+                if new_string is not None and new_string not in seen:
+                    links.append(new_string)
+                    seen.add(new_string)
+            return links
+
+        for link in self.iter_raw_links(html_page):
+            if link in seen:
+                continue
+            new_string = complete_link(link, self.root_html_page)
+            links.append(new_string)
+            seen.add(new_string)
+        return links
+
+    def iter_raw_links(self, html_page):
+        """Yields the matching attribute values on html_page as they are found, before they are completed."""
+        if self.backend == "soup":
+            soup = BeautifulSoup(html_page, features="html.parser")
+            for link in soup.findAll(name=self.html_tag, attrs={self.attribute: self.pattern}):
+                yield link.get(self.attribute)
+            return
+
+        if hasattr(html_page, "read"):
+            html_page = html_page.read()
+        collector = AttributeCollector(self.html_tag, self.attribute, self.pattern)
+        text = decode_page(html_page)
+        for start in range(0, len(text), STREAM_CHUNK_SIZE):
+            collector.feed(text[start:start + STREAM_CHUNK_SIZE])
+            yield from collector.found
+            collector.found.clear()
+        collector.close()
+        yield from collector.found
@@ -1,10 +1,26 @@
 """The functionality of the PDF Merger."""
 
 import os
+import concurrent.futures
+import tempfile
 
 import PyPDF2
 import re
 
+import pdfstream
+
+# Number of inputs which may be open at the same time when merging with streaming=True.
+DEFAULT_STREAM_WINDOW = 16
+
+# How much of the start and the end of each input preflight_pdf reads. The header must be within the first kilobyte,
+# and startxref and %%EOF within the last few.
+PREFLIGHT_HEAD_SIZE = 1024
+PREFLIGHT_TAIL_SIZE = 2048
+
+# How much is read at the startxref offset to check the cross-reference section (and the trailer dictionary of a
+# cross-reference stream) without reading the rest of the file.
+PREFLIGHT_XREF_SIZE = 4096
+
 
 def check_inputs(*inputs):
     """Check that the input files exist. Otherwise, raise a FileNotFoundError."""
@@ -65,9 +81,93 @@ def check_output_file_exists(destination):
         return True
 
 
-def merge_two_pdfs(input1, input2, output_dir, output_file_name="mergedpdf"):
+def preflight_pdf(input_file):
+    """Checks that a PDF looks readable without parsing it: the header, startxref and %%EOF at the end, the
+    cross-reference section startxref points to, and the encryption flag. Only the head and tail of the file and a few
+    kilobytes at the cross-reference section are read. Returns None if the file looks fine, and an error otherwise.
+
+    A missing or wrong startxref does not make a file unreadable, as PyPDF2 looks for the cross-reference section
+    around a startxref which is a few bytes off, and tolerates wrong offsets in it. In that case the file is opened
+    with PyPDF2 instead, and only rejected if PyPDF2 cannot read it either (see preflight_with_pypdf2)."""
+
+    try:
+        with open(input_file, 'rb') as f:
+            head = f.read(PREFLIGHT_HEAD_SIZE)
+            f.seek(0, os.SEEK_END)
+            file_size = f.tell()
+            f.seek(max(0, file_size - PREFLIGHT_TAIL_SIZE))
+            tail = f.read()
+
+            if b"%PDF-" not in head:
+                return f"OSError: The file {input_file} might be corrupted (no PDF header)."
+            if b"%%EOF" not in tail:
+                return f"OSError: The file {input_file} might be corrupted (no %%EOF at the end)."
+
+            # The last startxref in the file points to the newest cross-reference section.
+            startxref = re.findall(rb"startxref\s+(\d+)", tail)
+            if not startxref or int(startxref[-1]) >= file_size:
+                return preflight_with_pypdf2(input_file, "no valid startxref")
+
+            f.seek(int(startxref[-1]))
+            xref = f.read(PREFLIGHT_XREF_SIZE)
+    except OSError:
+        return f"OSError: The file {input_file} could not be read."
+
+    if re.match(rb"\s*xref\s+\d+\s+\d+\s+\d{10} \d{5} [nf]", xref):
+        # A classic xref table. Its trailer normally sits just before startxref, at the end of the file.
+        trailer = tail
+    elif (match := re.match(rb"\s*\d+\s+\d+\s+obj\s*<<", xref)) and b"/XRef" in xref[:xref.find(b"stream", match.end())]:
+        # A cross-reference stream, whose dictionary doubles as the trailer.
+        trailer = xref[:xref.find(b"stream", match.end())]
+    else:
+        return preflight_with_pypdf2(input_file, "startxref does not point to a cross-reference section")
+
+    if re.search(rb"/Encrypt\b", trailer):
+        return f"The file {input_file} is encrypted."
+    return None
+
+
+def preflight_with_pypdf2(input_file, problem):
+    """Opens a PDF which preflight_pdf found a problem with, as PyPDF2 does when merging, to see whether PyPDF2 can
+    recover from it. Returns None, after printing a warning, if it can, and the error for the problem otherwise."""
+
+    try:
+        with open(input_file, 'rb') as f:
+            reader = PyPDF2.PdfFileReader(f, strict=False)
+            if reader.isEncrypted:
+                return f"The file {input_file} is encrypted."
+            # Reads the page tree as well as the cross-reference sections.
+            reader.getNumPages()
+    except Exception:
+        return f"OSError: The file {input_file} might be corrupted ({problem})."
+    print(f"Warning: The file {input_file} has a problem ({problem}), but PyPDF2 can read it.")
+    return None
+
+
+def preflight_pdfs(sanitized_inputs, workers=None):
+    """Runs preflight_pdf on every input in parallel. Returns the inputs which passed, in order, and the errors for the
+    ones which did not."""
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(preflight_pdf, sanitized_inputs))
+
+    passed = []
+    errors = []
+    for sanitized_input, error in zip(sanitized_inputs, results):
+        if error is None:
+            passed.append(sanitized_input)
+        else:
+            print(error)
+            errors.append(error)
+    return passed, errors
+
+
+def merge_two_pdfs(input1, input2, output_dir, output_file_name="mergedpdf", fast_path=False):
     """Simply merges two given PDFs together, with input1 first and input2 second. The PDF will be sent to the output
-    directory (output_dir), which has a default name "mergedpdf.pdf". """
+    directory (output_dir), which has a default name "mergedpdf.pdf".
+
+    If fast_path is True, objects are copied as raw bytes where possible (see pdfraw), and any input which cannot be
+    read is reported in errors rather than raised."""
 
     sanitized_input1 = sanitize_input(input1)
     sanitized_input2 = sanitize_input(input2)
@@ -85,6 +185,11 @@ def merge_two_pdfs(input1, input2, output_dir, output_file_name="mergedpdf"):
 
     check_output_file_exists(destination)
 
+    if fast_path:
+        errors = merge_pdfs_streaming(destination, [sanitized_input1, sanitized_input2], fast_path=True)
+        print(f"Output file to {destination}")
+        return (destination, errors)
+
     # Create a File Merger.
     merger = PyPDF2.PdfFileMerger()
     errors =[]
@@ -101,10 +206,22 @@ def merge_two_pdfs(input1, input2, output_dir, output_file_name="mergedpdf"):
     return (destination, errors)
 
 
-def merge_many_pdfs(output_dir, output_file_name="mergedpdf", *inputs):
+def merge_many_pdfs(output_dir, output_file_name="mergedpdf", *inputs, streaming=False, window=DEFAULT_STREAM_WINDOW, workers=None, fast_path=False, deduplicate=False, preflight=False):
     """Merges PDFs according to their order in a list. The PDF will be sent to the output directory (output_dir), which has a default name "mergedpdf.pdf".
 
-    Make sure to input the file paths for the input and output folders as raw strings. Returns the destination and any errors."""
+    Make sure to input the file paths for the input and output folders as raw strings. Returns the destination and any errors.
+
+    If streaming is True, the inputs are merged with merge_pdfs_streaming instead, which only keeps 'window' inputs open at a time. Use this for folders with thousands of files.
+
+    If workers is set, the inputs are merged with merge_pdfs_parallel across that many processes instead.
+
+    If fast_path is True, objects are copied as raw bytes where possible (see pdfraw). This implies streaming.
+
+    If deduplicate is True, identical streams (fonts, images, ICC profiles, form XObjects) found in several inputs are
+    only written once and every page points at that copy. This implies streaming.
+
+    If preflight is True, every input is checked in parallel with preflight_pdf before merging starts. Inputs which fail
+    are skipped and reported in the errors."""
 
     # Check that the output folder exists, otherwise create a new folder.
     check_folder(output_dir)
@@ -124,11 +241,25 @@ def merge_many_pdfs(output_dir, output_file_name="mergedpdf", *inputs):
         sanitized_input = sanitize_input(input)
         check_inputs(sanitized_input)
         sanitized_inputs.append(sanitized_input)
+
+    errors = []
+    if preflight:
+        sanitized_inputs, errors = preflight_pdfs(sanitized_inputs)
+
+    if workers:
+        errors += merge_pdfs_parallel(destination, sanitized_inputs, workers, window, fast_path, deduplicate)
+        print(f"Output file to {destination}")
+        return (destination, errors)
+
+    if streaming or fast_path or deduplicate:
+        errors += merge_pdfs_streaming(destination, sanitized_inputs, window, fast_path, deduplicate)
+        print(f"Output file to {destination}")
+        return (destination, errors)
+
     # Create a File Merger.
     merger = PyPDF2.PdfFileMerger()
 
     # Append all files to merger. import_bookmarks is set to False to avoid errors.
-    errors = []
     for sanitized_input in sanitized_inputs:
         try:
             print(sanitized_input)
@@ -144,14 +275,108 @@ def merge_many_pdfs(output_dir, output_file_name="mergedpdf", *inputs):
     return (destination, errors)
 
 
-def merge_pdfs_from_folder(input_dir, output_dir, output_file_name="mergedpdf"):
+def merge_pdfs_streaming(destination, sanitized_inputs, window=DEFAULT_STREAM_WINDOW, fast_path=False, deduplicate=False):
+    """Merges already sanitized and checked inputs into destination, writing each page out as soon as it has been
+    copied. Inputs are opened 'window' at a time and each one is closed as soon as its pages are written, so the number
+    of open files and the memory used depend on the window rather than on the number of inputs. Returns any errors.
+
+    If fast_path is True, inputs are memory-mapped and their objects copied as raw bytes, falling back to PyPDF2 for
+    any input the raw passthrough cannot handle.
+
+    If deduplicate is True, identical streams across inputs are only written once."""
+
+    if window < 1:
+        raise ValueError("The window must be at least 1.")
+
+    errors = []
+    with open(f'{destination}', 'wb') as outfile:
+        writer = pdfstream.StreamingPdfWriter(outfile, deduplicate)
+
+        for window_start in range(0, len(sanitized_inputs), window):
+            # Open every input in the window first so that unreadable files are reported before any of their pages
+            # are written.
+            opened = []
+            for sanitized_input in sanitized_inputs[window_start:window_start + window]:
+                try:
+                    opened.append((sanitized_input, pdfstream.open_source(sanitized_input, fast_path)))
+                except (OSError, PyPDF2.utils.PdfReadError):
+                    print(f"OSError: The file {sanitized_input} might be corrupted.")
+                    errors.append(f"OSError: The file {sanitized_input} might be corrupted.")
+
+            for sanitized_input, source in opened:
+                try:
+                    print(sanitized_input)
+                    pdfstream.append_source(writer, source)
+                except (OSError, PyPDF2.utils.PdfReadError):
+                    print(f"OSError: The file {sanitized_input} might be corrupted.")
+                    errors.append(f"OSError: The file {sanitized_input} might be corrupted.")
+                finally:
+                    source.close()
+
+        writer.close()
+    return errors
+
+
+def split_into_shards(items, number_of_shards):
+    """Splits a list into at most number_of_shards contiguous parts of nearly equal length, keeping the order."""
+    number_of_shards = max(1, min(number_of_shards, len(items)))
+    shard_size, remainder = divmod(len(items), number_of_shards)
+
+    shards = []
+    start = 0
+    for shard_number in range(number_of_shards):
+        # The first 'remainder' shards take one extra item each.
+        end = start + shard_size + (1 if shard_number < remainder else 0)
+        shards.append(items[start:end])
+        start = end
+    return shards
+
+
+def _merge_shard(shard_destination, shard_inputs, window, fast_path, deduplicate):
+    """Runs in a worker process. Merges one shard into a partial output and returns its errors."""
+    return merge_pdfs_streaming(shard_destination, shard_inputs, window, fast_path, deduplicate)
+
+
+def merge_pdfs_parallel(destination, sanitized_inputs, workers, window=DEFAULT_STREAM_WINDOW, fast_path=False, deduplicate=False):
+    """Merges already sanitized and checked inputs into destination using a pool of worker processes. The inputs are
+    split into one contiguous shard per worker, each shard is merged into a partial PDF in a temporary folder next to
+    the destination, and the partial PDFs are then combined in order in one final streaming pass. Returns any errors,
+    in input order.
+
+    When deduplicating, each shard is deduplicated by its worker and the final pass removes the duplicates left between
+    shards."""
+
+    if workers < 1:
+        raise ValueError("The number of workers must be at least 1.")
+
+    shards = split_into_shards(sanitized_inputs, workers)
+
+    # The temporary folder is created next to the destination so that the partial outputs are on the same disk.
+    with tempfile.TemporaryDirectory(dir=os.path.dirname(destination) or ".") as temp_dir:
+        shard_destinations = [f"{temp_dir}/part{shard_number}.pdf" for shard_number in range(len(shards))]
+
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(_merge_shard, shard_destination, shard, window, fast_path, deduplicate)
+                       for shard_destination, shard in zip(shard_destinations, shards)]
+
+            # Results are collected in shard order rather than completion order so the errors stay in input order.
+            errors = []
+            for future in futures:
+                errors.extend(future.result())
+
+        errors.extend(merge_pdfs_streaming(destination, shard_destinations, window, fast_path, deduplicate))
+    return errors
+
+
+def merge_pdfs_from_folder(input_dir, output_dir, output_file_name="mergedpdf", streaming=False, window=DEFAULT_STREAM_WINDOW, workers=None, fast_path=False, deduplicate=False, preflight=False):
     """Merges many pdfs from one folder, and simply follows the order they are found in the folder. Return the
-    destination folder and any errors encountered. """
+    destination folder and any errors encountered. See merge_many_pdfs for streaming, window, workers, fast_path,
+    deduplicate and preflight."""
 
     # Regex filter at the end is to make sure only pdfs are merged.
     input_list = [r'{}/{}'.format(input_dir, f) for f in os.listdir(input_dir) if re.match(r"^.*\.pdf$", f)]
 
-    destination, errors = merge_many_pdfs(output_dir, output_file_name, *input_list)
+    destination, errors = merge_many_pdfs(output_dir, output_file_name, *input_list, streaming=streaming, window=window, workers=workers, fast_path=fast_path, deduplicate=deduplicate, preflight=preflight)
     return (destination, errors)
 
 
@@ -0,0 +1,40 @@
+"""
+Named sets of wkhtmltopdf options for pdffromlinks, for runs which want speed more than looks, or the other way round.
+
+- 'default': nothing added; wkhtmltopdf's own defaults.
+- 'draft': for bulk archiving where only the text and the links matter. No images, no JavaScript, lower quality output and no outline, so each page is rendered as soon as its HTML is laid out. With JavaScript off, pages are not waited on by a readiness script either (see pdfreadiness), so pages built by scripts come out as their HTML alone.
+- 'archive': for keeping pages as they look. Images at full quality and 300 dpi, an outline of the headings, and missing images or media ignored rather than failing the page.
+
+The options given with a profile are added on top of it, so any of its options can be changed for one run. See benchmark_profiles.py for how the profiles compare on time and size.
+"""
+
+
+PROFILES = {
+    "default": {},
+    "draft": {
+        "no-images": "",
+        "disable-javascript": "",
+        "lowquality": "",
+        "no-outline": "",
+        "image-quality": "50",
+        "image-dpi": "96",
+    },
+    "archive": {
+        "enable-javascript": "",
+        "outline": "",
+        "outline-depth": "4",
+        "image-quality": "100",
+        "image-dpi": "300",
+        "load-media-error-handling": "ignore",
+    },
+}
+
+DEFAULT_PROFILE = "default"
+
+
+def profile_options(profile=DEFAULT_PROFILE, options=None):
+    """Returns the options of profile, with options added on top. profile may be None for the default."""
+    profile = profile or DEFAULT_PROFILE
+    if profile not in PROFILES:
+        raise ValueError(f"profile should be one of {tuple(PROFILES)}, not {profile!r}.")
+    return {**PROFILES[profile], **(options or {})}
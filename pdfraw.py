@@ -0,0 +1,713 @@
+"""
+Raw object passthrough for well-formed PDFs. The input is memory-mapped, objects are located through the xref table, and the bytes of every object are copied to the output as they are. Only object numbers and references are rewritten, so content streams, fonts and images are never decoded or re-encoded.
+
+Only the page dictionaries and the page tree are actually parsed. Everything else is scanned for references and copied.
+
+When the writer deduplicates, stream objects are keyed by a hash of their raw bytes and, recursively, of everything they reference, so identical streams from different inputs are only written once.
+
+Files which use cross-reference streams, object streams or encryption raise RawPdfUnsupported, as does anything which does not look the way the xref table says it should. Callers are expected to fall back to PyPDF2 in that case (see pdfstream.open_source).
+"""
+
+import bisect
+import collections
+import hashlib
+import mmap
+import re
+
+
+# Character classes from the PDF specification.
+WHITESPACE = rb"\x00\t\n\x0c\r "
+DELIMITERS = rb"()<>\[\]{}/%"
+
+# A token boundary: the next character is whitespace, a delimiter, or the end of the file.
+TOKEN_END = rb"(?=[" + WHITESPACE + DELIMITERS + rb"]|\Z)"
+
+# A token start: the previous character is whitespace or a delimiter other than / and %, which would make the digits
+# part of a name or a comment.
+TOKEN_START = rb"(?<![^" + WHITESPACE + rb"()<>\[\]{}])"
+
+REFERENCE = TOKEN_START + rb"(\d+)[" + WHITESPACE + rb"]+(\d+)[" + WHITESPACE + rb"]+R" + TOKEN_END
+
+OBJECT_HEADER_PATTERN = re.compile(rb"[" + WHITESPACE + rb"]*(\d+)[" + WHITESPACE + rb"]+(\d+)[" + WHITESPACE + rb"]+obj" + TOKEN_END)
+
+# Everything the scanner has to stop at while walking an object body.
+SCAN_PATTERN = re.compile(
+    rb"(?P<string>\()|(?P<comment>%)|(?P<reference>" + REFERENCE + rb")"
+    + rb"|(?P<stream>" + TOKEN_START + rb"stream(?=\r\n|\n|\r))"
+    + rb"|(?P<endobj>" + TOKEN_START + rb"endobj" + TOKEN_END + rb")"
+)
+STRING_PATTERN = re.compile(rb"[\\()]")
+END_OF_LINE_PATTERN = re.compile(rb"[\r\n]")
+
+PAGE_TREE_TYPE_PATTERN = re.compile(rb"/Type[" + WHITESPACE + rb"]*/Pages?" + TOKEN_END)
+ENDSTREAM_PATTERN = re.compile(rb"(\r\n|\n|\r)?endstream")
+
+WHITESPACE_PATTERN = re.compile(rb"(?:[" + WHITESPACE + rb"]+|%[^\r\n]*)*")
+NAME_PATTERN = re.compile(rb"/[^" + WHITESPACE + DELIMITERS + rb"]*")
+NUMBER_PATTERN = re.compile(rb"[+-]?(?:\d+\.?\d*|\.\d+)")
+REFERENCE_PATTERN = re.compile(REFERENCE)
+KEYWORD_PATTERN = re.compile(rb"(true|false|null)" + TOKEN_END)
+
+STARTXREF_PATTERN = re.compile(rb"startxref[" + WHITESPACE + rb"]+(\d+)")
+XREF_PATTERN = re.compile(rb"[" + WHITESPACE + rb"]*xref")
+XREF_SUBSECTION_PATTERN = re.compile(rb"[" + WHITESPACE + rb"]*(\d+)[" + WHITESPACE + rb"]+(\d+)")
+XREF_ENTRY_PATTERN = re.compile(rb"[" + WHITESPACE + rb"]*(\d{10})[" + WHITESPACE + rb"]+(\d{5})[" + WHITESPACE + rb"]+([nf])")
+TRAILER_PATTERN = re.compile(rb"[" + WHITESPACE + rb"]*trailer")
+
+# How far from the end of the file startxref may be.
+TAIL_SIZE = 2048
+
+# How many references deep a content hash may go before the object is simply not deduplicated.
+MAX_CONTENT_KEY_DEPTH = 64
+
+INHERITABLE_PAGE_ATTRIBUTES = (b"/Resources", b"/MediaBox", b"/CropBox", b"/Rotate")
+
+# Up to this many pages are looked up one by one, each from the root of the page tree. More are found together in one
+# walk of the tree, as looking up each of N pages in a flat tree reads N / 2 kids on average, which adds up to O(N^2).
+LAZY_LOOKUP_LIMIT = 8
+
+
+class RawPdfUnsupported(Exception):
+    """Raised when a file cannot be handled by the raw passthrough and should be read with PyPDF2 instead."""
+
+
+class Name(bytes):
+    """A PDF name, including the leading slash."""
+
+
+class RawToken(bytes):
+    """Any other token (strings, reals, booleans, null) kept exactly as it appears in the file."""
+
+
+Ref = collections.namedtuple("Ref", ["number", "generation"])
+
+
+class OutputRef(int):
+    """A reference to an object number which has already been reserved in the output, and is written as is."""
+
+
+# span is the (start, end) of the object body, up to but excluding 'stream' or 'endobj'. references is a list of
+# (start, end, number, generation). data is the (start, end) of the stream data, or None.
+ScannedObject = collections.namedtuple("ScannedObject", ["span", "references", "data", "length_span"])
+
+RawPage = collections.namedtuple("RawPage", ["ref", "attributes"])
+
+
+def skip_string(buffer, position):
+    """Returns the position just after the literal string starting at position (which should be an opening parenthesis)."""
+    depth = 0
+    while True:
+        match = STRING_PATTERN.search(buffer, position)
+        if match is None:
+            raise RawPdfUnsupported("Unterminated string.")
+        character = match.group()
+        if character == b"\\":
+            position = match.end() + 1
+            continue
+        depth += 1 if character == b"(" else -1
+        position = match.end()
+        if depth == 0:
+            return position
+
+
+def parse_value(buffer, position):
+    """Parses one direct object starting at position. Returns the value and the position just after it."""
+    position = WHITESPACE_PATTERN.match(buffer, position).end()
+    start = buffer[position:position + 2]
+
+    if start == b"<<":
+        dictionary = {}
+        position += 2
+        while True:
+            position = WHITESPACE_PATTERN.match(buffer, position).end()
+            if buffer[position:position + 2] == b">>":
+                return dictionary, position + 2
+            key = NAME_PATTERN.match(buffer, position)
+            if key is None:
+                raise RawPdfUnsupported(f"Expected a name at byte {position}.")
+            value, position = parse_value(buffer, key.end())
+            dictionary[Name(key.group())] = value
+
+    elif start[:1] == b"[":
+        array = []
+        position += 1
+        while True:
+            position = WHITESPACE_PATTERN.match(buffer, position).end()
+            if buffer[position:position + 1] == b"]":
+                return array, position + 1
+            value, position = parse_value(buffer, position)
+            array.append(value)
+
+    elif start[:1] == b"(":
+        end = skip_string(buffer, position)
+        return RawToken(buffer[position:end]), end
+
+    elif start[:1] == b"<":
+        end = buffer.find(b">", position)
+        if end == -1:
+            raise RawPdfUnsupported("Unterminated hex string.")
+        return RawToken(buffer[position:end + 1]), end + 1
+
+    elif start[:1] == b"/":
+        name = NAME_PATTERN.match(buffer, position)
+        return Name(name.group()), name.end()
+
+    elif reference := REFERENCE_PATTERN.match(buffer, position):
+        return Ref(int(reference.group(1)), int(reference.group(2))), reference.end()
+
+    elif number := NUMBER_PATTERN.match(buffer, position):
+        token = number.group()
+        if b"." in token:
+            return RawToken(token), number.end()
+        return int(token), number.end()
+
+    elif keyword := KEYWORD_PATTERN.match(buffer, position):
+        return RawToken(keyword.group()), keyword.end()
+
+    raise RawPdfUnsupported(f"Unexpected token at byte {position}.")
+
+
+def serialize_value(value, map_reference):
+    """Serializes a parsed value back into PDF syntax. map_reference is called with every Ref and should return the bytes to write in its place."""
+    if isinstance(value, dict):
+        return b"<< " + b" ".join(key + b" " + serialize_value(item, map_reference) for key, item in value.items()) + b" >>"
+    elif isinstance(value, list):
+        return b"[ " + b" ".join(serialize_value(item, map_reference) for item in value) + b" ]"
+    elif isinstance(value, Ref):
+        return map_reference(value)
+    elif isinstance(value, OutputRef):
+        return b"%d 0 R" % value
+    elif isinstance(value, int):
+        return b"%d" % value
+    else:
+        return bytes(value)
+
+
+class RawPdfReader:
+    """A memory-mapped PDF with a classic xref table. Use it as a context manager, or call close() when done."""
+
+    def __init__(self, input_file):
+        self.input_file = input_file
+        self.file = open(input_file, "rb")
+        try:
+            try:
+                self.buffer = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                # Empty files cannot be mapped.
+                raise RawPdfUnsupported(f"{input_file} is empty.")
+
+            if b"%PDF-" not in self.buffer[:1024]:
+                raise RawPdfUnsupported(f"{input_file} has no PDF header.")
+
+            # object number -> (offset, generation)
+            self.xref = {}
+            self.trailer = None
+            self._read_xref()
+            # Scans and the page list are kept, so that writing several outputs from one reader (see
+            # pdfcompile.split_pdf) only resolves each object once. Only the mmap is read, never a file position, so
+            # one reader can be shared between threads.
+            self._scanned = {}
+            self._pages = None
+            self._page_tree_nodes = {}
+            self._copiers = {}
+        except Exception:
+            self.close()
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        if getattr(self, "buffer", None) is not None:
+            self.buffer.close()
+            self.buffer = None
+        self.file.close()
+
+    def _read_xref(self):
+        buffer = self.buffer
+        tail = buffer.rfind(b"startxref", max(0, len(buffer) - TAIL_SIZE))
+        if tail == -1 or (startxref := STARTXREF_PATTERN.match(buffer, tail)) is None:
+            raise RawPdfUnsupported(f"{self.input_file} has no startxref.")
+
+        offset = int(startxref.group(1))
+        visited_offsets = set()
+        while offset is not None:
+            if offset in visited_offsets or offset >= len(buffer):
+                raise RawPdfUnsupported(f"{self.input_file} has a broken xref chain.")
+            visited_offsets.add(offset)
+
+            if (xref := XREF_PATTERN.match(buffer, offset)) is None:
+                raise RawPdfUnsupported(f"{self.input_file} uses a cross-reference stream.")
+            position = xref.end()
+
+            while (trailer := TRAILER_PATTERN.match(buffer, position)) is None:
+                subsection = XREF_SUBSECTION_PATTERN.match(buffer, position)
+                if subsection is None:
+                    raise RawPdfUnsupported(f"{self.input_file} has a malformed xref table.")
+                first_number, count = int(subsection.group(1)), int(subsection.group(2))
+                position = subsection.end()
+
+                for number in range(first_number, first_number + count):
+                    entry = XREF_ENTRY_PATTERN.match(buffer, position)
+                    if entry is None:
+                        raise RawPdfUnsupported(f"{self.input_file} has a malformed xref entry.")
+                    position = entry.end()
+
+                    # Sections are read from newest to oldest, so the first entry seen for a number wins.
+                    if number not in self.xref:
+                        if entry.group(3) == b"n":
+                            self.xref[number] = (int(entry.group(1)), int(entry.group(2)))
+                        else:
+                            self.xref[number] = None
+
+            trailer_dictionary, _ = parse_value(buffer, trailer.end())
+            if not isinstance(trailer_dictionary, dict):
+                raise RawPdfUnsupported(f"{self.input_file} has a malformed trailer.")
+            if b"/Encrypt" in trailer_dictionary:
+                raise RawPdfUnsupported(f"{self.input_file} is encrypted.")
+            if b"/XRefStm" in trailer_dictionary:
+                raise RawPdfUnsupported(f"{self.input_file} uses a cross-reference stream.")
+            if self.trailer is None:
+                self.trailer = trailer_dictionary
+            offset = trailer_dictionary.get(b"/Prev")
+
+    def has_object(self, ref):
+        entry = self.xref.get(ref.number)
+        return entry is not None and entry[1] == ref.generation
+
+    def _object_start(self, ref):
+        """Returns the position just after 'N G obj' for an object."""
+        if not self.has_object(ref):
+            raise RawPdfUnsupported(f"Object {ref.number} {ref.generation} is not in the xref table.")
+        offset = self.xref[ref.number][0]
+        header = OBJECT_HEADER_PATTERN.match(self.buffer, offset)
+        if header is None or int(header.group(1)) != ref.number:
+            raise RawPdfUnsupported(f"Object {ref.number} is not where the xref table says it is.")
+        return header.end()
+
+    def get(self, ref):
+        """Parses and returns an object. Stream objects return their dictionary only."""
+        value, _ = parse_value(self.buffer, self._object_start(ref))
+        return value
+
+    def resolve(self, value):
+        """Follows a reference if value is one, and returns value otherwise."""
+        return self.get(value) if isinstance(value, Ref) else value
+
+    # Sources which can be copied from by several threads at once. See pdfstream.ReaderSource.
+    thread_safe = True
+
+    def scan(self, ref):
+        """Finds the body, the references and the stream data of an object without parsing it."""
+        if ref.number not in self._scanned:
+            self._scanned[ref.number] = self._scan(ref)
+        return self._scanned[ref.number]
+
+    def _scan(self, ref):
+        buffer = self.buffer
+        position = start = self._object_start(ref)
+        references = []
+
+        while True:
+            match = SCAN_PATTERN.search(buffer, position)
+            if match is None:
+                raise RawPdfUnsupported(f"Object {ref.number} has no endobj.")
+            kind = match.lastgroup
+
+            if kind == "string":
+                position = skip_string(buffer, match.start())
+            elif kind == "comment":
+                end_of_line = END_OF_LINE_PATTERN.search(buffer, match.end())
+                position = len(buffer) if end_of_line is None else end_of_line.end()
+            elif kind == "reference":
+                reference = REFERENCE_PATTERN.match(buffer, match.start())
+                references.append((match.start(), match.end(), int(reference.group(1)), int(reference.group(2))))
+                position = match.end()
+            elif kind == "endobj":
+                return ScannedObject((start, match.start()), references, None, None)
+            else:
+                span = (start, match.start())
+                data, length_span = self._find_stream_data(ref, span, match.end())
+                return ScannedObject(span, references, data, length_span)
+
+    def _find_stream_data(self, ref, span, keyword_end):
+        """Returns the (start, end) of the stream data and the span of the /Length entry in the stream dictionary."""
+        buffer = self.buffer
+        data_start = keyword_end + (2 if buffer[keyword_end:keyword_end + 2] == b"\r\n" else 1)
+
+        length, length_span = self._stream_length(ref, span)
+        if isinstance(length, Ref):
+            length = self.get(length) if self.has_object(length) else None
+
+        # Trust /Length only if endstream is where it says. Otherwise search for endstream, as PyPDF2 does.
+        if isinstance(length, int) and ENDSTREAM_PATTERN.match(buffer, data_start + length):
+            data_end = data_start + length
+        else:
+            endstream = buffer.find(b"endstream", data_start)
+            if endstream == -1:
+                raise RawPdfUnsupported(f"Object {ref.number} has no endstream.")
+            data_end = endstream
+            for end_of_line in (b"\r\n", b"\n", b"\r"):
+                if buffer[data_end - len(end_of_line):data_end] == end_of_line:
+                    data_end -= len(end_of_line)
+                    break
+
+        return (data_start, data_end), length_span
+
+    def _stream_length(self, ref, span):
+        """Returns the value of the /Length entry of a stream's dictionary, and the span of the entry, or (None, None) if it has none. Only the keys of the dictionary itself are looked at: a /Length inside one of its values, such as a nested dictionary, is not the stream's."""
+        buffer = self.buffer
+        position = WHITESPACE_PATTERN.match(buffer, span[0]).end()
+        if buffer[position:position + 2] != b"<<":
+            raise RawPdfUnsupported(f"Object {ref.number} has a stream without a dictionary.")
+        position += 2
+        while True:
+            position = WHITESPACE_PATTERN.match(buffer, position).end()
+            if buffer[position:position + 2] == b">>" or position >= span[1]:
+                return None, None
+            key = NAME_PATTERN.match(buffer, position)
+            if key is None:
+                raise RawPdfUnsupported(f"Expected a name at byte {position}.")
+            value, end = parse_value(buffer, key.end())
+            if key.group() == b"/Length":
+                return value, (key.start(), end)
+            position = end
+
+    def is_page_tree_node(self, scanned):
+        """Checks whether a scanned object is a /Page or /Pages dictionary."""
+        return PAGE_TREE_TYPE_PATTERN.search(self.buffer, *scanned.span) is not None
+
+    def _page_tree_root(self):
+        catalog = self.resolve(self.trailer.get(b"/Root"))
+        if not isinstance(catalog, dict) or not isinstance(catalog.get(b"/Pages"), Ref):
+            raise RawPdfUnsupported(f"{self.input_file} has no page tree.")
+        return catalog[b"/Pages"]
+
+    def _page_tree_node(self, ref):
+        """Parses a page tree node, keeping it for later lookups. Page tree nodes are small, and a lookup only parses the nodes on its way down."""
+        if ref not in self._page_tree_nodes:
+            node = self.get(ref)
+            if not isinstance(node, dict):
+                raise RawPdfUnsupported(f"{self.input_file} has a malformed page tree.")
+            self._page_tree_nodes[ref] = node
+        return self._page_tree_nodes[ref]
+
+    @staticmethod
+    def _is_pages_node(node):
+        return node.get(b"/Type") == b"/Pages" or b"/Kids" in node
+
+    def _count(self, node):
+        """The number of pages under a page tree node, taken from its /Count."""
+        if not self._is_pages_node(node):
+            return 1
+        count = self.resolve(node.get(b"/Count"))
+        if not isinstance(count, int) or count < 0:
+            raise RawPdfUnsupported(f"{self.input_file} has a page tree node without a valid /Count.")
+        return count
+
+    def number_of_pages(self):
+        """Returns the number of pages from the /Count of the page tree root, without walking the tree."""
+        if self._pages is not None:
+            return len(self._pages)
+        return self._count(self._page_tree_node(self._page_tree_root()))
+
+    def page(self, index):
+        """Returns the page at index (starting from 0) as a RawPage. Only the branches of the page tree which lead to the page are read, using the /Count of each node to skip over the others."""
+        if self._pages is not None:
+            return self._pages[index]
+
+        number_of_pages = self.number_of_pages()
+        if index < 0:
+            index += number_of_pages
+        if not 0 <= index < number_of_pages:
+            raise IndexError(f"Page {index + 1} is not within the document, which has {number_of_pages} pages.")
+
+        ref = self._page_tree_root()
+        inherited = {}
+        # A page tree deeper than the number of pages must have a loop in it.
+        for _ in range(number_of_pages + 1):
+            node = self._page_tree_node(ref)
+            if not self._is_pages_node(node):
+                attributes = dict(node)
+                for attribute, value in inherited.items():
+                    attributes.setdefault(attribute, value)
+                return RawPage(ref, attributes)
+
+            for attribute in INHERITABLE_PAGE_ATTRIBUTES:
+                if attribute in node:
+                    inherited[attribute] = node[attribute]
+
+            for kid in self.resolve(node.get(b"/Kids", [])):
+                if not isinstance(kid, Ref):
+                    raise RawPdfUnsupported(f"{self.input_file} has a direct page object.")
+                kid_count = self._count(self._page_tree_node(kid))
+                if index < kid_count:
+                    ref = kid
+                    break
+                index -= kid_count
+            else:
+                raise RawPdfUnsupported(f"The /Count entries of the page tree of {self.input_file} do not add up.")
+        raise RawPdfUnsupported(f"{self.input_file} has a loop in its page tree.")
+
+    def pages_at(self, indices):
+        """Returns the pages at indices (starting from 0) as RawPages, in the order given, found in one walk of the page tree. As with page(), the branches without any of the pages are skipped using their /Count, and the walk stops after the last page asked for."""
+        if self._pages is not None:
+            return [self._pages[index] for index in indices]
+
+        number_of_pages = self.number_of_pages()
+        positions = []
+        for index in indices:
+            position = index + number_of_pages if index < 0 else index
+            if not 0 <= position < number_of_pages:
+                raise IndexError(f"Page {position + 1} is not within the document, which has {number_of_pages} pages.")
+            positions.append(position)
+        if not positions:
+            return []
+        wanted = sorted(set(positions))
+
+        found = {}
+        visited = set()
+        # Depth first, with the kids pushed in reverse so that pages come out in order, each with the index of its first page.
+        stack = [(self._page_tree_root(), 0, {})]
+        while stack:
+            ref, offset, inherited = stack.pop()
+            if ref in visited:
+                raise RawPdfUnsupported(f"{self.input_file} has a loop in its page tree.")
+            visited.add(ref)
+
+            node = self._page_tree_node(ref)
+            if not self._is_pages_node(node):
+                attributes = dict(node)
+                for attribute, value in inherited.items():
+                    attributes.setdefault(attribute, value)
+                found[offset] = RawPage(ref, attributes)
+                continue
+
+            inherited = dict(inherited)
+            for attribute in INHERITABLE_PAGE_ATTRIBUTES:
+                if attribute in node:
+                    inherited[attribute] = node[attribute]
+
+            kids = []
+            kid_offset = offset
+            for kid in self.resolve(node.get(b"/Kids", [])):
+                if kid_offset > wanted[-1]:
+                    break
+                if not isinstance(kid, Ref):
+                    raise RawPdfUnsupported(f"{self.input_file} has a direct page object.")
+                kid_count = self._count(self._page_tree_node(kid))
+                # Only the kids with a page asked for under them are read any further.
+                first = bisect.bisect_left(wanted, kid_offset)
+                if first < len(wanted) and wanted[first] < kid_offset + kid_count:
+                    kids.append((kid, kid_offset, inherited))
+                kid_offset += kid_count
+            stack.extend(reversed(kids))
+
+        if any(position not in found for position in wanted):
+            raise RawPdfUnsupported(f"The /Count entries of the page tree of {self.input_file} do not add up.")
+        return [found[position] for position in positions]
+
+    def pages(self):
+        """Returns every page as a RawPage, with inherited attributes copied onto its dictionary."""
+        if self._pages is None:
+            self._pages = self._read_pages()
+        return self._pages
+
+    def _read_pages(self):
+        pages = []
+        visited = set()
+
+        # Depth first, with the kids pushed in reverse so that pages come out in order.
+        stack = [(self._page_tree_root(), {})]
+        while stack:
+            ref, inherited = stack.pop()
+            if ref in visited:
+                raise RawPdfUnsupported(f"{self.input_file} has a loop in its page tree.")
+            visited.add(ref)
+
+            node = self._page_tree_node(ref)
+
+            if self._is_pages_node(node):
+                inherited = dict(inherited)
+                for attribute in INHERITABLE_PAGE_ATTRIBUTES:
+                    if attribute in node:
+                        inherited[attribute] = node[attribute]
+                kids = self.resolve(node.get(b"/Kids", []))
+                for kid in reversed(kids):
+                    if not isinstance(kid, Ref):
+                        raise RawPdfUnsupported(f"{self.input_file} has a direct page object.")
+                    stack.append((kid, inherited))
+            else:
+                attributes = dict(node)
+                for attribute, value in inherited.items():
+                    attributes.setdefault(attribute, value)
+                pages.append(RawPage(ref, attributes))
+        return pages
+
+    def append_to(self, writer, page_numbers=None):
+        """Copies pages into a pdfstream.StreamingPdfWriter. page_numbers start from 0 and default to every page. Returns the number of pages written."""
+        if page_numbers is None:
+            pages = self.pages()
+        elif len(page_numbers) <= LAZY_LOOKUP_LIMIT:
+            pages = [self.page(page_number) for page_number in page_numbers]
+        else:
+            pages = self.pages_at(page_numbers)
+
+        # As with pdfstream.ReaderSource, one copier is kept per writer so that pages appended in several calls share
+        # their objects.
+        if writer not in self._copiers:
+            self._copiers[writer] = RawPageCopier(writer, self)
+        copier = self._copiers[writer]
+        copier.register_pages(pages)
+
+        # As in pdfstream.append_reader, pages only go into the page tree once all of them have been copied.
+        copied_numbers = [copier.copy_page(page) for page in pages]
+        for number in copied_numbers:
+            writer.add_page(number)
+        writer.commit_content(copier.new_content)
+        return len(copied_numbers)
+
+
+class RawPageCopier:
+    """The raw counterpart of pdfstream.ReaderPageCopier. Copies pages and every object they reference from a RawPdfReader into a StreamingPdfWriter, rewriting only object numbers.
+
+    As with ReaderPageCopier, references to pages which are not copied, and to /Pages nodes, become null."""
+
+    def __init__(self, writer, reader):
+        self.writer = writer
+        self.reader = reader
+
+        # Source object number -> object number in the output.
+        self.object_map = {}
+        self.page_map = {}
+        self.pending = []
+
+        # See pdfstream.ReaderPageCopier.
+        self.content_keys = {}
+        self.new_content = {}
+
+    def register_pages(self, pages):
+        for page in pages:
+            self.page_map.setdefault(page.ref.number, self.writer.reserve())
+
+    def copy_page(self, page):
+        number = self.page_map.get(page.ref.number)
+        if number is None or self.writer.offsets[number] is not None:
+            number = self.writer.reserve()
+
+        attributes = {key: value for key, value in page.attributes.items() if key != b"/Parent"}
+        attributes[Name(b"/Parent")] = OutputRef(self.writer.pages_root)
+        self.writer.write_object(number, serialize_value(attributes, self._map_reference))
+        self._flush_pending()
+        return number
+
+    def _map_reference(self, ref):
+        """Returns the bytes to write in place of a source reference, queueing the object to be copied if needed."""
+        if ref.number in self.page_map and self.reader.has_object(ref):
+            return b"%d 0 R" % self.page_map[ref.number]
+        if ref.number not in self.object_map:
+            if not self.reader.has_object(ref):
+                return b"null"
+            scanned = self.reader.scan(ref)
+            if self.reader.is_page_tree_node(scanned):
+                return b"null"
+
+            if self.writer.content_index is not None and scanned.data is not None:
+                content_key = self._content_key(ref)
+                if (existing := self.writer.find_content(content_key, self.new_content)) is not None:
+                    self.object_map[ref.number] = existing
+                    return b"%d 0 R" % existing
+                self.object_map[ref.number] = self.writer.reserve()
+                if content_key is not None:
+                    self.new_content[content_key] = self.object_map[ref.number]
+            else:
+                self.object_map[ref.number] = self.writer.reserve()
+            self.pending.append((self.object_map[ref.number], scanned))
+        return b"%d 0 R" % self.object_map[ref.number]
+
+    def _flush_pending(self):
+        while self.pending:
+            number, scanned = self.pending.pop()
+            self.writer.write_object(number, self._rewrite(scanned))
+
+    def _content_key(self, ref, depth=0):
+        """Returns a hash of the raw bytes of an object and, recursively, of everything it references. Returns None for anything which references a page or is part of a reference loop. See pdfstream.ReaderPageCopier._content_key."""
+        if ref.number in self.content_keys:
+            return self.content_keys[ref.number]
+
+        self.content_keys[ref.number] = None
+        if depth > MAX_CONTENT_KEY_DEPTH:
+            return None
+
+        if not self.reader.has_object(ref):
+            self.content_keys[ref.number] = b"null"
+            return b"null"
+        scanned = self.reader.scan(ref)
+        if self.reader.is_page_tree_node(scanned):
+            return None
+
+        buffer = self.reader.buffer
+        digest = hashlib.blake2b(digest_size=20)
+        start, end = scanned.span
+        position = start
+        # As in _rewrite, the /Length entry is hashed as the actual length, so that an indirect '/Length 12 0 R' does
+        # not put the number of the length object, which differs from file to file, into the key.
+        replacements = [(reference_start, reference_end, Ref(number, generation)) for reference_start, reference_end, number, generation in scanned.references]
+        if scanned.length_span is not None:
+            length_start, length_end = scanned.length_span
+            replacements = [replacement for replacement in replacements if not (length_start <= replacement[0] < length_end)]
+            replacements.append((length_start, length_end, None))
+            replacements.sort(key=lambda replacement: replacement[0])
+
+        for replacement_start, replacement_end, child in replacements:
+            digest.update(buffer[position:replacement_start])
+            if child is None:
+                digest.update(b"/Length %d" % (scanned.data[1] - scanned.data[0]))
+            else:
+                child_key = self._content_key(child, depth + 1)
+                if child_key is None:
+                    return None
+                digest.update(b"<" + child_key + b">")
+            position = replacement_end
+        digest.update(buffer[position:end])
+
+        if scanned.data is not None:
+            digest.update(b"stream")
+            digest.update(buffer[scanned.data[0]:scanned.data[1]])
+
+        self.content_keys[ref.number] = digest.digest()
+        return self.content_keys[ref.number]
+
+    def _rewrite(self, scanned):
+        """Returns the bytes of a scanned object with its references rewritten and its stream data copied as is."""
+        buffer = self.reader.buffer
+        start, end = scanned.span
+        pieces = []
+        position = start
+
+        # The /Length entry of a stream is replaced with the actual length, which also drops any indirect length
+        # object.
+        replacements = [(reference_start, reference_end, Ref(number, generation)) for reference_start, reference_end, number, generation in scanned.references]
+        if scanned.length_span is not None:
+            length_start, length_end = scanned.length_span
+            replacements = [replacement for replacement in replacements if not (length_start <= replacement[0] < length_end)]
+            replacements.append((length_start, length_end, None))
+            replacements.sort(key=lambda replacement: replacement[0])
+
+        for replacement_start, replacement_end, ref in replacements:
+            pieces.append(buffer[position:replacement_start])
+            if ref is None:
+                pieces.append(b"/Length %d" % (scanned.data[1] - scanned.data[0]))
+            else:
+                pieces.append(self._map_reference(ref))
+            position = replacement_end
+        pieces.append(buffer[position:end])
+
+        if scanned.data is not None:
+            pieces.append(b"\nstream\n")
+            pieces.append(buffer[scanned.data[0]:scanned.data[1]])
+            pieces.append(b"\nendstream")
+        return b"".join(pieces)
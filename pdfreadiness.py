@@ -0,0 +1,119 @@
+"""
+When wkhtmltopdf should take its picture of a page. By default it waits for the page to load and then 200 ms for scripts, which is too short for pages built by JavaScript, so pdffromlinks used to inject a script which set window.status to 'ready' a fixed second after loading, and had wkhtmltopdf wait for that. Every page then took at least a second, and pages slower than that still came out half drawn.
+
+A Readiness gives wkhtmltopdf a script which decides when the page is ready, by one of these strategies:
+- 'fixed': a fixed delay after loading, as before;
+- 'dom-ready': as soon as the document and everything it loaded is complete;
+- 'network-quiet' (the default): once nothing has changed for 'quiet' milliseconds: no request of the page's own scripts is still running, no image is still loading, and the document has stopped growing or shrinking. A page which never settles is taken after 'cap' milliseconds.
+
+The script also logs how long each page waited, which wkhtmltopdf prints with --debug-javascript, so that the wait can be recorded per URL; see parse_waits. The scripts are ES5, which is what the WebKit in wkhtmltopdf understands.
+"""
+
+import os
+import re
+import urllib.parse
+import urllib.request
+
+
+STRATEGIES = ("fixed", "dom-ready", "network-quiet")
+DEFAULT_STRATEGY = "network-quiet"
+
+# In milliseconds.
+DEFAULT_DELAY = 1000
+DEFAULT_QUIET = 500
+DEFAULT_CAP = 10000
+POLL_INTERVAL = 50
+
+# The options a Readiness sets. If the options given already set any of them, they are left as they are.
+READINESS_OPTIONS = ("window-status", "run-script", "javascript-delay")
+
+READY_STATUS = "ready"
+WAIT_MARKER = "pdffromlinks-ready"
+WAIT_PATTERN = re.compile(WAIT_MARKER + r" (\d+) (\S+)")
+
+# Logs how long the page waited and tells wkhtmltopdf it is ready. Shared by every strategy.
+DONE_SCRIPT = "function done(){{console.log('" + WAIT_MARKER + " '+(new Date().getTime()-start)+' '+location.href);window.status='" + READY_STATUS + "';}}"
+
+SCRIPTS = {
+    "fixed": "(function(){{var start=new Date().getTime();" + DONE_SCRIPT + "window.setTimeout(done,{delay});}})();",
+    "dom-ready": "(function(){{var start=new Date().getTime();" + DONE_SCRIPT + "if(document.readyState==='complete'){{done();}}else{{window.addEventListener('load',done,false);}}}})();",
+    "network-quiet": "(function(){{var start=new Date().getTime(),last=start,previous=null,running=0;" + DONE_SCRIPT
+                     + "var send=XMLHttpRequest.prototype.send;"
+                     + "XMLHttpRequest.prototype.send=function(){{var request=this;running++;"
+                     + "request.addEventListener('readystatechange',function(){{if(request.readyState===4){{running--;}}}},false);"
+                     + "return send.apply(request,arguments);}};"
+                     + "function poll(){{var now=new Date().getTime(),loading=0,i;"
+                     + "for(i=0;i<document.images.length;i++){{if(!document.images[i].complete){{loading++;}}}}"
+                     + "var state=running+':'+loading+':'+document.documentElement.innerHTML.length;"
+                     + "if(state!==previous||running>0||loading>0){{previous=state;last=now;}}"
+                     + "if(now-last>={quiet}||now-start>={cap}){{done();}}else{{window.setTimeout(poll,{interval});}}}}"
+                     + "poll();}})();",
+}
+
+
+class Readiness:
+    """
+    A strategy for when a page is ready to be rendered. See the module docstring.
+
+    delay -> For 'fixed', how many milliseconds to wait after loading.
+
+    quiet, cap -> For 'network-quiet', how many milliseconds nothing may change for, and the most to wait in all.
+    """
+
+    def __init__(self, strategy=DEFAULT_STRATEGY, delay=DEFAULT_DELAY, quiet=DEFAULT_QUIET, cap=DEFAULT_CAP):
+        if strategy not in STRATEGIES:
+            raise ValueError(f"strategy should be one of {STRATEGIES}, not {strategy!r}.")
+        self.strategy = strategy
+        self.delay = delay
+        self.quiet = quiet
+        self.cap = cap
+
+    def __repr__(self):
+        return f"Readiness({self.strategy!r}, delay={self.delay}, quiet={self.quiet}, cap={self.cap})"
+
+    def describe(self):
+        """Returns the settings as a dict, which Readiness(**settings) turns back into the same Readiness."""
+        return {"strategy": self.strategy, "delay": self.delay, "quiet": self.quiet, "cap": self.cap}
+
+    def script(self):
+        return SCRIPTS[self.strategy].format(delay=int(self.delay), quiet=int(self.quiet), cap=int(self.cap), interval=POLL_INTERVAL)
+
+    def options(self):
+        """Returns the wkhtmltopdf options for this strategy. --debug-javascript makes wkhtmltopdf print what the script logs, as warnings, and --log-level warn leaves out its progress. See pdfrender.wkhtmltopdf_command for why --quiet is not given with them."""
+        return {"window-status": READY_STATUS, "run-script": self.script(), "javascript-delay": "0", "debug-javascript": "", "log-level": "warn"}
+
+    def apply(self, options):
+        """Returns options with this strategy's options added, unless options already decide when a page is ready themselves, or turn JavaScript off, in which case the script could never say the page is ready."""
+        options = dict(options or {})
+        if any(name in options for name in READINESS_OPTIONS) or "disable-javascript" in options:
+            return options
+        return {**self.options(), **options}
+
+
+def readiness_from(value):
+    """Returns a Readiness from a strategy name, a dict from Readiness.describe(), a Readiness, or None for the default."""
+    if value is None:
+        return Readiness()
+    if isinstance(value, Readiness):
+        return value
+    if isinstance(value, dict):
+        return Readiness(**value)
+    return Readiness(value)
+
+
+def location_of(source):
+    """Returns what location.href is for a page rendered from source: the link itself, or for a local file, its file: URL."""
+    if urllib.parse.urlsplit(source).scheme in ("http", "https", "file"):
+        return source
+    return urllib.parse.urljoin("file:", urllib.request.pathname2url(os.path.abspath(source)))
+
+
+def parse_waits(output, sources):
+    """Returns {source: milliseconds waited} for the pages of one wkhtmltopdf run whose wait the readiness script logged in output. Pages which were redirected elsewhere are left out."""
+    locations = {urllib.parse.unquote(location_of(source)): source for source in sources}
+    waits = {}
+    for match in WAIT_PATTERN.finditer(output):
+        source = locations.get(urllib.parse.unquote(match.group(2)))
+        if source is not None:
+            waits[source] = int(match.group(1))
+    return waits
@@ -0,0 +1,698 @@
+"""
+Parallel rendering for pdffromlinks. A list of links is split into chunks, and each chunk is rendered to its own PDF by its own wkhtmltopdf process, several at a time, so that a long list of links uses all the cores instead of one. How large each chunk is, is decided as the rendering goes by a ChunkPlanner, from what each process has cost so far; a chunk which fails is split in half until only the bad link is left out.
+
+With a RenderCache, each page is rendered to its own PDF and kept, keyed by a hash of its HTML, the options and the wkhtmltopdf version, so that a later run only renders the pages which changed and merges the rest from the cache. Every process has a timeout, so one page which never finishes loading cannot hold up the rest. The chunk PDFs are then merged, in link order, into the one output file with pdfmerge.
+
+With passthrough, links which already point at PDFs are downloaded and merged as they are, and links which are neither pages nor PDFs are left out; see pdfclassify.
+
+With a pdfsnapshot.SnapshotStore, each page is rendered from the HTML the crawler saved, so that it is not downloaded a second time by wkhtmltopdf.
+
+The wkhtmltopdf command line is built by pdfkit from the same configuration and options as pdfkit.from_url, but the process is run here, so that it can be given a timeout and killed.
+"""
+
+import bisect
+import collections
+import concurrent.futures
+import contextlib
+import functools
+import hashlib
+import json
+import math
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import pdfkit
+
+import pdfclassify
+import pdfcrawl
+import pdfhttp
+import pdfjournal
+import pdfmerge
+import pdfreadiness
+
+
+# How many wkhtmltopdf processes run at the same time, and how long each may take, in seconds.
+DEFAULT_RENDER_WORKERS = os.cpu_count() or 1
+DEFAULT_RENDER_TIMEOUT = 30 * 60
+
+# No chunk is larger than this, however cheap the pages are. Above about 200 links, wkhtmltopdf tends to write
+# unreadable or plain-text PDFs.
+DEFAULT_MAX_CHUNK_LINKS = 150
+
+# Windows limits a whole command line to 32767 characters, which is what used to cause [WinError 206]. Only this
+# share of the limit is used, to leave room for quoting.
+WINDOWS_COMMAND_LINE_LIMIT = 32767
+COMMAND_LINE_MARGIN = 0.9
+
+# Share of the physical memory all the wkhtmltopdf processes together may use, going by the peak memory seen so far.
+MEMORY_SHARE = 0.5
+
+# Once a time per link has been measured, a chunk may take at most this many times its predicted time (and never
+# less than MIN_ADAPTIVE_TIMEOUT seconds, nor more than the timeout given) before it is killed and split.
+TIMEOUT_FACTOR = 4
+MIN_ADAPTIVE_TIMEOUT = 60
+
+# How often run_process checks whether wkhtmltopdf has finished, in seconds: at first every WAIT_POLL_MIN, backing off
+# to every WAIT_POLL_MAX, as Popen.wait does.
+WAIT_POLL_MIN = 0.0005
+WAIT_POLL_MAX = 0.05
+
+# The render cache deletes the least recently used PDFs once they add up to more than this many bytes.
+DEFAULT_RENDER_CACHE_SIZE = 2 * 1024 * 1024 * 1024
+
+
+def command_line_limit():
+    """Returns how many characters a wkhtmltopdf command line may have on this system."""
+    if sys.platform == 'win32':
+        return WINDOWS_COMMAND_LINE_LIMIT
+    try:
+        # The arguments share ARG_MAX with the environment.
+        return os.sysconf('SC_ARG_MAX') - sum(len(key) + len(value) + 2 for key, value in os.environ.items())
+    except (ValueError, OSError, AttributeError):
+        return WINDOWS_COMMAND_LINE_LIMIT
+
+
+def physical_memory():
+    """Returns the physical memory in bytes, or None if it is not known."""
+    try:
+        return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES')
+    except (ValueError, OSError, AttributeError):
+        return None
+
+
+def wkhtmltopdf_command(links, destination, config, options):
+    """Returns the wkhtmltopdf command line pdfkit.from_url would run to render links to destination.
+
+    pdfkit adds --quiet unless it is verbose, which silences wkhtmltopdf altogether. With --debug-javascript, which a pdfreadiness strategy sets, it is left out, so that what the page's scripts log is printed and the waits can be read from it."""
+    verbose = any(name.lstrip("-") == "debug-javascript" for name in (options or {}))
+    return pdfkit.PDFKit(links, 'url', options=options, configuration=config, verbose=verbose).command(destination)
+
+
+def run_process(args, env, timeout):
+    """Runs args with stdout and stderr combined. Returns (exit code, output, elapsed seconds, peak memory in bytes). The process is killed after timeout seconds and TimeoutError is raised. The peak memory is None where the system does not report it per process."""
+    process_options = {}
+    if sys.platform == 'win32':
+        # Hide the console window, as pdfkit does.
+        startupinfo = subprocess.STARTUPINFO()
+        startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+        startupinfo.wShowWindow = subprocess.SW_HIDE
+        process_options["startupinfo"] = startupinfo
+
+    # The output goes to a file rather than a pipe, so that nothing has to read it while waiting for the process.
+    with tempfile.TemporaryFile() as output:
+        start = time.perf_counter()
+        process = subprocess.Popen(args, stdin=subprocess.DEVNULL, stdout=output, stderr=subprocess.STDOUT, env=env, **process_options)
+        peak_memory = None
+
+        if hasattr(os, "wait4"):
+            # wait4 reports the resources used by this one process, including its peak memory. It is polled, as
+            # Popen.wait does, rather than left blocking while a timer kills the process, so that the process is only
+            # ever killed by this thread before it has been reaped, and never once its pid may belong to another.
+            deadline = start + timeout
+            delay = WAIT_POLL_MIN
+            timed_out = False
+            while True:
+                pid, status, usage = os.wait4(process.pid, os.WNOHANG)
+                if pid:
+                    break
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    process.kill()
+                    timed_out = True
+                    _, status, usage = os.wait4(process.pid, 0)
+                    break
+                time.sleep(min(delay, remaining))
+                delay = min(delay * 2, WAIT_POLL_MAX)
+            process.returncode = os.WEXITSTATUS(status) if os.WIFEXITED(status) else -os.WTERMSIG(status)
+            if timed_out:
+                raise TimeoutError(f"wkhtmltopdf did not finish within {timeout:.0f} seconds.")
+            # ru_maxrss is in bytes on macOS and in kilobytes elsewhere.
+            peak_memory = usage.ru_maxrss if sys.platform == 'darwin' else usage.ru_maxrss * 1024
+        else:
+            try:
+                process.wait(timeout)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.wait()
+                raise TimeoutError(f"wkhtmltopdf did not finish within {timeout:.0f} seconds.")
+
+        elapsed = time.perf_counter() - start
+        output.seek(0)
+        return process.returncode, output.read().decode('utf-8', errors='replace'), elapsed, peak_memory
+
+
+def render_chunk(links, destination, config, options, timeout=DEFAULT_RENDER_TIMEOUT, planner=None, waits=None):
+    """Renders links (a list, or one link) to destination with one wkhtmltopdf process. Raises TimeoutError if it takes longer than timeout seconds, and IOError if wkhtmltopdf fails or writes no PDF. Returns destination.
+
+    If a ChunkPlanner is given, the time, memory and outcome are recorded with it. If a dict is given as waits, how many milliseconds each link waited to be ready, as logged by a pdfreadiness script, is added to it."""
+    args = wkhtmltopdf_command(links, destination, config, options)
+    number_of_links = 1 if isinstance(links, str) else len(links)
+
+    try:
+        exit_code, output, elapsed, peak_memory = run_process(args, config.environ, timeout)
+        pdfkit.PDFKit.handle_error(exit_code, output)
+        if not os.path.exists(destination) or os.path.getsize(destination) < 4:
+            raise IOError(f"wkhtmltopdf wrote no PDF to {destination}.")
+    except Exception:
+        if planner is not None:
+            planner.record_failure(number_of_links)
+        raise
+
+    if planner is not None:
+        planner.record_success(number_of_links, elapsed, peak_memory)
+    if waits is not None:
+        waits.update(pdfreadiness.parse_waits(output, [links] if isinstance(links, str) else links))
+    return destination
+
+
+class ChunkPlanner:
+    """
+    Decides how many links each wkhtmltopdf process gets, from what it has measured so far, instead of a fixed part_split.
+
+    A chunk is as large as it can be while:
+    - staying within max_links, and within the command line limit of the system (which is what causes [WinError 206]);
+    - keeping every worker busy, so no more than an even share of all the links;
+    - fitting in memory: each process may use an even share of MEMORY_SHARE of the physical memory, going by the peak memory per link seen so far;
+    - not wasting too much on failures. A chunk which fails is split in half and each half is retried, so a chunk of n links with a failure rate of q per link costs about q * n extra links of work. This is worth it while the startup cost of a process, s, saved by making chunks larger, outweighs it, which gives at most sqrt(s / (q * p)) links, where p is the time per link.
+
+    The startup cost and the time per link are fitted to the chunks rendered so far; until there are two, the startup cost is measured by running wkhtmltopdf --version.
+
+    A ChunkPlanner may be shared between threads.
+    """
+
+    def __init__(self, config, options, workers=DEFAULT_RENDER_WORKERS, max_links=DEFAULT_MAX_CHUNK_LINKS, timeout=DEFAULT_RENDER_TIMEOUT):
+        self.config = config
+        self.options = options
+        self.workers = workers
+        self.max_links = max_links
+        self.timeout = timeout
+        self.command_line_limit = int(command_line_limit() * COMMAND_LINE_MARGIN)
+        memory = physical_memory()
+        self.memory_budget = memory * MEMORY_SHARE / workers if memory else None
+
+        self._lock = threading.Lock()
+        self._samples = []
+        self._startup = None
+        self._memory_per_link = 0
+        self.links_attempted = 0
+        self.failures = 0
+
+    def measure_startup(self):
+        """Times wkhtmltopdf --version, as the cost of starting a process before any chunk has been rendered."""
+        try:
+            _, _, elapsed, _ = run_process([wkhtmltopdf_path(self.config), '--version'], self.config.environ, MIN_ADAPTIVE_TIMEOUT)
+        except (OSError, TimeoutError):
+            elapsed = 1.0
+        with self._lock:
+            self._startup = elapsed
+        return elapsed
+
+    def record_success(self, number_of_links, elapsed, peak_memory=None):
+        with self._lock:
+            self._samples.append((number_of_links, elapsed))
+            self.links_attempted += number_of_links
+            if peak_memory:
+                self._memory_per_link = max(self._memory_per_link, peak_memory / number_of_links)
+
+    def record_failure(self, number_of_links):
+        with self._lock:
+            self.links_attempted += number_of_links
+            self.failures += 1
+
+    def costs(self):
+        """Returns (startup seconds, seconds per link), fitted to the chunks rendered so far, or (None, None) before anything has been measured."""
+        with self._lock:
+            samples = list(self._samples)
+            startup = self._startup
+
+        if len({n for n, _ in samples}) >= 2:
+            # Least squares fit of elapsed = startup + n * per_link.
+            count = len(samples)
+            mean_n = sum(n for n, _ in samples) / count
+            mean_t = sum(t for _, t in samples) / count
+            per_link = sum((n - mean_n) * (t - mean_t) for n, t in samples) / sum((n - mean_n) ** 2 for n, _ in samples)
+            if per_link > 0:
+                return max(mean_t - per_link * mean_n, 0.0), per_link
+
+        if samples and startup is not None:
+            per_link = sum(max(t - startup, 0.0) for _, t in samples) / sum(n for n, _ in samples)
+            return startup, max(per_link, 1e-6)
+        return startup, None
+
+    def chunk_size(self, total):
+        """Returns how many links the next chunk of a job of 'total' links should take, before the command line limit."""
+        size = min(self.max_links, max(1, math.ceil(total / self.workers)))
+
+        with self._lock:
+            memory_per_link = self._memory_per_link
+            failure_rate = self.failures / self.links_attempted if self.links_attempted else 0
+
+        if self.memory_budget and memory_per_link:
+            size = min(size, int(self.memory_budget / memory_per_link))
+
+        if failure_rate:
+            startup, per_link = self.costs()
+            if startup and per_link:
+                size = min(size, int(math.sqrt(startup / (failure_rate * per_link))))
+
+        return max(1, size)
+
+    def take(self, links, start, stop=None):
+        """Returns the end index of the next chunk of links, beginning at start and ending at stop at the latest."""
+        size = self.chunk_size(len(links))
+        if stop is None:
+            stop = len(links)
+
+        # Stop before the command line gets too long, whatever the size. Every link is one more argument.
+        length = sum(len(arg) + 3 for arg in wkhtmltopdf_command([], "output.pdf", self.config, self.options))
+        end = start
+        while end < stop and end - start < size:
+            length += len(links[end]) + 3
+            if length > self.command_line_limit and end > start:
+                break
+            end += 1
+        return end
+
+    def timeout_for(self, number_of_links):
+        """Returns how long a chunk of number_of_links may take before it is killed: TIMEOUT_FACTOR times its predicted time, within MIN_ADAPTIVE_TIMEOUT and the timeout given."""
+        startup, per_link = self.costs()
+        if startup is None or per_link is None:
+            return self.timeout
+        return min(self.timeout, max(MIN_ADAPTIVE_TIMEOUT, TIMEOUT_FACTOR * (startup + per_link * number_of_links)))
+
+
+def render_chunks(links, work_dir, config, options, workers=DEFAULT_RENDER_WORKERS, timeout=DEFAULT_RENDER_TIMEOUT, planner=None, breaks=(), on_rendered=None, on_failed=None, waits=None):
+    """
+    Renders links to part PDFs in work_dir, with up to 'workers' wkhtmltopdf processes at a time, sizing each chunk with planner (a ChunkPlanner) as it goes.
+
+    A chunk which fails is split in half and each half is rendered again, so that only the part with the bad link is rendered again, not the whole batch, and in the end only the bad link itself is left out.
+
+    breaks -> Sorted indices of links which must begin a new chunk.
+
+    on_rendered, on_failed -> Called, as soon as it happens, with (start, end, path) for each part rendered, and with (index, error message) for each link left out.
+
+    waits -> A dict which how long each link waited to be ready is added to; see render_chunk.
+
+    Returns the part PDFs as a list of (start, end, path) in link order, and the errors.
+    """
+    if planner is None:
+        planner = ChunkPlanner(config, options, workers, timeout=timeout)
+    if planner.costs()[0] is None:
+        planner.measure_startup()
+
+    parts = []
+    errors = []
+    retries = []
+    next_start = 0
+
+    def submit(executor, start, end):
+        destination = os.path.join(work_dir, f"part{start + 1:07d}-{end:07d}.pdf")
+        return executor.submit(render_chunk, links[start:end], destination, config, options, planner.timeout_for(end - start), planner, waits)
+
+    # The work is done by the wkhtmltopdf processes, so threads are enough to keep them busy.
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        running = {}
+        while running or retries or next_start < len(links):
+            # Keep every worker busy: halves of failed chunks first, then new chunks.
+            while len(running) < workers and (retries or next_start < len(links)):
+                if retries:
+                    start, end = retries.pop()
+                else:
+                    # A chunk never runs over a break.
+                    following = bisect.bisect_right(breaks, next_start)
+                    stop = breaks[following] if following < len(breaks) else None
+                    start, end = next_start, planner.take(links, next_start, stop)
+                    next_start = end
+                running[submit(executor, start, end)] = (start, end)
+
+            done, _ = concurrent.futures.wait(running, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                start, end = running.pop(future)
+                try:
+                    path = future.result()
+                except Exception as e:
+                    if end - start > 1:
+                        middle = (start + end) // 2
+                        print(f"Links {start + 1} to {end} failed, retrying as links {start + 1} to {middle} and {middle + 1} to {end}: {str(e).strip()}")
+                        retries.extend([(middle, end), (start, middle)])
+                    else:
+                        # Carries on despite errors so that one bad link does not lose the others.
+                        print(f"Error for link {start + 1} ({links[start]}): {str(e)}")
+                        errors.append(f"Error for link {start + 1} ({links[start]}): {str(e)}")
+                        if on_failed is not None:
+                            on_failed(start, str(e))
+                else:
+                    parts.append((start, end, path))
+                    print(f"Rendered links {start + 1} to {end} of {len(links)}.")
+                    if on_rendered is not None:
+                        on_rendered(start, end, path)
+
+    parts.sort()
+    return parts, errors
+
+
+def chunk_key(keys):
+    """Returns the key a chunk of links is cached under: the render key of its link, for a chunk of one, or a hash of the render keys of its links, in order."""
+    if len(keys) == 1:
+        return keys[0]
+    key = hashlib.blake2b(digest_size=20)
+    for link_key in keys:
+        key.update(link_key.encode('utf-8'))
+    return key.hexdigest()
+
+
+class RenderCache:
+    """
+    Keeps rendered chunks of pages in a folder, so that pages whose HTML, options and wkhtmltopdf version have not changed are not rendered again. Each chunk is one PDF, named by chunk_key() of the render_key() of each of its links, with the render keys beside it in a .keys file, one per line, unless it has just one link.
+
+    The links are rendered in chunks as large as the ChunkPlanner makes them, as without a cache, rather than one link per wkhtmltopdf process. A run of links whose render keys are those of a cached chunk, in the same order, reuses that chunk. A chunk with a page which changed is rendered again as a whole, so each change costs a chunk, not a page.
+
+    max_size -> Once the PDFs add up to more than this many bytes, the least recently used ones are deleted by evict(). Each PDF's modification time is its last use.
+    """
+
+    def __init__(self, directory, max_size=DEFAULT_RENDER_CACHE_SIZE):
+        self.directory = directory
+        self.max_size = max_size
+        os.makedirs(directory, exist_ok=True)
+        # The render keys of every cached chunk, by the key of its first link. Read from the folder on first use.
+        self._chunks = None
+
+    def path_for(self, key):
+        return os.path.join(self.directory, f"{key}.pdf")
+
+    def keys_path_for(self, key):
+        return os.path.join(self.directory, f"{key}.keys")
+
+    def _index(self):
+        if self._chunks is None:
+            self._chunks = collections.defaultdict(list)
+            for entry in os.scandir(self.directory):
+                name, extension = os.path.splitext(entry.name)
+                if extension == ".pdf":
+                    keys = [name]
+                    if os.path.exists(self.keys_path_for(name)):
+                        with open(self.keys_path_for(name)) as f:
+                            keys = f.read().split()
+                    if keys:
+                        self._chunks[keys[0]].append(tuple(keys))
+        return self._chunks
+
+    def find(self, keys, start=0):
+        """Returns (end, path) for the longest cached chunk whose links have the render keys keys[start:end], and marks it as used, or None if no cached chunk begins with keys[start]. keys may hold None for links without a render key."""
+        if keys[start] is None:
+            return None
+        for chunk in sorted(self._index().get(keys[start], ()), key=len, reverse=True):
+            if tuple(keys[start:start + len(chunk)]) == chunk and (path := self.get(chunk_key(chunk))) is not None:
+                return start + len(chunk), path
+        return None
+
+    def get(self, key):
+        """Returns the cached PDF for key and marks it as used, or None if there is none."""
+        path = self.path_for(key)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def put(self, keys, pdf_file):
+        """Moves pdf_file, the rendered chunk of the links with these render keys, into the cache and returns its new path. Call evict() once the cached PDFs are no longer needed for the output."""
+        key = chunk_key(keys)
+        if len(keys) > 1:
+            with open(self.keys_path_for(key), "w") as f:
+                f.write("\n".join(keys))
+        path = self.path_for(key)
+        os.replace(pdf_file, path)
+        if self._chunks is not None and tuple(keys) not in self._chunks[keys[0]]:
+            self._chunks[keys[0]].append(tuple(keys))
+        return path
+
+    def evict(self):
+        """Deletes the least recently used PDFs until the cache is within max_size."""
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".pdf") and entry.is_file():
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        size = sum(entry_size for _, entry_size, _ in entries)
+        for _, entry_size, path in sorted(entries):
+            if size <= self.max_size:
+                break
+            os.remove(path)
+            keys_path = os.path.splitext(path)[0] + ".keys"
+            if os.path.exists(keys_path):
+                os.remove(keys_path)
+            size -= entry_size
+        # Read the folder again on next use.
+        self._chunks = None
+
+
+def wkhtmltopdf_path(config):
+    wkhtmltopdf = config.wkhtmltopdf
+    return wkhtmltopdf.decode('utf-8') if isinstance(wkhtmltopdf, bytes) else wkhtmltopdf
+
+
+@functools.lru_cache(maxsize=None)
+def _wkhtmltopdf_version(wkhtmltopdf):
+    try:
+        return subprocess.run([wkhtmltopdf, '--version'], stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, timeout=MIN_ADAPTIVE_TIMEOUT).stdout.decode('utf-8', errors='replace').strip()
+    except (OSError, subprocess.TimeoutExpired):
+        return ""
+
+
+def wkhtmltopdf_version(config):
+    """Returns what wkhtmltopdf --version prints, so that cached renders are not reused after an upgrade."""
+    return _wkhtmltopdf_version(wkhtmltopdf_path(config))
+
+
+def render_key(url, html_page, options, version):
+    """Returns the render cache key for url: a hash of the URL, its HTML as fetched, the pdfkit options and the wkhtmltopdf version. Changes to the images or stylesheets a page uses are not part of the key."""
+    key = hashlib.blake2b(digest_size=20)
+    for part in (url.encode('utf-8'), html_page, json.dumps(options or {}, sort_keys=True, default=str).encode('utf-8'), version.encode('utf-8')):
+        key.update(len(part).to_bytes(8, 'little'))
+        key.update(part)
+    return key.hexdigest()
+
+
+def snapshot_links(links, snapshots, session=None, workers=DEFAULT_RENDER_WORKERS):
+    """Makes sure every link has an up to date snapshot in snapshots (a pdfsnapshot.SnapshotStore), fetching with session the links which were not saved by the crawl, and returns what each link should be rendered from: its snapshot, or the link itself if it could not be fetched or is not HTML."""
+    session = session or pdfhttp.default_session()
+
+    def source_for(link):
+        if link in snapshots.saved:
+            return snapshots.path_for(link)
+        try:
+            pdfcrawl.fetch_page(link, session, snapshots)
+        except Exception as e:
+            print(f"Could not fetch {link} to save a snapshot, so wkhtmltopdf will fetch it: {str(e)}")
+            return link
+        # Pages which are not HTML are not saved, and are left to wkhtmltopdf.
+        return snapshots.path_for(link) if link in snapshots.saved else link
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(workers, pdfcrawl.DEFAULT_CONCURRENCY)) as executor:
+        return list(executor.map(source_for, links))
+
+
+def render_keys(links, options, version, session=None, workers=DEFAULT_RENDER_WORKERS, snapshots=None):
+    """Fetches every link with session (normally one with a pdfhttp.HttpCache, so that unchanged pages are only revalidated) and returns their render keys, with None for links which could not be fetched. Links saved in snapshots (a pdfsnapshot.SnapshotStore) by this run are read from there instead."""
+    session = session or pdfhttp.default_session()
+
+    def key_for(link):
+        try:
+            if snapshots is not None and link in snapshots.saved:
+                with open(snapshots.path_for(link), "rb") as f:
+                    return render_key(link, f.read(), options, version)
+            return render_key(link, session.get(link).body, options, version)
+        except Exception as e:
+            print(f"Could not fetch {link} to check the render cache: {str(e)}")
+            return None
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(workers, pdfcrawl.DEFAULT_CONCURRENCY)) as executor:
+        return list(executor.map(key_for, links))
+
+
+def render_links(links, folder_name, file_name, config, options, workers=DEFAULT_RENDER_WORKERS, timeout=DEFAULT_RENDER_TIMEOUT, max_chunk_links=DEFAULT_MAX_CHUNK_LINKS, cache=None, session=None, journal=None, snapshots=None, passthrough=False):
+    """
+    Renders links to {folder_name}/{file_name}.pdf. The links are rendered in chunks by up to 'workers' wkhtmltopdf processes at a time, each given at most 'timeout' seconds, and the chunks are merged in link order. How many links each chunk gets is decided as the rendering goes; see ChunkPlanner. No chunk gets more than max_chunk_links.
+
+    With passthrough=True, the links are first classified with pdfclassify: links to PDFs are downloaded as they are, with session, and merged in their place instead of being rendered, and links to anything which is neither a PDF nor a page, such as images, are left out.
+
+    With a RenderCache, every link is fetched with session to work out its render key, and runs of links which were rendered in one chunk before, and have not changed, reuse that chunk's PDF. The other links are rendered in chunks as usual, and each chunk is added to the cache.
+
+    With a pdfsnapshot.SnapshotStore, each link is rendered from its snapshot rather than fetched again by wkhtmltopdf. Links the crawl did not save are fetched with session and saved first.
+
+    With a pdfjournal.Journal, every link rendered or failed is recorded in it as soon as it is, and the chunks are kept in the .render-{file_name} folder until they are merged. If the journal already records the same links, the links it records as rendered, whose PDFs are still there, are not rendered again.
+
+    Links which cannot be rendered are left out of the output and reported. Returns the destination and the errors. Raises IOError if nothing could be rendered.
+    """
+    destination = pdfmerge.sanitize_file_path(folder_name, file_name)
+    pdfmerge.check_output_file_exists(destination)
+
+    # The PDF each link was rendered or downloaded to, or None while it is still to be rendered. Links which are left
+    # out, or whose download failed, are in excluded.
+    outputs = [None] * len(links)
+    excluded = set()
+    if journal is not None:
+        journal.start_render(links)
+        for index, (status, output, _) in enumerate(journal.render_state()):
+            if status == pdfjournal.DONE and output is not None and os.path.exists(output):
+                outputs[index] = output
+            elif status == pdfjournal.SKIPPED:
+                excluded.add(index)
+        if any(outputs):
+            print(f"{len(links) - outputs.count(None)} of {len(links)} links were rendered before.")
+
+    def unrendered():
+        return [index for index, output in enumerate(outputs) if output is None and index not in excluded]
+
+    errors = []
+    parts_dir = os.path.join(folder_name, f".render-{file_name}")
+    with contextlib.ExitStack() as stack:
+        if journal is None:
+            # The parts are kept next to the output so that they are on the same disk, and removed once they are merged.
+            work_dir = stack.enter_context(tempfile.TemporaryDirectory(prefix=".render-", dir=folder_name))
+        else:
+            # Each run gets its own folder, so that its parts cannot overwrite those of an earlier run still in use.
+            os.makedirs(parts_dir, exist_ok=True)
+            work_dir = tempfile.mkdtemp(prefix="run-", dir=parts_dir)
+
+        if passthrough:
+            errors.extend(download_documents(links, unrendered(), work_dir, outputs, excluded, session, journal, snapshots))
+
+        # What each link is rendered from: its snapshot, or the link itself.
+        sources = list(links)
+        if snapshots is not None:
+            indices = unrendered()
+            for index, source in zip(indices, snapshot_links([links[index] for index in indices], snapshots, session, workers)):
+                sources[index] = source
+            print(f"{sum(sources[index] != links[index] for index in indices)} of {len(indices)} links will be rendered from snapshots.")
+
+        keys = [None] * len(links)
+        planner = ChunkPlanner(config, options, workers, max_chunk_links, timeout)
+        if cache is not None:
+            indices = unrendered()
+            for index, key in zip(indices, render_keys([links[index] for index in indices], options, wkhtmltopdf_version(config), session, workers, snapshots)):
+                keys[index] = key
+            # A cached chunk is only used for links which are next to each other in the list, so that the output stays in
+            # link order.
+            position = 0
+            while position < len(indices):
+                run_end = position + 1
+                while run_end < len(indices) and indices[run_end] == indices[run_end - 1] + 1:
+                    run_end += 1
+                run_keys = [keys[index] for index in indices[position:run_end]]
+                start = 0
+                while start < len(run_keys):
+                    if (found := cache.find(run_keys, start)) is None:
+                        start += 1
+                        continue
+                    end, path = found
+                    chunk = indices[position + start:position + end]
+                    for index in chunk:
+                        outputs[index] = path
+                    if journal is not None:
+                        journal.rendered(chunk, path)
+                    start = end
+                position = run_end
+            print(f"{len(indices) - len(unrendered())} of {len(indices)} links are in the render cache.")
+
+        missing = unrendered()
+        print(f"Rendering {len(missing)} links with up to {workers} wkhtmltopdf processes at a time.")
+
+        # How many milliseconds each source waited to be ready, if the options log it; see pdfreadiness.
+        waits = {}
+
+        def rendered(start, end, path):
+            indices = missing[start:end]
+            # A chunk is only cached if every link in it has a render key.
+            if cache is not None and all(keys[index] is not None for index in indices):
+                path = cache.put([keys[index] for index in indices], path)
+            for index in indices:
+                outputs[index] = path
+            if journal is not None:
+                journal.rendered(indices, path, [waits.get(sources[index]) for index in indices])
+
+        def failed(start, error):
+            if journal is not None:
+                journal.render_failed(missing[start], error)
+
+        # A chunk may not span a link which already has its own PDF, so that the output stays in link order.
+        breaks = [position for position in range(1, len(missing)) if any(output is not None for output in outputs[missing[position - 1] + 1:missing[position]])]
+
+        _, render_errors = render_chunks([sources[index] for index in missing], work_dir, config, options, workers, timeout, planner, breaks, rendered, failed, waits)
+        errors.extend(render_errors)
+        if waits:
+            print(f"Pages waited {min(waits.values())} to {max(waits.values())} ms to be ready, {sum(waits.values()) / len(waits):.0f} ms on average.")
+
+        # The links of one chunk are next to each other and share its PDF.
+        part_files = []
+        for output in outputs:
+            if output is not None and (not part_files or part_files[-1] != output):
+                part_files.append(output)
+
+        if not part_files:
+            raise IOError(f"None of the links for {destination} could be rendered.")
+
+        # A single part needs no merging.
+        if len(part_files) == 1:
+            shutil.copyfile(part_files[0], destination)
+            merge_errors = []
+        else:
+            destination, merge_errors = pdfmerge.merge_many_pdfs(folder_name, file_name, *part_files, streaming=True, fast_path=True, preflight=True)
+
+    if journal is not None:
+        journal.finish(destination)
+        shutil.rmtree(parts_dir, ignore_errors=True)
+
+    if cache is not None:
+        cache.evict()
+
+    startup, per_link = planner.costs()
+    if startup is not None and per_link is not None:
+        print(f"wkhtmltopdf startup {startup:.2f} s, {per_link:.2f} s per link, {planner.failures} failed chunk(s).")
+    return destination, errors + merge_errors
+
+
+def download_documents(links, indices, work_dir, outputs, excluded, session=None, journal=None, snapshots=None):
+    """
+    Classifies the links at indices with pdfclassify. Links to PDFs are downloaded to work_dir and their paths put in outputs; links which are neither PDFs nor pages are added to excluded, as are PDFs which cannot be downloaded. Pages are left to be rendered.
+
+    Returns the errors.
+    """
+    errors = []
+    kinds = pdfclassify.classify_links([links[index] for index in indices], session, snapshots)
+
+    documents = []
+    for index, (kind, reason) in zip(indices, kinds):
+        if kind == pdfclassify.PDF:
+            documents.append(index)
+        elif kind == pdfclassify.OTHER:
+            print(f"Skipping link {index + 1} ({links[index]}), which is not a page or a PDF: {reason}.")
+            excluded.add(index)
+            if journal is not None:
+                journal.render_skipped(index, reason)
+
+    def download(index):
+        return pdfclassify.download_pdf(links[index], os.path.join(work_dir, f"download{index + 1:07d}.pdf"), session)
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=pdfcrawl.DEFAULT_CONCURRENCY) as executor:
+        for index, future in [(index, executor.submit(download, index)) for index in documents]:
+            try:
+                outputs[index] = future.result()
+            except Exception as e:
+                print(f"Error for link {index + 1} ({links[index]}): {str(e)}")
+                errors.append(f"Error for link {index + 1} ({links[index]}): {str(e)}")
+                excluded.add(index)
+                if journal is not None:
+                    journal.render_failed(index, str(e))
+            else:
+                if journal is not None:
+                    journal.rendered([index], outputs[index])
+
+    print(f"{len(documents)} links are PDFs, downloaded as they are; {sum(kind == pdfclassify.OTHER for kind, _ in kinds)} links are neither pages nor PDFs, and are left out.")
+    return errors
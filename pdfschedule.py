@@ -0,0 +1,135 @@
+"""
+What a crawl fetches next, and when it stops. max_depth alone is a poor control, as the number of pages grows about exponentially with it, so a crawl which goes one level too deep runs for hours. A crawl can also be given:
+
+- a Budget: the most pages to fetch, bytes to download, seconds to run, and links to take from any one page. When any of them runs out, the crawl stops fetching, lets the pages it is fetching finish, and returns the links it has found;
+- a priority, which decides which pages are fetched first, and so which are fetched at all when a budget runs out:
+    - 'depth' (the default): level by level, in the order the links were found;
+    - 'prefix': pages whose path is closest to the start page's first, so that a crawl started at /docs/guide/ fetches the rest of /docs/guide/ before the rest of /docs/, and that before the rest of the site;
+    - a scoring hook, score(url, depth), which returns a number; higher is fetched first.
+
+The links a crawl returns are ordered by the same priority, highest first, so that the best links are at the front even when the crawl was cut short. With 'depth', they are returned depth first instead, as gather_links_within_links always returned them (see pdfcrawl.depth_first_order).
+"""
+
+import time
+import urllib.parse
+
+
+PRIORITIES = ("depth", "prefix")
+DEFAULT_PRIORITY = "depth"
+
+
+class Budget:
+    """
+    Limits on a crawl. A limit which is None is not applied. See the module docstring.
+
+    max_pages -> The most pages to fetch, counting those which fail.
+
+    max_bytes -> The most bytes of pages to download. The pages being fetched when it runs out are still finished, so a crawl may go over it by a few pages.
+
+    max_time -> The most seconds the crawl may run. As with max_bytes, the pages being fetched are finished.
+
+    max_links_per_page -> The most new links to take from any one page, the highest ranked ones.
+
+    A Budget keeps count of what it has spent, from when start() is called, so use one per crawl.
+    """
+
+    def __init__(self, max_pages=None, max_bytes=None, max_time=None, max_links_per_page=None):
+        self.max_pages = max_pages
+        self.max_bytes = max_bytes
+        self.max_time = max_time
+        self.max_links_per_page = max_links_per_page
+        self.start()
+
+    def __repr__(self):
+        return f"Budget(max_pages={self.max_pages}, max_bytes={self.max_bytes}, max_time={self.max_time}, max_links_per_page={self.max_links_per_page})"
+
+    def describe(self):
+        """Returns the limits as a dict, which Budget(**limits) turns back into the same Budget."""
+        return {"max_pages": self.max_pages, "max_bytes": self.max_bytes, "max_time": self.max_time, "max_links_per_page": self.max_links_per_page}
+
+    def start(self):
+        """Starts counting afresh."""
+        self.started = time.monotonic()
+        self.pages = 0
+        self.bytes = 0
+
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+    def pages_left(self):
+        """Returns how many more pages may be fetched, or None if there is no limit."""
+        return None if self.max_pages is None else max(self.max_pages - self.pages, 0)
+
+    def exhausted(self):
+        """Returns which limit has run out, as text, or None if none has."""
+        if self.max_pages is not None and self.pages >= self.max_pages:
+            return f"the budget of {self.max_pages} page(s) ran out"
+        if self.max_bytes is not None and self.bytes >= self.max_bytes:
+            return f"the budget of {self.max_bytes} bytes ran out"
+        if self.max_time is not None and self.elapsed() >= self.max_time:
+            return f"the budget of {self.max_time} s ran out"
+        return None
+
+    def take_page(self):
+        """Counts a page about to be fetched. Returns False, and counts nothing, if a limit has run out."""
+        if self.exhausted() is not None:
+            return False
+        self.pages += 1
+        return True
+
+    def received(self, size):
+        """Counts the bytes of a page which was fetched."""
+        self.bytes += size
+
+    def report(self):
+        return f"{self.pages} page(s) and {self.bytes} bytes fetched in {self.elapsed():.1f} s."
+
+
+def budget_from(value):
+    """Returns a Budget from a dict from Budget.describe(), a Budget, or None for no limits."""
+    if value is None:
+        return Budget()
+    if isinstance(value, Budget):
+        return value
+    return Budget(**value)
+
+
+def path_segments(url):
+    return [segment for segment in urllib.parse.urlsplit(url).path.split("/") if segment]
+
+
+def prefix_priority(start_html_page):
+    """Returns the 'prefix' ranking for a crawl from start_html_page. See priority_from."""
+    start = urllib.parse.urlsplit(start_html_page)
+    host = start.netloc.lower()
+    # The folder the start page is in. '/docs/guide/index.html' is in '/docs/guide', and so is '/docs/guide/'.
+    folder = path_segments(start_html_page)
+    if folder and not start.path.endswith("/"):
+        folder = folder[:-1]
+
+    def rank(url, depth):
+        if urllib.parse.urlsplit(url).netloc.lower() != host:
+            return (1, 0, 0, depth)
+        segments = path_segments(url)
+        shared = 0
+        while shared < len(folder) and shared < len(segments) and segments[shared] == folder[shared]:
+            shared += 1
+        # Fewest folders climbed out of the start page's folder first, then the least far below the shared part.
+        return (0, len(folder) - shared, len(segments) - shared, depth)
+
+    return rank
+
+
+def priority_from(value, start_html_page):
+    """
+    Returns rank(url, depth) for the priority given as a name in PRIORITIES, or as a scoring hook score(url, depth) which returns a number, higher first; None is the default. Lower ranks are fetched first.
+
+    Every rank ends in the depth, so that among links ranked the same, the shallower come first.
+    """
+    if value is None or value == "depth":
+        return lambda url, depth: (depth,)
+    if value == "prefix":
+        return prefix_priority(start_html_page)
+    if callable(value):
+        return lambda url, depth: (-value(url, depth), depth)
+    raise ValueError(f"priority should be one of {PRIORITIES} or a function, not {value!r}.")
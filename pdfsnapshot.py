@@ -0,0 +1,83 @@
+"""
+Page snapshots for pdffromlinks, so that each page is downloaded once: by the crawler, which needs it for its links, and not again by wkhtmltopdf, which renders the saved copy instead.
+
+A SnapshotStore keeps the HTML of each page as it was fetched, in a folder, re-encoded as UTF-8 and with a <base href> pointing at the URL the page came from, so that its images, stylesheets, scripts and links still resolve against the site. wkhtmltopdf is given the file instead of the URL, so the PDF is made from the exact HTML the crawler saw and gathered the links from.
+
+The images, stylesheets and scripts are still fetched by wkhtmltopdf. Give it the cache-dir option (download_all_pdf does) so that they are kept in one disk cache shared by all the wkhtmltopdf processes, and each is downloaded once rather than once per page.
+"""
+
+import html
+import os
+import re
+import tempfile
+import threading
+
+import pdflinks
+import pdfurls
+
+
+HEAD_TAG = re.compile(r"<head\b[^>]*>", re.IGNORECASE)
+DOCTYPE = re.compile(r"\s*<!doctype[^>]*>", re.IGNORECASE)
+
+
+def is_html(content_type):
+    """Whether a response with this Content-Type should be kept as a snapshot. A response without one is taken to be HTML."""
+    return content_type is None or "html" in content_type.lower()
+
+
+def rebase_page(html_page, url):
+    """Returns html_page (a string or bytes) as a string which declares itself UTF-8 and has one <base href>, pointing at url, or at the page's own <base> resolved against url if it had one."""
+    text = pdflinks.decode_page(html_page)
+
+    base = pdflinks.page_base(text, url)
+    text = pdflinks.BASE_TAG.sub("", text)
+
+    # The first <meta charset> wins, so these go as near the top as they can.
+    tags = f'<meta charset="utf-8"><base href="{html.escape(base, quote=True)}">'
+    if head := HEAD_TAG.search(text):
+        return f"{text[:head.end()]}{tags}{text[head.end():]}"
+    if doctype := DOCTYPE.match(text):
+        return f"{text[:doctype.end()]}{tags}{text[doctype.end():]}"
+    return tags + text
+
+
+class SnapshotStore:
+    """
+    Keeps one snapshot of each page in a folder, named by a hash of its URL. See the module docstring.
+
+    saved -> The URLs saved through this store, as opposed to left over from an earlier run, which may be out of date.
+
+    A SnapshotStore may be shared between threads.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.saved = set()
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def path_for(self, url):
+        return os.path.join(self.directory, f"{pdfurls.url_hash(url):016x}.html")
+
+    def get(self, url):
+        """Returns the path of the snapshot of url, or None if there is none."""
+        path = self.path_for(url)
+        return path if os.path.exists(path) else None
+
+    def save(self, url, final_url, body, content_type=None):
+        """Saves body, fetched from url (and after any redirects, from final_url), as the snapshot of url, and returns its path. Returns None, and saves nothing, if content_type is not HTML."""
+        if not is_html(content_type):
+            return None
+        path = self.path_for(url)
+        # Written to a temporary file first, so that a snapshot is never half written.
+        with tempfile.NamedTemporaryFile("w", encoding="utf-8", dir=self.directory, suffix=".tmp", delete=False) as f:
+            f.write(rebase_page(body, final_url))
+        os.replace(f.name, path)
+        with self._lock:
+            self.saved.add(url)
+        return path
+
+    def add_saved(self, urls):
+        """Counts urls as saved through this store, for snapshots saved into the same folder by another process, such as a pdffrontier worker."""
+        with self._lock:
+            self.saved.update(urls)
@@ -0,0 +1,477 @@
+"""
+Streaming PDF writer. Unlike PyPDF2.PdfFileWriter, which keeps every page and every object in memory until write() is called, the StreamingPdfWriter writes each object to the output file as soon as it has been copied, so that a source can be closed as soon as its pages are done.
+
+Only the object offsets (one integer per object) and the list of page object numbers are kept until the end, when the page tree, catalog, xref table and trailer are written.
+
+With deduplicate=True, the writer also keeps a content hash for every stream it has written, so that identical fonts, images and other streams from different inputs are only written once.
+"""
+
+import bisect
+import hashlib
+import io
+
+import PyPDF2
+from PyPDF2 import generic
+
+import pdfraw
+
+
+# Written after the header so that file transfer tools treat the output as binary.
+PDF_HEADER = b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n"
+
+# How many references deep a content hash may go before the object is simply not deduplicated.
+MAX_CONTENT_KEY_DEPTH = 64
+
+
+class StreamingPdfWriter:
+    """Writes a PDF incrementally to an open binary file. Object numbers are handed out with reserve(), and each object is written with write_object() once its bytes are known. Pages are registered with add_page() in the order they should appear in the output.
+
+    Call close() once all pages have been written. This does not close the underlying file.
+
+    If deduplicate is True, copiers look up stream objects in content_index (content key -> object number) before writing them, and reuse the existing object if there is one."""
+
+    def __init__(self, outfile, deduplicate=False):
+        self.outfile = outfile
+        self.content_index = {} if deduplicate else None
+
+        # offsets[n] is the byte offset of object n, or None if it was reserved but never written. Index 0 is the
+        # head of the free list and is never used.
+        self.offsets = [None]
+        self.page_numbers = []
+        self.position = 0
+
+        self._write(PDF_HEADER)
+
+        # The page tree root is reserved first so that pages can point their /Parent at it before it is written.
+        self.pages_root = self.reserve()
+
+    def _write(self, data):
+        self.outfile.write(data)
+        self.position += len(data)
+
+    def reserve(self):
+        """Reserve a new object number. Returns the number."""
+        self.offsets.append(None)
+        return len(self.offsets) - 1
+
+    def write_object(self, number, data):
+        """Write the serialized object data (bytes, without the 'obj' wrapper) under a reserved object number."""
+        self.offsets[number] = self.position
+        self._write(b"%d 0 obj\n" % number)
+        self._write(data)
+        self._write(b"\nendobj\n")
+
+    def add_page(self, number):
+        """Append an already written page object to the page tree."""
+        self.page_numbers.append(number)
+
+    def find_content(self, content_key, new_content):
+        """Returns the output number of an already written stream with the given content key, or None. new_content holds the content keys of the input currently being copied."""
+        if content_key is None:
+            return None
+        return self.content_index.get(content_key, new_content.get(content_key))
+
+    def commit_content(self, new_content):
+        """Makes the streams written from an input available for deduplication to later inputs. This is only done once the whole input has been copied, so a failed input can never leave later inputs pointing at an object which was never written."""
+        if self.content_index is not None:
+            self.content_index.update(new_content)
+
+    @property
+    def number_of_pages(self):
+        return len(self.page_numbers)
+
+    def close(self):
+        """Write the page tree, the catalog, the xref table and the trailer."""
+        kids = b" ".join(b"%d 0 R" % number for number in self.page_numbers)
+        self.write_object(self.pages_root, b"<< /Type /Pages /Kids [ %s ] /Count %d >>" % (kids, len(self.page_numbers)))
+
+        catalog = self.reserve()
+        self.write_object(catalog, b"<< /Type /Catalog /Pages %d 0 R >>" % self.pages_root)
+
+        xref_offset = self.position
+        self._write(b"xref\n0 %d\n" % len(self.offsets))
+        self._write(b"0000000000 65535 f \n")
+        for offset in self.offsets[1:]:
+            # Objects which were reserved but never written (e.g. the pages of an input which failed halfway) are
+            # marked as free, so that any reference to them resolves to null.
+            if offset is None:
+                self._write(b"0000000000 00001 f \n")
+            else:
+                self._write(b"%010d 00000 n \n" % offset)
+        self._write(b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(self.offsets), catalog, xref_offset))
+
+
+def serialize(pdf_object):
+    """Returns the bytes of a PyPDF2 object as it would be written into a PDF."""
+    buffer = io.BytesIO()
+    pdf_object.writeToStream(buffer, None)
+    return buffer.getvalue()
+
+
+def is_page_tree_node(pdf_object):
+    """Checks whether a resolved PyPDF2 object is a /Page or a /Pages node."""
+    return isinstance(pdf_object, generic.DictionaryObject) and pdf_object.get("/Type") in ("/Page", "/Pages")
+
+
+class ReaderPageCopier:
+    """Copies pages from one PyPDF2.PdfFileReader into a StreamingPdfWriter. Every object reachable from a copied page is written exactly once, with its object number rewritten to a number reserved in the writer.
+
+    References to page tree nodes are not followed. A reference to a page which is being copied is pointed at the copied page, and any other page or /Pages node becomes null, so that a link annotation can never drag the rest of the source document into the output."""
+
+    def __init__(self, writer, reader):
+        self.writer = writer
+        self.reader = reader
+
+        # (idnum, generation) in the source -> object number in the output.
+        self.object_map = {}
+        self.page_map = {}
+        self.pending = []
+
+        # (idnum, generation) -> content key, or None if the object cannot be deduplicated.
+        self.content_keys = {}
+
+        # Content keys of streams written from this reader. See StreamingPdfWriter.commit_content.
+        self.new_content = {}
+
+    def register_pages(self, pages):
+        """Reserve output numbers for source pages (PyPDF2.pdf.PageObject) before any of them are copied, so that references between them can be kept."""
+        for page in pages:
+            if page.indirectRef is not None:
+                key = (page.indirectRef.idnum, page.indirectRef.generation)
+                self.page_map.setdefault(key, self.writer.reserve())
+
+    def copy_page(self, page):
+        """Copy a single page and everything it references. Returns the page's object number in the output. The page is not added to the page tree; call writer.add_page() for that."""
+        key = None if page.indirectRef is None else (page.indirectRef.idnum, page.indirectRef.generation)
+        number = self.page_map.get(key)
+
+        # The same source page can be used more than once, but each use needs its own page object as a page can only
+        # have one /Parent.
+        if number is None or self.writer.offsets[number] is not None:
+            number = self.writer.reserve()
+
+        page_copy = generic.DictionaryObject()
+        for name, value in page.items():
+            if name != "/Parent":
+                page_copy[generic.NameObject(name)] = self._remap(value)
+        page_copy[generic.NameObject("/Parent")] = generic.IndirectObject(self.writer.pages_root, 0, None)
+
+        self.writer.write_object(number, serialize(page_copy))
+        self._flush_pending()
+        return number
+
+    def _flush_pending(self):
+        while self.pending:
+            idnum, generation = self.pending.pop()
+            source_object = self.reader.getObject(generic.IndirectObject(idnum, generation, self.reader))
+            self.writer.write_object(self.object_map[(idnum, generation)], serialize(self._remap(source_object)))
+
+    def _remap(self, value):
+        """Returns a copy of a direct object with all indirect references rewritten to output numbers. Newly seen references are queued in self.pending to be written."""
+        if isinstance(value, generic.IndirectObject):
+            key = (value.idnum, value.generation)
+            if key in self.page_map:
+                return generic.IndirectObject(self.page_map[key], 0, None)
+            if key not in self.object_map:
+                source_object = value.getObject()
+                if is_page_tree_node(source_object):
+                    return generic.NullObject()
+
+                if self.writer.content_index is not None and isinstance(source_object, generic.StreamObject):
+                    content_key = self._content_key(key)
+                    if (existing := self.writer.find_content(content_key, self.new_content)) is not None:
+                        # An identical stream has already been written, possibly from another input.
+                        self.object_map[key] = existing
+                        return generic.IndirectObject(existing, 0, None)
+                    self.object_map[key] = self.writer.reserve()
+                    if content_key is not None:
+                        self.new_content[content_key] = self.object_map[key]
+                else:
+                    self.object_map[key] = self.writer.reserve()
+                self.pending.append(key)
+            return generic.IndirectObject(self.object_map[key], 0, None)
+
+        elif isinstance(value, generic.StreamObject):
+            # The stream data is copied as is, without being decoded.
+            stream_copy = value.__class__()
+            stream_copy._data = value._data
+            for name, item in value.items():
+                stream_copy[generic.NameObject(name)] = self._remap(item)
+            return stream_copy
+
+        elif isinstance(value, generic.DictionaryObject):
+            dictionary_copy = generic.DictionaryObject()
+            for name, item in value.items():
+                dictionary_copy[generic.NameObject(name)] = self._remap(item)
+            return dictionary_copy
+
+        elif isinstance(value, generic.ArrayObject):
+            return generic.ArrayObject(self._remap(item) for item in value)
+
+        else:
+            return value
+
+
+    def _content_key(self, key, depth=0):
+        """Returns a hash of an object and, recursively, of everything it references, so that two objects with the same key are interchangeable. Returns None for anything which references a page or is part of a reference loop."""
+        if key in self.content_keys:
+            return self.content_keys[key]
+
+        # Marking the object first means that a loop back to it yields None.
+        self.content_keys[key] = None
+        if depth > MAX_CONTENT_KEY_DEPTH:
+            return None
+
+        source_object = self.reader.getObject(generic.IndirectObject(key[0], key[1], self.reader))
+        if is_page_tree_node(source_object):
+            return None
+
+        digest = hashlib.blake2b(digest_size=20)
+        if not self._hash_value(source_object, digest, depth):
+            return None
+        self.content_keys[key] = digest.digest()
+        return self.content_keys[key]
+
+    def _hash_value(self, value, digest, depth):
+        """Feeds a direct object into digest, with references replaced by the content keys of their targets. Returns False if a target has no content key."""
+        if isinstance(value, generic.IndirectObject):
+            child_key = self._content_key((value.idnum, value.generation), depth + 1)
+            if child_key is None:
+                return False
+            digest.update(b"<" + child_key + b">")
+            return True
+
+        elif isinstance(value, (generic.DictionaryObject, generic.ArrayObject)):
+            items = value.items() if isinstance(value, generic.DictionaryObject) else enumerate(value)
+            digest.update(b"<<" if isinstance(value, generic.DictionaryObject) else b"[")
+            for name, item in items:
+                digest.update(str(name).encode("utf-8", "surrogateescape") + b" ")
+                if not self._hash_value(item, digest, depth):
+                    return False
+            if isinstance(value, generic.StreamObject):
+                digest.update(b"stream")
+                digest.update(value._data)
+            digest.update(b">>" if isinstance(value, generic.DictionaryObject) else b"]")
+            return True
+
+        else:
+            digest.update(serialize(value) + b" ")
+            return True
+
+
+def open_reader(input_file):
+    """Opens a PDF for streaming. Returns the open file handle along with the PyPDF2.PdfFileReader, so that the caller can close it as soon as its pages are written."""
+    handle = open(input_file, "rb")
+    try:
+        reader = PyPDF2.PdfFileReader(handle, strict=False)
+        if reader.isEncrypted:
+            raise PyPDF2.utils.PdfReadError(f"The file {input_file} is encrypted.")
+    except Exception:
+        handle.close()
+        raise
+    return handle, reader
+
+
+INHERITABLE_PAGE_ATTRIBUTES = ("/Resources", "/MediaBox", "/CropBox", "/Rotate")
+
+
+class LazyPageIndex:
+    """Finds pages in a PyPDF2.PdfFileReader without flattening the whole page tree, as reader.getPage() and reader.numPages do. The page count comes from the /Count of the page tree root, and a page lookup only reads the branches which lead to it. See pdfraw.RawPdfReader.page for the raw equivalent.
+
+    Raises PyPDF2.utils.PdfReadError if the /Count entries cannot be trusted. Use get_pages() to fall back to PyPDF2 in that case."""
+
+    def __init__(self, reader):
+        self.reader = reader
+        self.root = reader.trailer["/Root"].getObject()["/Pages"]
+
+    @staticmethod
+    def _count(node):
+        if node.get("/Type") != "/Pages" and "/Kids" not in node:
+            return 1
+        count = node.get("/Count")
+        count = count.getObject() if count is not None else None
+        if not isinstance(count, int) or count < 0:
+            raise PyPDF2.utils.PdfReadError("Page tree node without a valid /Count.")
+        return count
+
+    def number_of_pages(self):
+        return self._count(self.root.getObject())
+
+    def page(self, index):
+        """Returns the page at index (starting from 0) as a PyPDF2.pdf.PageObject with its inherited attributes."""
+        number_of_pages = self.number_of_pages()
+        if index < 0:
+            index += number_of_pages
+        if not 0 <= index < number_of_pages:
+            raise IndexError(f"Page {index + 1} is not within the document, which has {number_of_pages} pages.")
+
+        ref = self.root
+        inherited = {}
+        for _ in range(number_of_pages + 1):
+            node = ref.getObject()
+            if node.get("/Type") != "/Pages" and "/Kids" not in node:
+                return self._page_object(ref, node, inherited)
+
+            for attribute in INHERITABLE_PAGE_ATTRIBUTES:
+                if attribute in node:
+                    inherited[attribute] = node[attribute]
+
+            for kid in node["/Kids"].getObject():
+                kid_count = self._count(kid.getObject())
+                if index < kid_count:
+                    ref = kid
+                    break
+                index -= kid_count
+            else:
+                raise PyPDF2.utils.PdfReadError("The /Count entries of the page tree do not add up.")
+        raise PyPDF2.utils.PdfReadError("Loop in the page tree.")
+
+    def pages(self, indices):
+        """Returns the pages at indices (starting from 0), in the order given, found in one walk of the page tree. See pdfraw.RawPdfReader.pages_at."""
+        number_of_pages = self.number_of_pages()
+        positions = []
+        for index in indices:
+            position = index + number_of_pages if index < 0 else index
+            if not 0 <= position < number_of_pages:
+                raise IndexError(f"Page {position + 1} is not within the document, which has {number_of_pages} pages.")
+            positions.append(position)
+        if not positions:
+            return []
+        wanted = sorted(set(positions))
+
+        found = {}
+        visited = set()
+        stack = [(self.root, 0, {})]
+        while stack:
+            ref, offset, inherited = stack.pop()
+            key = (ref.idnum, ref.generation) if isinstance(ref, generic.IndirectObject) else id(ref)
+            if key in visited:
+                raise PyPDF2.utils.PdfReadError("Loop in the page tree.")
+            visited.add(key)
+
+            node = ref.getObject()
+            if node.get("/Type") != "/Pages" and "/Kids" not in node:
+                found[offset] = self._page_object(ref, node, inherited)
+                continue
+
+            inherited = dict(inherited)
+            for attribute in INHERITABLE_PAGE_ATTRIBUTES:
+                if attribute in node:
+                    inherited[attribute] = node[attribute]
+
+            kids = []
+            kid_offset = offset
+            for kid in node["/Kids"].getObject():
+                if kid_offset > wanted[-1]:
+                    break
+                kid_count = self._count(kid.getObject())
+                first = bisect.bisect_left(wanted, kid_offset)
+                if first < len(wanted) and wanted[first] < kid_offset + kid_count:
+                    kids.append((kid, kid_offset, inherited))
+                kid_offset += kid_count
+            stack.extend(reversed(kids))
+
+        if any(position not in found for position in wanted):
+            raise PyPDF2.utils.PdfReadError("The /Count entries of the page tree do not add up.")
+        return [found[position] for position in positions]
+
+    def _page_object(self, ref, node, inherited):
+        """Returns a page as a PyPDF2.pdf.PageObject, with the attributes it inherits from the nodes above it."""
+        page = PyPDF2.pdf.PageObject(self.reader, ref if isinstance(ref, generic.IndirectObject) else None)
+        page.update(node)
+        for attribute, value in inherited.items():
+            if attribute not in page:
+                page[generic.NameObject(attribute)] = value
+        return page
+
+
+def get_pages(reader, page_numbers):
+    """Returns the pages at page_numbers (starting from 0) using a LazyPageIndex, or by flattening the page tree if its /Count entries are broken. A few pages are looked up one by one, and more in one walk of the page tree (see pdfraw.LAZY_LOOKUP_LIMIT)."""
+    try:
+        index = LazyPageIndex(reader)
+        if len(page_numbers) <= pdfraw.LAZY_LOOKUP_LIMIT:
+            return [index.page(page_number) for page_number in page_numbers]
+        return index.pages(page_numbers)
+    except (PyPDF2.utils.PdfReadError, KeyError, AttributeError):
+        return [reader.getPage(page_number) for page_number in page_numbers]
+
+
+def count_pages(reader):
+    """Returns the number of pages from the /Count of the page tree root, or by flattening the page tree if there is none."""
+    try:
+        return LazyPageIndex(reader).number_of_pages()
+    except (PyPDF2.utils.PdfReadError, KeyError, AttributeError):
+        return reader.getNumPages()
+
+
+def append_reader(writer, reader, page_numbers=None, copier=None):
+    """Copies pages from reader into writer. page_numbers is a list of page numbers starting from 0, and defaults to every page. Returns the number of pages written.
+
+    Passing the copier from an earlier call for the same reader and writer means objects already copied by that call (fonts, images, ...) are reused rather than written again."""
+    if page_numbers is None:
+        pages = [reader.getPage(page_number) for page_number in range(reader.getNumPages())]
+    else:
+        pages = get_pages(reader, page_numbers)
+
+    if copier is None:
+        copier = ReaderPageCopier(writer, reader)
+    copier.register_pages(pages)
+
+    # Pages are only added to the page tree once every one of them has been copied, so that an input which fails
+    # halfway leaves no pages behind.
+    copied_numbers = [copier.copy_page(page) for page in pages]
+    for number in copied_numbers:
+        writer.add_page(number)
+    writer.commit_content(copier.new_content)
+    return len(copied_numbers)
+
+
+class ReaderSource:
+    """A PDF opened with PyPDF2 for streaming. Has the same number_of_pages(), append_to() and close() as pdfraw.RawPdfReader."""
+
+    # PyPDF2 seeks around a single file handle while reading, so a reader can only be used by one thread at a time.
+    thread_safe = False
+
+    def __init__(self, input_file):
+        self.input_file = input_file
+        self.handle, self.reader = open_reader(input_file)
+
+        # One copier per writer, so pages appended to the same writer in several calls share their objects.
+        self.copiers = {}
+
+    def number_of_pages(self):
+        return count_pages(self.reader)
+
+    def append_to(self, writer, page_numbers=None):
+        if writer not in self.copiers:
+            self.copiers[writer] = ReaderPageCopier(writer, self.reader)
+        return append_reader(writer, self.reader, page_numbers, self.copiers[writer])
+
+    def close(self):
+        self.handle.close()
+
+
+def open_source(input_file, fast_path=False):
+    """Opens a PDF to be copied into a StreamingPdfWriter. If fast_path is True, the raw passthrough in pdfraw is tried first, and PyPDF2 is used for anything it cannot handle."""
+    if fast_path:
+        try:
+            return pdfraw.RawPdfReader(input_file)
+        except pdfraw.RawPdfUnsupported as e:
+            print(f"Falling back to PyPDF2 for {input_file}: {e}")
+    return ReaderSource(input_file)
+
+
+def append_source(writer, source, page_numbers=None):
+    """Copies pages from a source returned by open_source into writer. If the raw passthrough runs into something it cannot handle halfway, the source is read again with PyPDF2. Returns the number of pages written."""
+    try:
+        return source.append_to(writer, page_numbers)
+    except pdfraw.RawPdfUnsupported as e:
+        print(f"Falling back to PyPDF2 for {source.input_file}: {e}")
+
+    # Anything already written by the raw passthrough is left unreferenced in the output, as none of its pages were
+    # added to the page tree.
+    fallback = ReaderSource(source.input_file)
+    try:
+        return fallback.append_to(writer, page_numbers)
+    finally:
+        fallback.close()
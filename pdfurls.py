@@ -0,0 +1,208 @@
+"""
+URL canonicalization and visited sets for the crawler.
+
+A UrlCanonicalizer turns the many spellings of one page into one URL, so that '/a', '/a/', '/a#x' and 'https://HOST:443/a' are crawled and rendered once. Relative links are joined against the URL of the page they were found on, the fragment is dropped, the scheme and host are lowercased, the default port is removed, dot segments and a trailing slash are removed from the path, percent escapes are normalised, and query parameters can be dropped by name.
+
+A HashedUrlSet remembers URLs by a 64-bit hash in a flat array, which is 14 to 27 bytes per URL depending on how full the table is, instead of the hundred or more a set of strings takes, so a crawl can remember millions of URLs. A DiskUrlSet keeps the same hashes in a SQLite file instead, for crawls which should not hold them in memory at all, or which are resumed later.
+
+Two different URLs share a 64-bit hash with a probability of about n^2 / 2^65, about one in 40 million for a million URLs. A collision means one page is skipped, not that a wrong page is rendered.
+"""
+
+import array
+import fnmatch
+import hashlib
+import posixpath
+import re
+import sqlite3
+import urllib.parse
+
+
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+# Query parameters which are dropped by default: they only track where a visitor came from.
+DEFAULT_STRIP_QUERY_PARAMS = ("utm_*", "fbclid", "gclid")
+
+# Percent escapes of unreserved characters are decoded, and all others are uppercased (RFC 3986, section 6.2.2).
+PERCENT_ESCAPE = re.compile(r"%[0-9A-Fa-f]{2}")
+UNRESERVED = frozenset("ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-._~")
+
+# The load factor at which a HashedUrlSet doubles its table.
+MAX_LOAD_FACTOR = 0.6
+
+
+def normalise_escapes(component):
+    def normalise(match):
+        character = chr(int(match.group(0)[1:], 16))
+        return character if character in UNRESERVED else match.group(0).upper()
+    return PERCENT_ESCAPE.sub(normalise, component)
+
+
+def normalise_path(path, strip_trailing_slash=True):
+    """Removes dot segments and repeated slashes, and the trailing slash unless the path is just '/'."""
+    if not path:
+        return "/"
+    normalised = posixpath.normpath(path)
+    # normpath keeps a leading '//' and drops the trailing slash, and turns '' into '.'.
+    if normalised.startswith("//"):
+        normalised = "/" + normalised.lstrip("/")
+    if normalised == ".":
+        normalised = "/"
+    if not strip_trailing_slash and path.endswith("/") and normalised != "/":
+        normalised += "/"
+    return normalised
+
+
+class UrlCanonicalizer:
+    """
+    Turns URLs into one canonical form. Make one per crawl, so that the rules are only compiled once.
+
+    strip_query_params -> Names (or fnmatch patterns, such as 'utm_*') of query parameters to drop.
+
+    drop_query -> Drop the whole query string. Only use this for sites where the query never changes the page.
+
+    sort_query -> Sort the remaining query parameters, so that '?a=1&b=2' and '?b=2&a=1' are the same page.
+
+    strip_trailing_slash -> Treat '/a/' and '/a' as the same page.
+    """
+
+    def __init__(self, strip_query_params=DEFAULT_STRIP_QUERY_PARAMS, drop_query=False, sort_query=True, strip_trailing_slash=True):
+        self.drop_query = drop_query
+        self.sort_query = sort_query
+        self.strip_trailing_slash = strip_trailing_slash
+        self.strip_query_pattern = re.compile("|".join(fnmatch.translate(name) for name in strip_query_params)) if strip_query_params else None
+
+    def canonicalize(self, url, base=None, keep_trailing_slash=False):
+        """Returns the canonical form of url, joined against base if it is relative. Returns None for links which are not http(s), such as mailto: and javascript: links. With keep_trailing_slash=True, the trailing slash of a directory is kept even if the canonicalizer strips it, for a URL which is to be fetched as it was written."""
+        url = url.strip()
+        if base is not None:
+            url = urllib.parse.urljoin(base, url)
+
+        try:
+            parts = urllib.parse.urlsplit(url)
+            port = parts.port
+        except ValueError:
+            return None
+        scheme = parts.scheme.lower()
+        if scheme not in DEFAULT_PORTS or not parts.hostname:
+            return None
+
+        host = parts.hostname.lower()
+        if ":" in host:
+            host = f"[{host}]"
+        if port is not None and port != DEFAULT_PORTS[scheme]:
+            host = f"{host}:{port}"
+        if parts.username is not None:
+            userinfo = parts.username + (f":{parts.password}" if parts.password is not None else "")
+            host = f"{userinfo}@{host}"
+
+        path = normalise_path(normalise_escapes(parts.path), self.strip_trailing_slash and not keep_trailing_slash)
+
+        query = ""
+        if parts.query and not self.drop_query:
+            # The parameters are kept as they were written, so that the URL which is fetched still means the same to
+            # the server; only their order and the dropped ones change.
+            parameters = [normalise_escapes(parameter) for parameter in parts.query.split("&") if parameter]
+            if self.strip_query_pattern is not None:
+                parameters = [parameter for parameter in parameters if not self.strip_query_pattern.match(urllib.parse.unquote_plus(parameter.split("=", 1)[0]))]
+            if self.sort_query:
+                parameters.sort()
+            query = "&".join(parameters)
+
+        return urllib.parse.urlunsplit((scheme, host, path, query, ""))
+
+    __call__ = canonicalize
+
+
+DEFAULT_CANONICALIZER = UrlCanonicalizer()
+
+
+def canonical_url(url, base=None):
+    """Canonicalizes url with the default rules. Returns None for links which are not http(s)."""
+    return DEFAULT_CANONICALIZER.canonicalize(url, base)
+
+
+def url_hash(url):
+    """Returns a non-zero 64-bit hash of url."""
+    return int.from_bytes(hashlib.blake2b(url.encode("utf-8"), digest_size=8).digest(), "little") or 1
+
+
+class HashedUrlSet:
+    """A set of URLs which only keeps a 64-bit hash of each, in an open-addressed array('Q') table. add() returns True if the URL was not in the set yet."""
+
+    def __init__(self, urls=()):
+        self._table = array.array("Q", bytes(8 * 1024))
+        self._mask = len(self._table) - 1
+        self._count = 0
+        for url in urls:
+            self.add(url)
+
+    def __len__(self):
+        return self._count
+
+    def _slot(self, value):
+        slot = value & self._mask
+        table = self._table
+        while table[slot] not in (0, value):
+            slot = (slot + 1) & self._mask
+        return slot
+
+    def __contains__(self, url):
+        value = url_hash(url)
+        return self._table[self._slot(value)] == value
+
+    def add(self, url):
+        value = url_hash(url)
+        slot = self._slot(value)
+        if self._table[slot] == value:
+            return False
+        self._table[slot] = value
+        self._count += 1
+        if self._count > MAX_LOAD_FACTOR * len(self._table):
+            self._grow()
+        return True
+
+    def _grow(self):
+        old = self._table
+        self._table = array.array("Q", bytes(16 * len(old)))
+        self._mask = len(self._table) - 1
+        for value in old:
+            if value:
+                self._table[self._slot(value)] = value
+
+
+class DiskUrlSet:
+    """A set of URLs which keeps a 64-bit hash of each in a SQLite file, so that nothing grows in memory and the set survives between runs. add() returns True if the URL was not in the set yet."""
+
+    def __init__(self, path):
+        self.path = path
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("CREATE TABLE IF NOT EXISTS visited (hash INTEGER PRIMARY KEY)")
+        self._connection.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def commit(self):
+        """Writes the URLs added so far to the file. close() does this as well."""
+        self._connection.commit()
+
+    def close(self):
+        self._connection.commit()
+        self._connection.close()
+
+    @staticmethod
+    def _key(url):
+        # SQLite integers are signed.
+        return url_hash(url) - (1 << 63)
+
+    def __len__(self):
+        return self._connection.execute("SELECT COUNT(*) FROM visited").fetchone()[0]
+
+    def __contains__(self, url):
+        return self._connection.execute("SELECT 1 FROM visited WHERE hash = ?", (self._key(url),)).fetchone() is not None
+
+    def add(self, url):
+        return self._connection.execute("INSERT OR IGNORE INTO visited VALUES (?)", (self._key(url),)).rowcount == 1
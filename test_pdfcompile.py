@@ -0,0 +1,204 @@
+"""
+Tests for page specs and the one-pass PDF tools in pdfcompile. Run with python -m pytest test_pdfcompile.py.
+"""
+
+import os
+import random
+import time
+
+import PyPDF2
+import pytest
+
+import pdfcompile
+from pdfcompile import PageSpec
+
+
+def make_pdf(path, number_of_pages, label="page"):
+    """Writes a PDF whose page n shows the text '{label} n', so that tests can tell the pages, and the PDFs, apart."""
+    objects = {1: b"<< /Type /Catalog /Pages 2 0 R >>"}
+    kids = []
+    for page_no in range(1, number_of_pages + 1):
+        page, content = 2 * page_no + 1, 2 * page_no + 2
+        kids.append(b"%d 0 R" % page)
+        data = b"BT /F1 12 Tf 10 10 Td (%s %d) Tj ET" % (label.encode(), page_no)
+        objects[page] = b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 100 100] /Contents %d 0 R >>" % content
+        objects[content] = b"<< /Length %d >>\nstream\n%s\nendstream" % (len(data), data)
+    objects[2] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (b" ".join(kids), number_of_pages)
+
+    body, offsets = bytearray(b"%PDF-1.4\n"), {}
+    for number in sorted(objects):
+        offsets[number] = len(body)
+        body += b"%d 0 obj\n%s\nendobj\n" % (number, objects[number])
+    xref = len(body)
+    body += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    body += b"".join(b"%010d 00000 n \n" % offsets[number] for number in sorted(objects))
+    body += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    with open(path, "wb") as f:
+        f.write(body)
+    return path
+
+
+def page_labels(path):
+    """Returns the text shown on each page of a PDF made with make_pdf, such as 'page 3'."""
+    with open(path, "rb") as f:
+        reader = PyPDF2.PdfFileReader(f)
+        return [reader.getPage(index).getContents().getData().split(b"(")[1].split(b")")[0].decode() for index in range(reader.getNumPages())]
+
+
+def page_texts(path):
+    """Returns the page numbers shown on each page of a PDF made with make_pdf."""
+    return [int(label.split()[-1]) for label in page_labels(path)]
+
+
+def test_set_operations_match_sets():
+    randomizer = random.Random(1)
+
+    def random_spec():
+        runs = []
+        for _ in range(randomizer.randint(0, 6)):
+            start, stop, step = randomizer.randint(1, 60), randomizer.randint(1, 60), randomizer.choice([1, 2, 3])
+            runs.append((start, stop, step if stop >= start else -step))
+        return PageSpec(runs)
+
+    for _ in range(500):
+        spec_a, spec_b = random_spec(), random_spec()
+        pages_a, pages_b = set(spec_a), set(spec_b)
+        assert list(spec_a.union(spec_b)) == sorted(pages_a | pages_b)
+        assert list(spec_a.intersection(spec_b)) == sorted(pages_a & pages_b)
+        assert list(spec_a.difference(spec_b)) == sorted(pages_a - pages_b)
+
+
+def test_set_operations_on_scattered_runs_are_quick():
+    # Removing every other page of a long document makes one run per page.
+    number_of_pages = 20000
+    start = time.perf_counter()
+    kept = PageSpec.all_pages(number_of_pages).difference(PageSpec.from_pages(range(2, number_of_pages + 1, 2)))
+    overlap = PageSpec.from_pages(range(1, 8001, 2)).intersection(PageSpec([(1, 8000, 3)]))
+    elapsed = time.perf_counter() - start
+
+    assert list(kept) == list(range(1, number_of_pages + 1, 2))
+    assert list(overlap) == list(range(1, 8001, 6))
+    assert elapsed < 1, f"Took {elapsed:.2f} s"
+
+
+def test_long_runs_are_not_expanded():
+    start = time.perf_counter()
+    kept = PageSpec([(1, 2000000, 1)]).difference(PageSpec([(5, 1000000, 2)]))
+    assert time.perf_counter() - start < 1
+    assert len(kept) == 1500002 and 5 not in kept and 6 in kept and 1000001 in kept
+
+
+@pytest.mark.parametrize("fast_path", [False, True])
+def test_bad_page_leaves_no_output(tmp_path, fast_path):
+    source = make_pdf(str(tmp_path / "in.pdf"), 3)
+    output_dir = str(tmp_path / "out")
+
+    with pytest.raises(IndexError):
+        pdfcompile.rearrange_pdf(source, [1, 5], output_dir, fast_path=fast_path)
+    with pytest.raises(IndexError):
+        pdfcompile.split_pdf(source, {"a": [1], "b": [4]}, output_dir, fast_path=fast_path)
+    with pytest.raises(IndexError):
+        pdfcompile.assemble_pdf([(source, "1-2"), (source, [9])], output_dir, fast_path=fast_path)
+    assert os.listdir(output_dir) == []
+
+    # So a corrected retry is not stopped by a leftover file.
+    destination = pdfcompile.rearrange_pdf(source, [3, 1], output_dir, fast_path=fast_path)
+    assert page_texts(destination) == [3, 1]
+
+
+def test_compile_page_spec():
+    assert list(pdfcompile.compile_page_spec("1,2,4,5-10,3,4")) == [1, 2, 4, 5, 6, 7, 8, 9, 10, 3, 4]
+    assert list(pdfcompile.compile_page_spec(" 10 - 8 ")) == [10, 9, 8]
+    assert str(pdfcompile.compile_page_spec("1,5-10,10-8")) == "1, 5-10, 10-8"
+    assert pdfcompile.make_list_of_pages_from_string("3,1-2") == [3, 1, 2]
+    for bad in ("abc", "1;2", "0", "1-0", "2-", ""):
+        with pytest.raises(TypeError):
+            pdfcompile.compile_page_spec(bad)
+
+
+def test_resolve_and_clip():
+    spec = pdfcompile.compile_page_spec("-3-last")
+    # Unresolved specs cannot be listed, as their pages depend on the document.
+    assert not spec.resolved
+    with pytest.raises(ValueError):
+        list(spec)
+    assert list(spec.resolve(10)) == [8, 9, 10]
+    assert list(pdfcompile.compile_page_spec("last-1").resolve(5)) == [5, 4, 3, 2, 1]
+    assert list(pdfcompile.compile_page_spec("2--2").resolve(5)) == [2, 3, 4]
+    assert list(pdfcompile.compile_page_spec("odd").resolve(7)) == [1, 3, 5, 7]
+    assert list(pdfcompile.compile_page_spec("even,all").resolve(1)) == [1]
+
+    with pytest.raises(IndexError):
+        pdfcompile.compile_page_spec("8-12").resolve(10)
+    with pytest.raises(IndexError):
+        pdfcompile.compile_page_spec("-11").resolve(10)
+    assert list(pdfcompile.compile_page_spec("8-12").clip(10)) == [8, 9, 10]
+    assert list(pdfcompile.compile_page_spec("12-8").clip(10)) == [10, 9, 8]
+    assert list(PageSpec([(-12, 3, 2)], resolved=False).clip(10)) == [1, 3]
+    assert list(pdfcompile.compile_page_spec("11-12").clip(10)) == []
+
+
+def test_page_spec_set_operations():
+    odd = pdfcompile.compile_page_spec("odd").resolve(10)
+    middle = pdfcompile.compile_page_spec("4-2").resolve(10)
+    assert list(odd.union(middle)) == [1, 2, 3, 4, 5, 7, 9]
+    assert list(odd.intersection(middle)) == [3]
+    assert list(odd.difference(middle)) == [1, 5, 7, 9]
+    assert list(middle.difference(odd)) == [2, 4]
+    # Repeats are dropped and the result is in ascending order, whatever order the specs were in.
+    assert list(PageSpec([(5, 1, -1), (2, 3, 1)]).union(PageSpec())) == [1, 2, 3, 4, 5]
+    assert len(odd) == 5 and 9 in odd and 10 not in odd and not PageSpec()
+
+
+def test_compile_assembly_plan():
+    plan = pdfcompile.compile_assembly_plan("a.pdf:1-3,7, b.pdf, C:/docs/c.pdf:last, a.pdf:odd")
+    assert plan == [("a.pdf", pdfcompile.compile_page_spec("1-3,7")), ("b.pdf", pdfcompile.compile_page_spec("all")),
+                    ("C:/docs/c.pdf", pdfcompile.compile_page_spec("last")), ("a.pdf", pdfcompile.compile_page_spec("odd"))]
+    with pytest.raises(TypeError):
+        pdfcompile.compile_assembly_plan("1-3, a.pdf")
+
+
+@pytest.mark.parametrize("fast_path", [False, True])
+@pytest.mark.parametrize("workers", [None, 3])
+def test_split_pdf(tmp_path, fast_path, workers):
+    source = make_pdf(str(tmp_path / "in.pdf"), 10)
+    output_dir = str(tmp_path / "out")
+    outputs = {"first": "1-3", "odd": PageSpec([(1, -1, 2)], resolved=False), "back": [10, 9, 1], "tail": "-2-last", "empty": []}
+    destinations = pdfcompile.split_pdf(source, outputs, output_dir, fast_path=fast_path, workers=workers)
+
+    assert sorted(destinations) == sorted(outputs)
+    assert {name: page_texts(destination) for name, destination in destinations.items()} == {
+        "first": [1, 2, 3], "odd": [1, 3, 5, 7, 9], "back": [10, 9, 1], "tail": [9, 10], "empty": []}
+
+
+def test_split_pdf_outputs_must_not_share_a_file(tmp_path):
+    source = make_pdf(str(tmp_path / "in.pdf"), 3)
+    output_dir = str(tmp_path / "out")
+    for outputs in ({"a": [1], "a.pdf": [2]}, {"a": [1], "./a": [2]}):
+        with pytest.raises(ValueError, match="would both be written"):
+            pdfcompile.split_pdf(source, outputs, output_dir)
+        assert os.listdir(output_dir) == []
+
+
+@pytest.mark.parametrize("fast_path", [False, True])
+def test_assemble_pdf_keeps_the_plan_order(tmp_path, fast_path):
+    make_pdf(str(tmp_path / "a.pdf"), 4, label="a")
+    make_pdf(str(tmp_path / "b.pdf"), 3, label="b")
+    output_dir = str(tmp_path / "out")
+
+    plan = f"{tmp_path}/a.pdf:3-1, {tmp_path}/b.pdf:last, {tmp_path}/a.pdf:even, {tmp_path}/b.pdf"
+    destination = pdfcompile.assemble_pdf(plan, output_dir, "from-string", fast_path=fast_path)
+    assert page_labels(destination) == ["a 3", "a 2", "a 1", "b 3", "a 2", "a 4", "b 1", "b 2", "b 3"]
+
+    plan = [(str(tmp_path / "b.pdf"), [2]), (str(tmp_path / "a.pdf"), None), (str(tmp_path / "b.pdf"), PageSpec([(1, 1, 1)]))]
+    destination = pdfcompile.assemble_pdf(plan, output_dir, "from-list", fast_path=fast_path)
+    assert page_labels(destination) == ["b 2", "a 1", "a 2", "a 3", "a 4", "b 1"]
+
+
+def test_remove_pages_from_pdf(tmp_path):
+    source = make_pdf(str(tmp_path / "in.pdf"), 6)
+    output_dir = str(tmp_path / "out")
+    destination, removed = pdfcompile.remove_pages_from_pdf(source, pdfcompile.compile_page_spec("even,5-9"), output_dir, "removed")
+    assert removed == [2, 4, 5, 6] and page_texts(destination) == [1, 3]
+    with pytest.raises(ValueError):
+        pdfcompile.remove_pages_from_pdf(source, [7, 8], output_dir, "nothing")
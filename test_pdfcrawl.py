@@ -0,0 +1,128 @@
+"""
+Tests for the crawl engine in pdfcrawl, against a small site served from a temporary folder. Run with python -m pytest test_pdfcrawl.py.
+"""
+
+import time
+
+import pytest
+
+import pdfcrawl
+import pdflinks
+import pdfurls
+
+
+# Breadth first, this site is index, a, b, a1, x; depth first, as the recursive crawl returned it, b comes after what
+# is found through a.
+SITE = {
+    "index.html": '<a href="/a.html">A</a> <a href="/b.html">B</a>',
+    "a.html": '<a href="/a1.html">A1</a> <a href="/b.html">B</a>',
+    "a1.html": '<a href="/x.html">X</a> <a href="/b.html">B</a> <a href="/index.html">Home</a>',
+    "b.html": '<a href="/a.html">A</a>',
+    "x.html": "X",
+}
+
+# What the recursive gather_links_within_links returned for SITE, run before it was replaced, by max_depth.
+RECURSIVE_ORDER = {
+    1: ["/index.html", "/a.html", "/b.html"],
+    2: ["/index.html", "/a.html", "/a1.html", "/b.html"],
+    3: ["/index.html", "/a.html", "/a1.html", "/x.html", "/b.html"],
+}
+
+
+@pytest.mark.parametrize("canonicalizer", [None, pdfurls.DEFAULT_CANONICALIZER])
+@pytest.mark.parametrize("max_depth", sorted(RECURSIVE_ORDER))
+def test_links_come_in_the_recursive_order(serve, canonicalizer, max_depth):
+    root = serve(SITE)
+    extract = pdflinks.LinkExtractor(root, canonicalizer=canonicalizer)
+    links = pdfcrawl.crawl(f"{root}/index.html", extract, max_depth, concurrency=4)
+    assert links == [f"{root}{path}" for path in RECURSIVE_ORDER[max_depth]]
+
+
+def test_depth_first_order():
+    page_links = {"s": ["a", "b", "c"], "a": ["a1", "c", "s"], "c": ["c1", "b"], "a1": ["b"]}
+    links = ["s", "a", "b", "c", "a1", "c1", "lost"]
+    # 'lost' cannot be reached through the pages, so it comes last; 'ignored' was not found by the crawl.
+    page_links["b"] = ["ignored"]
+    assert pdfcrawl.depth_first_order("s", links, page_links) == ["s", "a", "a1", "b", "c", "c1", "lost"]
+
+
+def test_deep_chain_does_not_recurse():
+    depth = 5000
+    page_links = {f"p{n}": [f"p{n + 1}"] for n in range(depth)}
+    links = [f"p{n}" for n in range(depth + 1)]
+    assert pdfcrawl.depth_first_order("p0", links, page_links) == links
+
+
+# A start page in /docs/guide/ linking, in this order, further and further out of its folder, to pages which each link
+# to one more page.
+SCHEDULE_SITE = {"docs/guide/index.html": " ".join(f'<a href="/{path}.html">{path}</a>' for path in ("blog/post", "docs/other", "docs/guide/deep/b", "docs/guide/a"))}
+SCHEDULE_SITE.update({f"{path}.html": f'<a href="/{path}-next.html">Next</a>' for path in ("blog/post", "docs/other", "docs/guide/deep/b", "docs/guide/a")})
+
+
+def schedule_crawl(root, max_depth=2, budget=None, priority=None, delay=0):
+    """Crawls SCHEDULE_SITE one page at a time. Returns the links and the pages fetched, in the order they were fetched."""
+    fetched = []
+
+    def fetch(url):
+        fetched.append(url[len(root):])
+        time.sleep(delay)
+        return pdfcrawl.fetch_page(url, with_url=True)
+
+    extract = pdflinks.LinkExtractor(root, canonicalizer=pdfurls.DEFAULT_CANONICALIZER)
+    links = pdfcrawl.crawl(f"{root}/docs/guide/index.html", extract, max_depth, concurrency=1, fetch=fetch, budget=budget, priority=priority)
+    return [link[len(root):] for link in links], fetched
+
+
+def test_no_budget_crawls_everything(serve):
+    links, fetched = schedule_crawl(serve(SCHEDULE_SITE))
+    assert len(fetched) == 5 and len(links) == 9
+
+
+def test_max_pages(serve):
+    links, fetched = schedule_crawl(serve(SCHEDULE_SITE), budget={"max_pages": 2})
+    # The start page and the first page on it, whose link is returned with those found on the start page.
+    assert fetched == ["/docs/guide/index.html", "/blog/post.html"]
+    assert links == ["/docs/guide/index.html", "/blog/post.html", "/blog/post-next.html", "/docs/other.html", "/docs/guide/deep/b.html", "/docs/guide/a.html"]
+
+
+def test_max_bytes(serve):
+    root = serve(SCHEDULE_SITE)
+    links, fetched = schedule_crawl(root, budget={"max_bytes": 1})
+    # The start page is fetched before the bytes are counted, and then the budget has run out.
+    assert fetched == ["/docs/guide/index.html"]
+    assert links == ["/docs/guide/index.html", "/blog/post.html", "/docs/other.html", "/docs/guide/deep/b.html", "/docs/guide/a.html"]
+
+
+def test_max_time(serve):
+    start = time.monotonic()
+    links, fetched = schedule_crawl(serve(SCHEDULE_SITE), budget={"max_time": 0.3}, delay=0.2)
+    # Each page takes 0.2 s, so the crawl stops after two or three of the five pages, and finishes the one it is on.
+    assert 2 <= len(fetched) <= 3 and time.monotonic() - start < 2
+    assert links[:len(fetched)] == ["/docs/guide/index.html", "/blog/post.html", "/blog/post-next.html"][:len(fetched)]
+
+
+def test_max_links_per_page(serve):
+    links, fetched = schedule_crawl(serve(SCHEDULE_SITE), budget={"max_links_per_page": 2})
+    # The first two links on the start page, ranked by depth, and what was found through them.
+    assert fetched == ["/docs/guide/index.html", "/blog/post.html", "/docs/other.html"]
+    assert links == ["/docs/guide/index.html", "/blog/post.html", "/blog/post-next.html", "/docs/other.html", "/docs/other-next.html"]
+
+
+def test_prefix_priority(serve):
+    links, fetched = schedule_crawl(serve(SCHEDULE_SITE), max_depth=1, priority="prefix")
+    # Closest to /docs/guide/ first.
+    assert links == ["/docs/guide/index.html", "/docs/guide/a.html", "/docs/guide/deep/b.html", "/docs/other.html", "/blog/post.html"]
+
+    links, fetched = schedule_crawl(serve(SCHEDULE_SITE), budget={"max_pages": 3}, priority="prefix")
+    assert fetched == ["/docs/guide/index.html", "/docs/guide/a.html", "/docs/guide/deep/b.html"]
+    assert links[:3] == ["/docs/guide/index.html", "/docs/guide/a.html", "/docs/guide/a-next.html"]
+
+
+def test_scoring_hook(serve):
+    def score(url, depth):
+        return 1 if "/blog/" in url else 0
+
+    links, fetched = schedule_crawl(serve(SCHEDULE_SITE), budget={"max_pages": 3}, priority=score)
+    # The blog first, then by depth, in the order the links were found.
+    assert fetched == ["/docs/guide/index.html", "/blog/post.html", "/docs/other.html"]
+    assert links[:2] == ["/blog/post.html", "/blog/post-next.html"]
@@ -0,0 +1,55 @@
+"""
+Tests for download_all_pdf and resume_download in pdffromlinks, against a small site served from a temporary folder, using the stand-in for wkhtmltopdf in conftest.py. Run with python -m pytest test_pdffromlinks.py.
+"""
+
+import importlib
+import os
+
+import pytest
+
+import pdfjournal
+import pdfmerge
+
+
+SITE = {"index.html": " ".join(f'<a href="/p{n}.html">{n}</a>' for n in range(1, 5))}
+SITE.update({f"p{n}.html": f"Page {n}" for n in range(1, 5)})
+
+
+@pytest.fixture
+def pdffromlinks(tmp_path, monkeypatch):
+    """pdffromlinks, imported from a folder with a wkhtmltopdf/bin/wkhtmltopdf.exe, as it makes its default configuration from that relative path when it is imported."""
+    folder = tmp_path / "import"
+    (folder / "wkhtmltopdf" / "bin").mkdir(parents=True)
+    (folder / "wkhtmltopdf" / "bin" / "wkhtmltopdf.exe").write_text("")
+    monkeypatch.chdir(folder)
+    return importlib.import_module("pdffromlinks")
+
+
+def test_resume_renders_only_what_failed(pdffromlinks, serve, wkhtmltopdf, tmp_path, monkeypatch):
+    root = serve(SITE)
+    links = [f"{root}/index.html"] + [f"{root}/p{n}.html" for n in range(1, 5)]
+    folder = str(tmp_path / "out")
+
+    # The job is stopped once everything has been rendered but p3, which failed, before the output is merged.
+    def stopped(*args, **kwargs):
+        raise KeyboardInterrupt
+    wkhtmltopdf.fail("p3")
+    with monkeypatch.context() as patch:
+        patch.setattr(pdfmerge, "merge_many_pdfs", stopped)
+        with pytest.raises(KeyboardInterrupt):
+            pdffromlinks.download_all_pdf(f"{root}/index.html", root, "job", folder, regex_link_filter="html", config=wkhtmltopdf.config, workers=2)
+    assert not os.path.exists(os.path.join(folder, "job.pdf"))
+    with pdfjournal.Journal(pdfjournal.journal_path(folder, "job")) as journal:
+        assert [url for url, _ in journal.failed_links()] == [f"{root}/p3.html"]
+        assert [status for status, _, _ in journal.render_state()] == [pdfjournal.DONE] * 3 + [pdfjournal.FAILED, pdfjournal.DONE]
+    wkhtmltopdf.runs()
+
+    # Resumed, only p3 is rendered again, and the output has every page in order.
+    wkhtmltopdf.fail()
+    assert pdffromlinks.resume_download(folder, "job") == links
+    assert wkhtmltopdf.runs() == [[f"{root}/p3.html"]]
+    assert wkhtmltopdf.pages_of(os.path.join(folder, "job.pdf")) == links
+
+    # Once finished, resuming does nothing more.
+    assert pdffromlinks.resume_download(folder, "job") == links
+    assert wkhtmltopdf.runs() == []
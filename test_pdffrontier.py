@@ -0,0 +1,198 @@
+"""
+Tests for the shared crawl frontier and its worker processes in pdffrontier, against a small site served from a temporary folder. Run with python -m pytest test_pdffrontier.py.
+"""
+
+import functools
+import http.server
+import os
+import signal
+import threading
+import time
+
+import pytest
+
+import pdfcrawl
+import pdffrontier
+
+
+# The index links to 8 pages, each of which links to one more page and back to the index.
+SITE = {"index.html": " ".join(f'<a href="/p{n}.html">{n}</a>' for n in range(8))}
+SITE.update({f"p{n}.html": f'<a href="/q{n}.html">{n}</a> <a href="/index.html">Home</a>' for n in range(8)})
+SITE.update({f"q{n}.html": "End" for n in range(8)})
+
+
+class SlowHandler(http.server.SimpleHTTPRequestHandler):
+    """Serves the site, taking 'delay' seconds over every page but the index, so that a crawl is still running while a test acts on it."""
+
+    delay = 0
+
+    def do_GET(self):
+        if self.path != "/index.html":
+            time.sleep(self.delay)
+        super().do_GET()
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def site(tmp_path):
+    """Serves SITE. Returns (root URL, handler class), whose delay can be set."""
+    folder = tmp_path / "site"
+    folder.mkdir()
+    for name, body in SITE.items():
+        (folder / name).write_text(body)
+    handler = type("Handler", (SlowHandler,), {})
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), functools.partial(handler, directory=str(folder)))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}", handler
+    server.shutdown()
+
+
+def settings_for(root, max_depth=3):
+    return pdffrontier.crawl_settings(f"{root}/index.html", root, max_depth=max_depth)
+
+
+def expected_links(root, max_depth=3):
+    """The links a crawl in one process finds."""
+    settings = settings_for(root, max_depth)
+    return pdfcrawl.crawl(settings["start_html_page"], pdffrontier.extractor_from(settings), max_depth)
+
+
+def test_claim_complete_fail(tmp_path):
+    settings = pdffrontier.crawl_settings("http://host/index.html", "http://host", max_depth=2)
+    with pdffrontier.Frontier(str(tmp_path / "frontier.sqlite")) as frontier:
+        assert frontier.start(settings) is False
+        start = frontier.claim("one")
+        assert start.url == "http://host/index.html" and start.depth == 0
+        # The start page is the only page on its level, and it is claimed.
+        assert frontier.claim("two") is None
+
+        frontier.complete(start, ["http://host/a", "http://host/b", "http://host/c"])
+        claims = [frontier.claim("one"), frontier.claim("two")]
+        assert [claim.url for claim in claims] == ["http://host/a", "http://host/b"]
+
+        frontier.complete(claims[0], ["http://host/b", "http://host/d"], fetch_found=False)
+        frontier.fail(claims[1], "Not Found")
+        assert not frontier.finished()
+        frontier.complete(frontier.claim("one"), [], fetch_found=False)
+        assert frontier.finished() and frontier.claim("one") is None
+
+        assert [(url, status, reason) for url, _, status, reason, _ in frontier.state()] == [
+            ("http://host/index.html", pdffrontier.DONE, None), ("http://host/a", pdffrontier.DONE, None), ("http://host/b", pdffrontier.FAILED, "Not Found"),
+            ("http://host/c", pdffrontier.DONE, None), ("http://host/d", pdffrontier.BEYOND, None)]
+        # Depth first, as pdfcrawl returns them.
+        assert frontier.links() == ["http://host/index.html", "http://host/a", "http://host/b", "http://host/d", "http://host/c"]
+
+        # The same settings carry the crawl on; others start it again.
+        assert frontier.start(settings) is True and len(frontier.state()) == 5
+        assert frontier.start(dict(settings, max_depth=3)) is False and len(frontier.state()) == 1
+
+
+def test_claims_are_not_shared(tmp_path):
+    path = str(tmp_path / "frontier.sqlite")
+    with pdffrontier.Frontier(path) as frontier:
+        frontier.start(pdffrontier.crawl_settings("http://host/", "http://host"))
+        frontier.complete(frontier.claim("setup"), [f"http://host/{n}" for n in range(200)])
+
+    claimed = []
+
+    def claim_all(worker):
+        with pdffrontier.Frontier(path) as frontier:
+            while (claim := frontier.claim(worker)) is not None:
+                claimed.append(claim.url)
+
+    threads = [threading.Thread(target=claim_all, args=(f"worker{n}",)) for n in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(claimed) == sorted(f"http://host/{n}" for n in range(200))
+
+
+def test_lease_runs_out_and_release(tmp_path):
+    with pdffrontier.Frontier(str(tmp_path / "frontier.sqlite"), lease=0.2) as frontier:
+        frontier.start(pdffrontier.crawl_settings("http://host/", "http://host"))
+        claim = frontier.claim("one")
+        assert frontier.claim("two") is None
+        time.sleep(0.3)
+        # The lease ran out, so another worker takes the page over.
+        assert frontier.claim("two").url == claim.url
+
+        time.sleep(0.3)
+        frontier.renew("two")
+        assert frontier.claim("three") is None
+        assert frontier.release("two") == 1
+        assert frontier.claim("three").url == claim.url
+
+
+def test_crawl_processes_match_pdfcrawl(site, tmp_path):
+    root, _ = site
+    links = pdffrontier.crawl_processes(str(tmp_path / "frontier.sqlite"), settings_for(root), processes=3, threads=2)
+    assert links == expected_links(root)
+    assert len(links) == 17
+
+
+def wait_for(condition, timeout=30):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "Timed out"
+        time.sleep(0.02)
+
+
+def run_in_thread(function, *args, **kwargs):
+    """Starts function in a thread. Returns a dict which gets its result, or the exception it raised, and the thread."""
+    outcome = {}
+
+    def run():
+        try:
+            outcome["result"] = function(*args, **kwargs)
+        except BaseException as e:
+            outcome["error"] = e
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    return outcome, thread
+
+
+def claimed_by(path, depth=0):
+    """Returns the workers holding a claim on a page at least depth deep in the frontier at path."""
+    with pdffrontier.Frontier(path) as frontier:
+        return {worker for worker, in frontier._connection.execute("SELECT worker FROM links WHERE status = ? AND depth >= ?", (pdffrontier.CLAIMED, depth))}
+
+
+def test_killed_worker_pages_are_crawled_again(site, tmp_path):
+    root, handler = site
+    handler.delay = 0.5
+    path = str(tmp_path / "frontier.sqlite")
+    outcome, thread = run_in_thread(pdffrontier.crawl_processes, path, settings_for(root, max_depth=2), processes=1, threads=2)
+
+    # Kill the worker while it is fetching pages on the second level.
+    wait_for(lambda: os.path.exists(path) and claimed_by(path, 1))
+    worker = claimed_by(path, 1).pop()
+    os.kill(int(worker.rsplit("-", 1)[1]), signal.SIGKILL)
+    handler.delay = 0
+    thread.join(60)
+
+    assert "error" not in outcome
+    assert outcome["result"] == expected_links(root, max_depth=2)
+    with pdffrontier.Frontier(path) as frontier:
+        assert frontier.finished() and {status for _, _, status, _, _ in frontier.state()} == {pdffrontier.DONE, pdffrontier.BEYOND}
+
+
+def test_worker_joins_running_crawl(site, tmp_path):
+    root, handler = site
+    handler.delay = 0.3
+    path = str(tmp_path / "frontier.sqlite")
+    outcome, thread = run_in_thread(pdffrontier.crawl_processes, path, settings_for(root), processes=1, threads=1)
+
+    wait_for(lambda: os.path.exists(path) and claimed_by(path))
+    joined = pdffrontier.start_worker(path, threads=1)
+    # The new worker takes part: it claims pages of the crawl.
+    wait_for(lambda: pdffrontier.worker_name(joined.pid) in claimed_by(path))
+    joined.join(60)
+    thread.join(60)
+
+    assert joined.exitcode == 0
+    assert "error" not in outcome
+    assert outcome["result"] == expected_links(root)
@@ -0,0 +1,57 @@
+"""
+Tests that relative links resolve against the page they were fetched from. Run with python -m pytest test_pdflinks.py.
+"""
+
+import functools
+import http.server
+import os
+import tempfile
+import threading
+
+import pdfcrawl
+import pdflinks
+import pdfurls
+
+
+SITE = {
+    "docs/index.html": '<a href="intro.html">Intro</a> <a href="guide/">Guide</a>',
+    "docs/intro.html": '<a href="guide/">Guide</a>',
+    "docs/guide/index.html": '<a href="setup.html">Setup</a> <a href="../intro.html">Intro</a>',
+    "docs/guide/setup.html": "Setup",
+}
+
+
+class QuietHandler(http.server.SimpleHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+def serve(directory):
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), functools.partial(QuietHandler, directory=directory))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def test_crawl_from_directory():
+    with tempfile.TemporaryDirectory() as site:
+        for name, body in SITE.items():
+            os.makedirs(os.path.dirname(os.path.join(site, name)), exist_ok=True)
+            with open(os.path.join(site, name), "w") as f:
+                f.write(body)
+        server = serve(site)
+        try:
+            root = f"http://127.0.0.1:{server.server_address[1]}"
+            extract = pdflinks.LinkExtractor(root, canonicalizer=pdfurls.DEFAULT_CANONICALIZER)
+            start = pdfurls.DEFAULT_CANONICALIZER(f"{root}/docs/", keep_trailing_slash=True)
+            links = pdfcrawl.crawl(start, extract, max_depth=3)
+        finally:
+            server.shutdown()
+
+    assert links == [f"{root}/docs/", f"{root}/docs/intro.html", f"{root}/docs/guide", f"{root}/docs/guide/setup.html"]
+
+
+def test_links_resolve_against_fetched_url_and_base():
+    extract = pdflinks.LinkExtractor("http://host", canonicalizer=pdfurls.DEFAULT_CANONICALIZER)
+    assert extract("http://host/docs/", '<a href="intro.html">') == ["http://host/docs/intro.html"]
+    assert extract("http://host/docs", '<a href="intro.html">') == ["http://host/intro.html"]
+    assert extract("http://host/docs/page.html", '<base href="/other/"><a href="intro.html">') == ["http://host/other/intro.html"]
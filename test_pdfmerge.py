@@ -0,0 +1,50 @@
+"""
+Tests for the preflight checks in pdfmerge. Run with python -m pytest test_pdfmerge.py.
+"""
+
+import re
+
+import pytest
+
+import pdfmerge
+from test_pdfcompile import make_pdf, page_texts
+
+
+def move_startxref(path, offset):
+    """Moves the startxref of a PDF made with make_pdf offset bytes away from its xref table."""
+    with open(path, "rb") as f:
+        data = f.read()
+    startxref = int(re.search(rb"startxref\s+(\d+)", data).group(1))
+    with open(path, "wb") as f:
+        f.write(re.sub(rb"startxref\s+\d+", b"startxref\n%d" % (startxref + offset), data))
+    return path
+
+
+def test_good_file_passes(tmp_path):
+    assert pdfmerge.preflight_pdf(make_pdf(str(tmp_path / "good.pdf"), 2)) is None
+
+
+@pytest.mark.parametrize("offset", [-3, 2])
+def test_startxref_a_little_off_is_a_warning(tmp_path, capsys, offset):
+    path = move_startxref(make_pdf(str(tmp_path / "off.pdf"), 2), offset)
+    assert pdfmerge.preflight_pdf(path) is None
+    assert "Warning" in capsys.readouterr().out
+
+    # And the file is merged, as PyPDF2 finds its xref table.
+    destination, errors = pdfmerge.merge_many_pdfs(str(tmp_path / "out"), "merged", path, make_pdf(str(tmp_path / "good.pdf"), 1), streaming=True, fast_path=True, preflight=True)
+    assert errors == [] and page_texts(destination) == [1, 2, 1]
+
+
+def test_unreadable_files_are_rejected(tmp_path):
+    lost = move_startxref(make_pdf(str(tmp_path / "lost.pdf"), 2), -200)
+    assert "startxref does not point to a cross-reference section" in pdfmerge.preflight_pdf(lost)
+
+    beyond = move_startxref(make_pdf(str(tmp_path / "beyond.pdf"), 2), 100000)
+    assert "no valid startxref" in pdfmerge.preflight_pdf(beyond)
+
+    (tmp_path / "headless.pdf").write_bytes(b"Not a PDF\n%%EOF\n")
+    assert "no PDF header" in pdfmerge.preflight_pdf(str(tmp_path / "headless.pdf"))
+
+    good = make_pdf(str(tmp_path / "good.pdf"), 1)
+    destination, errors = pdfmerge.merge_many_pdfs(str(tmp_path / "out"), "merged", lost, good, beyond, streaming=True, preflight=True)
+    assert len(errors) == 2 and page_texts(destination) == [1]
@@ -0,0 +1,271 @@
+"""
+Tests for the raw passthrough in pdfraw and the streaming writer in pdfstream, on small PDFs written by hand so that each one has exactly the structure a test is about. Run with python -m pytest test_pdfraw.py.
+"""
+
+import io
+import os
+import random
+import re
+
+import PyPDF2
+import pytest
+
+import pdfmerge
+import pdfraw
+import pdfstream
+
+
+FONT = b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"
+
+
+def stream(data, dictionary=b""):
+    return b"<< /Length %d %s>>\nstream\n%s\nendstream" % (len(data), dictionary, data)
+
+
+def content(text):
+    return stream(b"BT /F1 12 Tf 10 10 Td (%s) Tj ET" % text.encode())
+
+
+def page(contents, font=3):
+    return b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 200 100] /Resources << /Font << /F1 %d 0 R >> >> /Contents %d 0 R >>" % (font, contents)
+
+
+def document(texts, font=FONT, first=4):
+    """Returns the objects of a PDF with one page showing each text: 1 is the catalog, 2 the page tree, 3 the font, and each page and its content follow from first on."""
+    objects = {1: b"<< /Type /Catalog /Pages 2 0 R >>", 3: font}
+    kids = []
+    for index, text in enumerate(texts):
+        number = first + 2 * index
+        objects[number] = page(number + 1)
+        objects[number + 1] = content(text)
+        kids.append(b"%d 0 R" % number)
+    objects[2] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (b" ".join(kids), len(texts))
+    return objects
+
+
+def build_pdf(objects, trailer=b"", base=None):
+    """Returns a PDF with objects ({number: body}) and a classic xref table. With base, the objects are added to the PDF base as an incremental update, with a /Prev to its xref table."""
+    data = bytearray(base or b"%PDF-1.4\n")
+    offsets = {}
+    for number in sorted(objects):
+        offsets[number] = len(data)
+        data += b"%d 0 obj\n%s\nendobj\n" % (number, objects[number])
+    xref = len(data)
+    data += b"xref\n"
+    if base is None:
+        data += b"0 1\n0000000000 65535 f \n"
+    for number in sorted(offsets):
+        data += b"%d 1\n%010d 00000 n \n" % (number, offsets[number])
+    size = max(objects) + 1
+    if base is not None:
+        trailer += b" /Prev %d" % int(re.findall(rb"startxref\s+(\d+)", base)[-1])
+        size = max(size, int(re.findall(rb"/Size (\d+)", base)[-1]))
+    data += b"trailer\n<< /Size %d /Root 1 0 R %s >>\nstartxref\n%d\n%%%%EOF\n" % (size, trailer, xref)
+    return bytes(data)
+
+
+def build_pdf_with_xref_stream(objects):
+    """Returns a PDF whose cross-reference table is an (unfiltered) cross-reference stream."""
+    data = bytearray(b"%PDF-1.5\n")
+    offsets = {}
+    for number in sorted(objects):
+        offsets[number] = len(data)
+        data += b"%d 0 obj\n%s\nendobj\n" % (number, objects[number])
+    xref_number = max(objects) + 1
+    offsets[xref_number] = len(data)
+    rows = b"\x00\x00\x00\x00\x00\xff\xff" + b"".join(b"\x01" + offsets.get(number, 0).to_bytes(4, "big") + b"\x00\x00" for number in range(1, xref_number + 1))
+    data += b"%d 0 obj\n%s\nendobj\n" % (xref_number, stream(rows, b"/Type /XRef /Size %d /W [1 4 2] /Root 1 0 R " % (xref_number + 1)))
+    data += b"startxref\n%d\n%%%%EOF\n" % offsets[xref_number]
+    return bytes(data)
+
+
+def random_bytes(seed, size):
+    randomizer = random.Random(seed)
+    return bytes(randomizer.getrandbits(8) for _ in range(size))
+
+
+def write(path, data):
+    with open(path, "wb") as f:
+        f.write(data)
+    return str(path)
+
+
+def page_texts(path):
+    with open(path, "rb") as f:
+        reader = PyPDF2.PdfFileReader(f)
+        return [re.search(rb"\((.*)\) Tj", reader.getPage(index).getContents().getData()).group(1).decode() for index in range(reader.getNumPages())]
+
+
+def copy_all(*paths, fast_path=True, deduplicate=False):
+    """Copies every page of paths into one PDF with a StreamingPdfWriter. Returns its bytes."""
+    output = io.BytesIO()
+    writer = pdfstream.StreamingPdfWriter(output, deduplicate)
+    for path in paths:
+        source = pdfstream.open_source(path, fast_path)
+        try:
+            pdfstream.append_source(writer, source)
+        finally:
+            source.close()
+    writer.close()
+    return output.getvalue()
+
+
+def test_reads_pages_through_the_xref_table(tmp_path):
+    path = write(tmp_path / "in.pdf", build_pdf(document(["one", "two", "three"])))
+    with pdfraw.RawPdfReader(path) as reader:
+        assert reader.number_of_pages() == 3
+        assert reader.page(1).attributes[b"/Contents"] == pdfraw.Ref(7, 0)
+    assert page_texts(write(tmp_path / "out.pdf", copy_all(path))) == ["one", "two", "three"]
+
+
+def test_follows_the_xref_chain_of_incremental_updates(tmp_path):
+    original = build_pdf(document(["one", "two"]))
+    # The update replaces the content of the second page and adds a third page.
+    updated = dict(document(["one", "two", "three"]))
+    updated = {2: updated[2], 7: content("two, updated"), 8: updated[8], 9: updated[9]}
+    path = write(tmp_path / "in.pdf", build_pdf(updated, base=original))
+
+    with pdfraw.RawPdfReader(path) as reader:
+        assert reader.number_of_pages() == 3
+        assert isinstance(reader, pdfraw.RawPdfReader)
+    output = write(tmp_path / "out.pdf", copy_all(path))
+    assert page_texts(output) == ["one", "two, updated", "three"] == page_texts(path)
+
+
+def test_broken_xref_chain_is_unsupported(tmp_path):
+    data = build_pdf(document(["one"]))
+    xref = int(re.findall(rb"startxref\s+(\d+)", data)[-1])
+    # The xref table's /Prev points back at itself.
+    path = write(tmp_path / "in.pdf", data.replace(b"/Root 1 0 R ", b"/Root 1 0 R /Prev %d" % xref))
+    with pytest.raises(pdfraw.RawPdfUnsupported, match="broken xref chain"):
+        pdfraw.RawPdfReader(path)
+
+
+def test_falls_back_to_pypdf2_for_a_cross_reference_stream(tmp_path):
+    path = write(tmp_path / "in.pdf", build_pdf_with_xref_stream(document(["one", "two"])))
+    with pytest.raises(pdfraw.RawPdfUnsupported, match="cross-reference stream"):
+        pdfraw.RawPdfReader(path)
+
+    source = pdfstream.open_source(path, fast_path=True)
+    try:
+        assert isinstance(source, pdfstream.ReaderSource)
+        assert source.number_of_pages() == 2
+    finally:
+        source.close()
+    assert page_texts(write(tmp_path / "out.pdf", copy_all(path))) == ["one", "two"]
+
+
+def test_encrypted_input_is_not_copied(tmp_path):
+    objects = document(["secret"])
+    objects[10] = b"<< /Filter /Standard /V 1 /R 2 /O <00> /U <00> /P -4 >>"
+    encrypted = write(tmp_path / "encrypted.pdf", build_pdf(objects, b"/Encrypt 10 0 R /ID [<01> <01>]"))
+    plain = write(tmp_path / "plain.pdf", build_pdf(document(["plain"])))
+
+    with pytest.raises(pdfraw.RawPdfUnsupported, match="encrypted"):
+        pdfraw.RawPdfReader(encrypted)
+    # PyPDF2 does not copy it either, so the merge reports it and goes on with the rest.
+    destination = str(tmp_path / "merged.pdf")
+    errors = pdfmerge.merge_pdfs_streaming(destination, [encrypted, plain], fast_path=True)
+    assert len(errors) == 1 and "encrypted.pdf" in errors[0]
+    assert page_texts(destination) == ["plain"]
+
+
+def test_references_are_rewritten(tmp_path):
+    # Objects numbered far apart and out of order, a font shared by both pages, and a content stream with an indirect
+    # /Length, whose object is not copied.
+    objects = {1: b"<< /Type /Catalog /Pages 50 0 R >>", 50: b"<< /Type /Pages /Kids [900 0 R 30 0 R] /Count 2 >>", 77: FONT}
+    data = b"BT /F1 12 Tf 10 10 Td (first) Tj ET"
+    objects[900] = page(400, font=77).replace(b"/Parent 2 0 R", b"/Parent 50 0 R")
+    objects[400] = b"<< /Length 401 0 R >>\nstream\n%s\nendstream" % data
+    objects[401] = b"%d" % len(data)
+    objects[30] = page(31, font=77).replace(b"/Parent 2 0 R", b"/Parent 50 0 R")
+    objects[31] = content("second")
+    path = write(tmp_path / "in.pdf", build_pdf(objects))
+
+    output = copy_all(path)
+    destination = write(tmp_path / "out.pdf", output)
+    assert page_texts(destination) == ["first", "second"]
+    assert b"/Length %d" % len(data) in output and b"401 0 R" not in output
+    with open(destination, "rb") as f:
+        reader = PyPDF2.PdfFileReader(f)
+        fonts = [reader.getPage(index)["/Resources"]["/Font"].raw_get("/F1") for index in range(2)]
+        # Both pages point at the one copy of the font, and at the output's page tree.
+        assert fonts[0] == fonts[1] and reader.getPage(0)["/Resources"]["/Font"]["/F1"]["/BaseFont"] == "/Helvetica"
+        assert reader.getPage(0).raw_get("/Parent").idnum == reader.trailer["/Root"].raw_get("/Pages").idnum
+    # The same as PyPDF2 copies.
+    assert page_texts(write(tmp_path / "slow.pdf", copy_all(path, fast_path=False))) == ["first", "second"]
+
+
+def test_wrong_length_is_fixed_up(tmp_path):
+    objects = document(["one", "two"])
+    length = b"/Length %d" % len(b"BT /F1 12 Tf 10 10 Td (one) Tj ET")
+    # The first page's content says it is longer than it is, and the second's shorter.
+    objects[5] = objects[5].replace(length, b"/Length 60")
+    objects[7] = objects[7].replace(length, b"/Length 20")
+    path = write(tmp_path / "in.pdf", build_pdf(objects))
+
+    output = copy_all(path)
+    assert page_texts(write(tmp_path / "out.pdf", output)) == ["one", "two"]
+    assert output.count(length) == 2
+
+
+def test_only_the_stream_dictionary_length_is_used(tmp_path):
+    objects = document(["one"])
+    data = b"BT /F1 12 Tf 10 10 Td (one) Tj ET"
+    # A /Length inside a nested dictionary comes before the stream's own, indirect one.
+    objects[5] = b"<< /DecodeParms << /Length 3 >> /Length 9 0 R >>\nstream\n%s\nendstream" % data
+    objects[9] = b"%d" % len(data)
+    path = write(tmp_path / "in.pdf", build_pdf(objects))
+
+    with pdfraw.RawPdfReader(path) as reader:
+        scanned = reader.scan(pdfraw.Ref(5, 0))
+        assert reader.buffer[scanned.data[0]:scanned.data[1]] == data
+        assert reader.buffer[slice(*scanned.length_span)] == b"/Length 9 0 R"
+
+    output = copy_all(path)
+    assert b"<< /DecodeParms << /Length 3 >> /Length %d >>" % len(data) in output
+    assert page_texts(write(tmp_path / "out.pdf", output)) == ["one"]
+
+
+@pytest.mark.parametrize("fast_path", [True, False])
+def test_deduplication_writes_shared_streams_once(tmp_path, fast_path):
+    # Each input embeds the same font program, under a different object number, once with a direct and once with an
+    # indirect /Length.
+    program = random_bytes(1, 4000)
+    paths = []
+    for index, length in enumerate((b"%d" % len(program), b"20 0 R")):
+        objects = document([f"input {index} page {n}" for n in range(2)], font=b"<< /Type /Font /Subtype /Type1 /BaseFont /Embedded /FontFile %d 0 R >>" % (30 + index))
+        objects[30 + index] = b"<< /Length %s >>\nstream\n%s\nendstream" % (length, program)
+        objects[20] = b"%d" % len(program)
+        paths.append(write(tmp_path / f"in{index}.pdf", build_pdf(objects)))
+
+    plain = copy_all(*paths, fast_path=fast_path)
+    deduplicated = copy_all(*paths, fast_path=fast_path, deduplicate=True)
+    assert plain.count(program) == 2 and deduplicated.count(program) == 1
+    assert len(deduplicated) < len(plain) - len(program) + 500
+
+    destination = write(tmp_path / "out.pdf", deduplicated)
+    assert page_texts(destination) == ["input 0 page 0", "input 0 page 1", "input 1 page 0", "input 1 page 1"]
+    with open(destination, "rb") as f:
+        reader = PyPDF2.PdfFileReader(f)
+        font_files = {reader.getPage(index)["/Resources"]["/Font"]["/F1"].raw_get("/FontFile").idnum for index in range(4)}
+        assert len(font_files) == 1
+
+
+def test_merge_many_pdfs_deduplicates(tmp_path):
+    program = random_bytes(2, 4000)
+    font = b"<< /Type /Font /Subtype /Type1 /BaseFont /Embedded /FontFile 20 0 R >>"
+    inputs = []
+    for index in range(3):
+        objects = document([f"page {index}"], font=font)
+        objects[20] = stream(program)
+        inputs.append(write(tmp_path / f"in{index}.pdf", build_pdf(objects)))
+
+    sizes = {}
+    for deduplicate in (False, True):
+        output_dir = str(tmp_path / f"out-{deduplicate}")
+        os.makedirs(output_dir)
+        destination, errors = pdfmerge.merge_many_pdfs(output_dir, "merged", *inputs, streaming=True, fast_path=True, deduplicate=deduplicate)
+        assert errors == [] and page_texts(destination) == ["page 0", "page 1", "page 2"]
+        sizes[deduplicate] = os.path.getsize(destination)
+    assert sizes[True] < sizes[False] - 2 * len(program)
@@ -0,0 +1,40 @@
+"""
+Tests that the waits logged by the readiness scripts are read back from wkhtmltopdf's output. Run with python -m pytest test_pdfreadiness.py.
+"""
+
+import os
+
+import pdfkit
+
+import pdfreadiness
+import pdfrender
+
+
+# What wkhtmltopdf 0.12.6 prints with --debug-javascript and --log-level warn: every console message is a warning of
+# "<source>:<line> <message>" (MyQWebPage::javaScriptConsoleMessage in multipageloader.cc). A script given with
+# --run-script has no source. Without --log-level, the progress lines and bars come in between.
+OUTPUT = (
+    "Loading pages (1/6)\n"
+    "[======>                                                     ] 10%\r"
+    "Warning: :0 pdffromlinks-ready 512 http://127.0.0.1:8000/docs/intro.html\n"
+    "Warning: http://127.0.0.1:8000/docs/app.js:3 unrelated message\n"
+    "Warning: :0 pdffromlinks-ready 10000 {page}\n"
+    "Counting pages (2/6)\n"
+    "Done\n"
+)
+
+
+def test_parse_waits():
+    snapshot = os.path.abspath("snapshot page.html")
+    output = OUTPUT.format(page=pdfreadiness.location_of(snapshot).replace(" ", "%20"))
+    waits = pdfreadiness.parse_waits(output, ["http://127.0.0.1:8000/docs/intro.html", snapshot, "http://127.0.0.1:8000/other.html"])
+    assert waits == {"http://127.0.0.1:8000/docs/intro.html": 512, snapshot: 10000}
+
+
+def test_readiness_command_is_not_quiet():
+    config = pdfkit.configuration(wkhtmltopdf=pdfrender.__file__)
+    args = pdfrender.wkhtmltopdf_command(["http://127.0.0.1:8000/"], "out.pdf", config, pdfreadiness.Readiness().apply({}))
+    assert "--quiet" not in args and "--debug-javascript" in args and args[args.index("--log-level") + 1] == "warn"
+
+    args = pdfrender.wkhtmltopdf_command(["http://127.0.0.1:8000/"], "out.pdf", config, {"disable-javascript": ""})
+    assert "--quiet" in args
@@ -0,0 +1,50 @@
+"""
+Tests for rendering links with pdfrender, using the stand-in for wkhtmltopdf in conftest.py. Run with python -m pytest test_pdfrender.py.
+"""
+
+import os
+import sys
+import time
+
+import pytest
+
+import pdfrender
+
+
+def test_run_process():
+    exit_code, output, elapsed, _ = pdfrender.run_process([sys.executable, "-c", "import sys; print('out'); sys.exit(3)"], dict(os.environ), 30)
+    assert exit_code == 3 and output.strip() == "out" and elapsed < 30
+
+
+def test_run_process_kills_at_the_timeout():
+    start = time.perf_counter()
+    with pytest.raises(TimeoutError):
+        pdfrender.run_process([sys.executable, "-c", "import time; time.sleep(30)"], dict(os.environ), 0.5)
+    assert time.perf_counter() - start < 5
+    # Processes which finish within the timeout are not killed.
+    for _ in range(20):
+        assert pdfrender.run_process([sys.executable, "-c", "pass"], dict(os.environ), 0.2)[0] == 0
+
+
+def test_render_cache_keeps_planner_sized_chunks(serve, wkhtmltopdf, tmp_path):
+    site = tmp_path / "site"
+    root = serve({f"p{n}.html": f"Page {n}" for n in range(6)}, site)
+    links = [f"{root}/p{n}.html" for n in range(6)]
+    cache = pdfrender.RenderCache(str(tmp_path / "RENDER_CACHE"))
+    output_dir = tmp_path / "out"
+    output_dir.mkdir()
+    output_dir = str(output_dir)
+
+    def render(file_name):
+        destination, errors = pdfrender.render_links(links, output_dir, file_name, wkhtmltopdf.config, {}, workers=2, cache=cache)
+        assert errors == [] and wkhtmltopdf.pages_of(destination) == links
+        return wkhtmltopdf.runs()
+
+    # Chunks as large as the planner makes them, an even share for each worker, not one link per process.
+    assert sorted(render("first")) == [links[:3], links[3:]]
+    # Nothing changed, so nothing is rendered again.
+    assert render("second") == []
+    # Only the links of the chunk with the changed page are.
+    (site / "p4.html").write_text("Page 4, changed")
+    assert sorted(link for run in render("third") for link in run) == links[3:]
+    assert render("fourth") == []
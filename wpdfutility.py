@@ -181,13 +181,13 @@ def reorder_one(output_folder, output_file, input_file, page_nos):
         return
 
     if page_nos.get() == "":
-        messagebox.showerror("Error: No Page/Page Range specified", "Choose pages to be kept or reordered. Separate the pages and page ranges with commas. For example, '1,2,4,5-10,3,4'. Writing a range backwards like '10-8' will give you the pages in reverse (10, 9, 8).")
+        messagebox.showerror("Error: No Page/Page Range specified", "Choose pages to be kept or reordered. Separate the pages and page ranges with commas. For example, '1,2,4,5-10,3,4'. Writing a range backwards like '10-8' will give you the pages in reverse (10, 9, 8). You can also use 'last', negative pages counting back from the last page (e.g. '-3-last'), 'odd' and 'even'.")
         return
 
     try:
         reorder_button.configure(state=tk.DISABLED)
         input_file = input_file.get()
-        page_list = pdfcompile.make_list_of_pages_from_string(page_nos.get())
+        page_list = pdfcompile.compile_page_spec(page_nos.get())
         
         destination = pdfcompile.rearrange_pdf(input_file, page_list, output_folder.get(), output_file.get())
     
@@ -226,13 +226,13 @@ def remove_one(output_folder, output_file, input_file, page_nos):
         return
 
     if page_nos.get() == "":
-        messagebox.showerror("Error: No Page/Page Range specified", "Choose pages to be removed. Separate the pages and page ranges with commas. For example, '1,2,4,5-10,3,4'. Writing a range backwards like '10-8' will give you the pages in reverse (10, 9, 8).")
+        messagebox.showerror("Error: No Page/Page Range specified", "Choose pages to be removed. Separate the pages and page ranges with commas. For example, '1,2,4,5-10,3,4'. Writing a range backwards like '10-8' will give you the pages in reverse (10, 9, 8). You can also use 'last', negative pages counting back from the last page (e.g. '-3-last'), 'odd' and 'even'.")
         return
 
     try:
         reorder_button.configure(state=tk.DISABLED)
         input_file = input_file.get()
-        page_list = pdfcompile.make_list_of_pages_from_string(page_nos.get())
+        page_list = pdfcompile.compile_page_spec(page_nos.get())
         
         destination, pages_removed = pdfcompile.remove_pages_from_pdf(input_file, page_list, output_folder.get(), output_file.get())
     
@@ -255,7 +255,7 @@ def remove_one(output_folder, output_file, input_file, page_nos):
     finally:
         remove_button.configure(state=tk.NORMAL)
 
-def dl_all(output_folder, output_file, start_html_page, root_html_page, max_depth, regex_filter):
+def dl_all(output_folder, output_file, start_html_page, root_html_page, max_depth, regex_filter, max_pages):
     """GUI version of download_all_pdf."""
     unexpected_errors = []
     
@@ -265,7 +265,7 @@ def dl_all(output_folder, output_file, start_html_page, root_html_page, max_dept
         return
 
     if output_file.get() == "":
-        messagebox.showerror("Error: No Output File specified", "Type a filename for your PDF with all the PDFs. Note that the PDF will be split if there are too many links. You can merge this later with the Merge functions. Note that bookmarks will be gone if you do this.")
+        messagebox.showerror("Error: No Output File specified", "Type a filename for your PDF with all the PDFs. If there are many links, they are rendered in parts and merged into this one file. Note that bookmarks will be gone if this happens.")
         return
     if start_html_page.get() == "":
         messagebox.showerror("Error: No URL specified", "Choose a URL to start downloading PDFs from recursively.")
@@ -276,24 +276,21 @@ def dl_all(output_folder, output_file, start_html_page, root_html_page, max_dept
         return
 
     if max_depth.get() == "":
-        messagebox.showerror("Error: No Max Depth specified", "Choose how far the script should check. It is not recommended that you set this number too high as the time taken increases exponentially, and you may not actually get that many unique links in the end. For more targeted results, make sure to change the regex filter.")
+        messagebox.showerror("Error: No Max Depth specified", "Choose how far the script should check. It is not recommended that you set this number too high as the time taken increases exponentially, and you may not actually get that many unique links in the end. For more targeted results, make sure to change the regex filter, or set Max Pages to stop the crawl after that many pages.")
         return
     
     try:
         max_depth_int = pdffromlinks.check_integer(max_depth.get())
+        # Max Pages may be left empty for no limit.
+        budget = {"max_pages": pdffromlinks.check_integer(max_pages.get())} if max_pages.get() != "" else None
     except ValueError as e:
         messagebox.showerror("Error: ValueError", str(e))
         return
     
-    try:
-        pdffromlinks.check_and_set_recursion_depth(max_depth_int)
-    except OverflowError as e:
-        messagebox.showerror("Error: OverflowError", str(e))
-    
-    
+
     try: 
         dl_all_button.config(state=tk.DISABLED)
-        pdffromlinks.download_all_pdf(start_html_page.get(), root_html_page.get(), output_file.get(), output_folder.get(), regex_filter.get(), max_depth_int)
+        pdffromlinks.download_all_pdf(start_html_page.get(), root_html_page.get(), output_file.get(), output_folder.get(), regex_filter.get(), max_depth_int, budget=budget)
 
     except FileNotFoundError as e:
         if "[WinError 206]" in str(e):
@@ -387,13 +384,13 @@ def dl_list(output_folder, output_file, html_page_list):
         messagebox.showerror("Error: No Output File specified", "Type a filename for your PDF.")
         return
     if html_page_list.get() == "":
-        messagebox.showerror("Error: No URLs specified", "Choose a list of URLs to start downloading PDFs from. You can also copy paste the list of URLs you got in the LINK.txt file while trying to download multiple PDFs from one link. It does not matter if there are other characters around the quotation marks.")
+        messagebox.showerror("Error: No URLs specified", "Choose a list of URLs to start downloading PDFs from. You can also paste the URLs which failed while downloading multiple PDFs from one link; they are listed with the reason in the JOURNAL_ file in the output folder. It does not matter if there are other characters around the quotation marks.")
         return
     print(html_page_list.get())
     html_pages = re.findall(r'[\'\"](.*?)[\'\"]', html_page_list.get())
     print(html_pages)
     if not html_pages:
-        messagebox.showerror("Error: No URLs specified", "Separate your URLs between single quotes. You can also copy paste the list of URLs you got in the LINK.txt file while trying to download multiple PDFs from one link. It does not matter if there are other characters around the single quote marks.")
+        messagebox.showerror("Error: No URLs specified", "Separate your URLs between single quotes. You can also paste the URLs which failed while downloading multiple PDFs from one link; they are listed with the reason in the JOURNAL_ file in the output folder. It does not matter if there are other characters around the single quote marks.")
         return
 
 
@@ -724,9 +721,15 @@ regex_guide_url = "https://docs.python.org/3.8/library/re.html"
 regex_guide_button_da = ttk.Button(dl_all_tab, text="Regex Guide", command=lambda: webbrowser.open(regex_guide_url))
 regex_guide_button_da.grid(row=11, column=1, sticky='NESW')
 
+# Max Pages
+max_pages_label_da = ttk.Label(dl_all_tab, text="Max Pages to Fetch (Int, optional)")
+max_pages_label_da.grid(row=12, column=0, sticky='NESW')
+max_pages_da = ttk.Entry(dl_all_tab)
+max_pages_da.grid(row=13, column=0, sticky='NESW')
+
 # Compile PDFs from link within links
-dl_all_button = ttk.Button(dl_all_tab, text="Multiple PDFs from Link", command=lambda: dl_all(output_folder_da, output_file_da, start_html_page_da, root_html_da, max_depth_da, regex_filter_da))
-dl_all_button.grid(row=12, column=0, padx=(0,10), pady=10, sticky='NESW')
+dl_all_button = ttk.Button(dl_all_tab, text="Multiple PDFs from Link", command=lambda: dl_all(output_folder_da, output_file_da, start_html_page_da, root_html_da, max_depth_da, regex_filter_da, max_pages_da))
+dl_all_button.grid(row=14, column=0, padx=(0,10), pady=10, sticky='NESW')
 
 
 # LINK_TAB 2: Download One PDF from a given link or list of links #####################################